@@ -0,0 +1,194 @@
+import sys
+import time
+
+import cv2
+import numpy as np
+import onnxruntime
+
+from modules.onnx import FUSED_METADATA_KEY
+from utils.metrics import CASCADE_SKIPPED
+
+
+class FrameGate:
+    """
+    FrameGate 类：级联检测的第一级，用极低成本判断一帧是否需要完整检测。
+    - 第一级可以是单独的小分类器（输出该帧含目标的概率），也可以是 YOLO 结构的小模型；
+      未指定模型时用主模型以低分辨率运行（需空间维度为动态），取最高目标置信度作为分数
+    - 分数低于 threshold 的帧跳过完整检测，直接返回空结果
+    - 完整检测有结果后的 hold_frames 帧不再经过第一级，目标在画面中时不会因第一级漏判而丢失跟踪
+    - 连续跳过 max_skip 帧后强制做一次完整检测，限制第一级漏判的最长持续时间
+    """
+
+    def __init__(self, model_path: str, input_size: int = 160, threshold: float = 0.25,
+                 hold_frames: int = 10, max_skip: int = 30, target_class: int = 0,
+                 providers=None, sess_options=None):
+        """
+        :param input_size: 第一级输入分辨率，模型输入尺寸固定时以模型为准
+        :param threshold: 第一级分数不低于该值的帧才做完整检测
+        """
+        self.threshold = threshold
+        self.hold_frames = hold_frames
+        self.max_skip = max_skip
+        self.target_class = target_class
+
+        self.session = onnxruntime.InferenceSession(
+            model_path,
+            sess_options=sess_options,
+            providers=providers or [
+                "DmlExecutionProvider",
+                "CPUExecutionProvider"
+            ]
+        )
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # tools.model_fuse 改写过的模型输出 [1, k, 6]，第 4 列即为筛选后的置信度
+        self.fused = FUSED_METADATA_KEY in self.session.get_modelmeta().custom_metadata_map
+        height_dim = model_input.shape[2]
+        self.input_size = height_dim if isinstance(height_dim, int) and height_dim > 0 else input_size
+        self._tensor = np.zeros((1, 3, self.input_size, self.input_size), dtype=np.float32)
+        self._resized = np.zeros((self.input_size, self.input_size, 3), dtype=np.uint8)
+
+        self._hold = 0
+        self._skip_run = 0
+        self.last_score = 0.0
+        self.frames = 0
+        self.skipped = 0
+        self.gate_runs = 0
+        self.gate_time = 0.0
+        self.full_runs = 0
+        self.full_time = 0.0
+
+    def score(self, image) -> float:
+        """第一级推理：返回该帧需要完整检测的分数（0~1）。"""
+        cv2.resize(image, (self.input_size, self.input_size), dst=self._resized, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=self._resized)
+        np.multiply(self._resized.transpose(2, 0, 1), 1 / 255, out=self._tensor[0])
+        out = self.session.run(None, {self.input_name: self._tensor})[0]
+        # 融合或导出的模型可能返回零行候选，此时视为空画面
+        if out.size == 0 or (out.ndim >= 2 and out.shape[1] == 0):
+            return 0.0
+        if self.fused:
+            return float(out[0, :, 4].max())
+        if out.ndim == 3 and out.shape[-1] > 5:
+            # YOLO 结构输出 [1, N, 5 + C]：目标置信度 × 目标类别概率的最大值
+            preds = out[0]
+            return float((preds[:, 4] * preds[:, 5 + self.target_class]).max())
+        # 分类器输出：该帧含目标的概率
+        return float(out.max())
+
+    def needs_detection(self, image) -> bool:
+        self.frames += 1
+        if self._hold > 0:
+            self._hold -= 1
+            return True
+        if self._skip_run >= self.max_skip:
+            self._skip_run = 0
+            return True
+        start = time.perf_counter()
+        self.last_score = self.score(image)
+        self.gate_time += time.perf_counter() - start
+        self.gate_runs += 1
+        if self.last_score >= self.threshold:
+            self._skip_run = 0
+            return True
+        self._skip_run += 1
+        self.skipped += 1
+        CASCADE_SKIPPED.inc()
+        return False
+
+    def detection_done(self, seconds: float, found: bool):
+        """完整检测结束后调用：记录耗时，有目标时进入保持期。"""
+        self.full_runs += 1
+        self.full_time += seconds
+        if found:
+            self._hold = self.hold_frames
+
+    def reset(self):
+        self._hold = 0
+        self._skip_run = 0
+
+    @property
+    def skip_rate(self) -> float:
+        return self.skipped / self.frames if self.frames else 0.0
+
+    @property
+    def saved_ms_per_frame(self) -> float:
+        """
+        平均每帧节省的计算时间（毫秒）：跳过的完整检测按实测平均耗时计，
+        减去所有帧上第一级推理的开销，为负表示级联反而更慢。
+        """
+        if not self.frames or not self.full_runs:
+            return 0.0
+        full_avg = self.full_time / self.full_runs
+        return (self.skipped * full_avg - self.gate_time) / self.frames * 1000
+
+    def summary(self) -> str:
+        gate_avg = self.gate_time / self.gate_runs * 1000 if self.gate_runs else 0.0
+        full_avg = self.full_time / self.full_runs * 1000 if self.full_runs else 0.0
+        return (
+            f"[Cascade] frames {self.frames}, skip rate {self.skip_rate * 100:.1f}%, "
+            f"first stage {gate_avg:.2f} ms, full {full_avg:.2f} ms, "
+            f"saved {self.saved_ms_per_frame:.2f} ms/frame"
+        )
+
+
+def enable_cascade(model, cascade_cfg: dict, providers=None, sess_options=None):
+    """
+    按用户配置中的 cascade 段为 APV5Experimental 挂上第一级。
+    未配置 model_path 时以主模型低分辨率运行，主模型输入尺寸固定则无法开启。
+    """
+    gate_path = cascade_cfg.get("model_path")
+    if gate_path is None:
+        if not model.dynamic_size:
+            sys.stdout.write("\n>>> 模型输入尺寸固定且未配置第一级模型，无法开启级联检测。")
+            return None
+        gate_path = model.model_path
+    model.gate = FrameGate(
+        gate_path,
+        input_size=cascade_cfg.get("input_size", 160),
+        threshold=cascade_cfg.get("threshold", 0.25),
+        hold_frames=cascade_cfg.get("hold_frames", 10),
+        max_skip=cascade_cfg.get("max_skip", 30),
+        target_class=model.classes,
+        providers=providers,
+        sess_options=sess_options
+    )
+    sys.stdout.write(
+        f"\n>>> 已开启级联检测：第一级 {model.gate.input_size}px，阈值 {model.gate.threshold}"
+    )
+    return model.gate
+
+
+if __name__ == "__main__":
+    # 以主模型低分辨率作为第一级，比较级联与逐帧完整检测：一半的帧为空画面
+    import argparse
+
+    from modules.onnx import APV5Experimental
+    from utils.frames import list_frame_files, load_frame
+
+    parser = argparse.ArgumentParser(description="级联检测基准")
+    parser.add_argument("model", help="主模型路径")
+    parser.add_argument("frames", help="含目标的帧目录")
+    parser.add_argument("--gate", help="第一级模型路径（默认主模型低分辨率）")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    frames = [load_frame(p) for p in list_frame_files(args.frames)]
+    size = frames[0].shape[0]
+    empty = np.full_like(frames[0], 40)
+    stream = [f for frame in frames for f in (frame, empty)]
+    model = APV5Experimental(args.model, ident_size=size, providers=["CPUExecutionProvider"])
+
+    for label, cfg in (("full", None), ("cascade", {"model_path": args.gate, "threshold": args.threshold})):
+        model.gate = None
+        if cfg is not None and enable_cascade(model, cfg, providers=["CPUExecutionProvider"]) is None:
+            break
+        found = 0
+        start = time.perf_counter()
+        for image in stream:
+            detections, _ = model.predict(image)
+            found += detections.count > 0
+        per_frame = (time.perf_counter() - start) / len(stream) * 1000
+        print(f"\n{label:<8} {per_frame:.2f} ms/frame, frames with detections {found}/{len(stream)}")
+        if model.gate is not None:
+            print(model.gate.summary())
@@ -1,27 +1,30 @@
-import pywinusb.hid as hid
 import vgamepad as vg
 import threading
 import time
 import sys
 
 from utils.tools import median_of_three
+from utils.metrics import HID_REPORTS, VPAD_UPDATES, MAPPER_OVERRUNS
+from utils.placement import get_placement
+from modules.hid_input import create_input_backend, parse_dualsense_report
 
 
 class DualSenseToX360Mapper:
     """
     DualSenseToX360Mapper 类：
-    - 使用 pywinusb.hid 读取 DualSense 控制器的原始 HID 输入
+    - 通过输入后端（modules.hid_input，默认 pywinusb）读取 DualSense 控制器的原始 HID 输入
     - 使用 vgamepad 创建虚拟 Xbox 360 手柄，并将 DualSense 输入映射到虚拟手柄
     - 提供 start() 和 stop() 方法，方便在外部控制映射循环的启动和停止
     """
 
-    def __init__(self, product_id: int, path: str):
+    def __init__(self, product_id: int, path: str, backend=None):
         """
         初始化 DualSenseToX360Mapper。
 
         :param vendor_id: DualSense 供应商 ID，默认使用 Sony（0x054C）
         :param product_id: DualSense 产品 ID，默认使用 DualSense Edge（0x0DF2）
         :param poll_interval: 映射循环的轮询间隔（秒）
+        :param backend: 输入后端（InputBackend），为 None 时由 create_input_backend 选择
         """
         self.vendor_id = 0x054c
         self.product_id = product_id
@@ -45,11 +48,23 @@ class DualSenseToX360Mapper:
         self.rx_override = None
         self.ry_override = None
 
+        # 每次收到输入报告后调用 on_report(dual_sense_state)，为 None 时不调用
+        self.on_report = None
+
+        # 由 MappingEngine 驱动时，状态变化后调用 _wake() 通知引擎线程
+        self._engine = None
+        self._wake = None
+
+        # 帧龄统计（FrameAgeTracker）；_pending_stamp 为 (截图时间, 写入偏移时间)，提交虚拟手柄后清空
+        self.frame_age = None
+        self._pending_stamp = None
+
         # 虚拟 Xbox 360 手柄对象（使用 vgamepad）
         self.virtual_gamepad = vg.VX360Gamepad()
 
-        # DualSense 设备对象（pywinusb.hid.HidDevice），方便后续关闭
-        self._hid_device = None
+        # 输入后端，打开后把原始报告交给 _input_handler，方便后续关闭
+        self.backend = backend or create_input_backend(self.vendor_id, product_id, path)
+        self._backend_open = False
 
         # 线程控制
         self._mapping_thread = None
@@ -57,51 +72,35 @@ class DualSenseToX360Mapper:
 
     def _input_handler(self, data: bytearray):
         """
-        PyWinUSB 的回调函数。当 DualSense 有新输入时调用。
+        输入后端的回调函数。当 DualSense 有新输入时调用。
 
         :param data: bytearray，长度因设备而异
         """
-        # 基本检查
-        if len(data) < 11:  # 修改为11以包含新的数据位
+        HID_REPORTS.inc()
+        if not parse_dualsense_report(data, self.dual_sense_state):
             return
 
-        # 更新摇杆和扳机状态
-        self.dual_sense_state["lx"] = data[1]
-        self.dual_sense_state["ly"] = data[2]
-        self.dual_sense_state["rx"] = data[3]
-        self.dual_sense_state["ry"] = data[4]
-        self.dual_sense_state["lt"] = data[5]
-        self.dual_sense_state["rt"] = data[6]
-
-        # 更新按钮掩码，高字节在 data[9]，低字节在 data[8]
-        self.dual_sense_state["shoulders_sticks_share_options"] = data[9]
-        self.dual_sense_state["buttons_dpad"] = data[8]
-        
-        # 更新触控板和PS键状态
-        self.dual_sense_state["touchpad_ps"] = data[10]
-
-    def _find_and_register_dualsense(self) -> bool:
+        # 通知外部（如智慧核心的需求调度器）有新的输入报告
+        if self.on_report is not None:
+            self.on_report(self.dual_sense_state)
+        if self._wake is not None:
+            self._wake()
+
+    def _find_and_register_dualsense(self, handler=None) -> bool:
         """
-        查找并打开 DualSense 设备，注册输入回调。
+        通过输入后端打开 DualSense 设备，注册输入回调。
 
+        :param handler: 自定义回调，默认为 _input_handler
         :return: 如果成功找到并注册 DualSense，返回 True；否则返回 False
         """
-        all_devices = hid.HidDeviceFilter(
-            vendor_id=self.vendor_id,
-            product_id=self.product_id,
-            path=self.path
-        ).get_devices()
-
-        if not all_devices:
+        if not self.backend.open(handler or self._input_handler):
             sys.stdout.write("\n>>> 未找到 DualSense 设备，请检查手柄是否连接。")
             return False
-
-        # 只打开第一个匹配的 DualSense 设备
-        self._hid_device = all_devices[0]
-        self._hid_device.open()
-        # 注册回调，将收到的新数据传给 _input_handler 方法
-        self._hid_device.set_raw_data_handler(lambda data: self._input_handler(data))
-        sys.stdout.write(f"\n>>> 已连接并注册 DualSense (VID:0x{self.vendor_id:04X}, PID:0x{self.product_id:04X})")
+        self._backend_open = True
+        sys.stdout.write(
+            f"\n>>> 已连接并注册 DualSense (VID:0x{self.vendor_id:04X}, PID:0x{self.product_id:04X}，"
+            f"输入后端：{self.backend.name})"
+        )
         return True
 
     def _ds_to_xinput_axis(self, val: int) -> int:
@@ -113,12 +112,28 @@ class DualSenseToX360Mapper:
         """
         return int(val * 257 - 32768)
 
-    def add_rx_ry_offset(self, dx: int = 0, dy: int = 0):
-        """在原始值上添加偏移量"""
+    def add_rx_ry_offset(self, dx: int = 0, dy: int = 0, capture_time: float = None):
+        """在原始值上添加偏移量；capture_time 为偏移所依据的帧的截图时间，用于统计帧龄"""
         rx = self.dual_sense_state["rx"]
         ry = self.dual_sense_state["ry"]
         self.rx_override = median_of_three(rx + dx, 255, 0)
         self.ry_override = median_of_three(ry + dy, 255, 0)
+        if capture_time is not None:
+            self._pending_stamp = (capture_time, time.perf_counter())
+        if self._wake is not None:
+            self._wake()
+
+    def update(self):
+        """把当前状态提交到虚拟手柄一次。"""
+        self._map_to_x360()
+        self._report_frame_age()
+
+    def _report_frame_age(self):
+        stamp = self._pending_stamp
+        if stamp is not None:
+            self._pending_stamp = None
+            if self.frame_age is not None:
+                self.frame_age.delivered(stamp[0], stamp[1], time.perf_counter())
 
     def _map_to_x360(self):
         """
@@ -237,31 +252,45 @@ class DualSenseToX360Mapper:
         # 最后提交一次报告，让系统感知最新状态
         self.virtual_gamepad.update()
 
-    def start(self):
+    def start(self, engine=None):
         """
         启动映射循环：
         1. 查找并注册 DualSense
         2. 创建虚拟手柄（已在 __init__ 中创建）
-        3. 启动一个后台线程，不断将 DualSense 输入映射到虚拟手柄
+        3. 给出 engine（MappingEngine）时交由引擎线程按输入报告驱动，
+           否则启动一个后台线程，不断将 DualSense 输入映射到虚拟手柄
         """
         if not self._find_and_register_dualsense():
             return False
 
         sys.stdout.write("\n>>> 虚拟 Xbox360 手柄已创建。DualSense 的输入将直接映射到虚拟手柄上。")
 
+        if engine is not None:
+            self._engine = engine
+            engine.add(self, name=self.path)
+            return True
+
         # 重置（防止多次调用 start）
         self._stop_event.clear()
 
         # 后台线程负责循环映射
         def run_loop():
+            get_placement().apply("mapper")
             try:
+                last = time.perf_counter()
                 while not self._stop_event.is_set():
-                    self._map_to_x360()
+                    self.update()
+                    VPAD_UPDATES.inc()
                     time.sleep(self.poll_interval)
+                    now = time.perf_counter()
+                    # 单次循环超过两倍轮询间隔视为超时
+                    if now - last > 2 * self.poll_interval:
+                        MAPPER_OVERRUNS.inc()
+                    last = now
             except Exception as e:
                 sys.stdout.write(f">>> 映射循环遇到异常：{e}")
 
-        self._mapping_thread = threading.Thread(target=run_loop, daemon=True)
+        self._mapping_thread = threading.Thread(target=run_loop, name="mapper", daemon=True)
         self._mapping_thread.start()
         return True
 
@@ -270,6 +299,9 @@ class DualSenseToX360Mapper:
         停止映射循环，并关闭 DualSense 设备、重置虚拟手柄。
         """
         self._stop_event.set()
+        if self._engine is not None:
+            self._engine.remove(self)
+            self._engine = None
         if self._mapping_thread:
             self._mapping_thread.join(timeout=0)
         self._cleanup()
@@ -278,14 +310,15 @@ class DualSenseToX360Mapper:
         """
         清理工作：关闭 DualSense 设备、重置虚拟手柄并提交更新
         """
-        if self._hid_device:
+        if self._backend_open:
             try:
-                self._hid_device.close()
+                self.backend.close()
                 sys.stdout.write("\n>>> DualSense 设备已关闭。")
+                sys.stdout.write("\n" + self.backend.stats())
             except Exception:
                 pass
             finally:
-                self._hid_device = None
+                self._backend_open = False
 
         if self.virtual_gamepad:
             try:
@@ -303,18 +336,19 @@ class DualSenseToX360Mapper:
 class DualSenseToDS4Mapper:
     """
     DualSenseToDS4Mapper 类：
-    - 使用 pywinusb.hid 读取 DualSense 控制器的原始 HID 输入
+    - 通过输入后端（modules.hid_input，默认 pywinusb）读取 DualSense 控制器的原始 HID 输入
     - 使用 vgamepad 创建虚拟 DualShock 4 手柄，并将 DualSense 输入映射到虚拟手柄
     - 提供 start() 和 stop() 方法，方便在外部控制映射循环的启动和停止
     """
 
-    def __init__(self, product_id: int, path: str):
+    def __init__(self, product_id: int, path: str, backend=None):
         """
         初始化 DualSenseToDS4Mapper。
 
         :param vendor_id: DualSense 供应商 ID，默认使用 Sony（0x054C）
         :param product_id: DualSense 产品 ID，默认使用 DualSense Edge（0x0DF2）
         :param poll_interval: 映射循环的轮询间隔（秒）
+        :param backend: 输入后端（InputBackend），为 None 时由 create_input_backend 选择
         """
         self.vendor_id = 0x054c
         self.product_id = product_id
@@ -338,11 +372,23 @@ class DualSenseToDS4Mapper:
         self.rx_override = None
         self.ry_override = None
 
+        # 每次收到输入报告后调用 on_report(dual_sense_state)，为 None 时不调用
+        self.on_report = None
+
+        # 由 MappingEngine 驱动时，状态变化后调用 _wake() 通知引擎线程
+        self._engine = None
+        self._wake = None
+
+        # 帧龄统计（FrameAgeTracker）；_pending_stamp 为 (截图时间, 写入偏移时间)，提交虚拟手柄后清空
+        self.frame_age = None
+        self._pending_stamp = None
+
         # 虚拟 Xbox 360 手柄对象（使用 vgamepad）
         self.virtual_gamepad = vg.VDS4Gamepad()
 
-        # DualSense 设备对象（pywinusb.hid.HidDevice），方便后续关闭
-        self._hid_device = None
+        # 输入后端，打开后把原始报告交给 _input_handler，方便后续关闭
+        self.backend = backend or create_input_backend(self.vendor_id, product_id, path)
+        self._backend_open = False
 
         # 线程控制
         self._mapping_thread = None
@@ -350,59 +396,59 @@ class DualSenseToDS4Mapper:
 
     def _input_handler(self, data: bytearray):
         """
-        PyWinUSB 的回调函数。当 DualSense 有新输入时调用。
+        输入后端的回调函数。当 DualSense 有新输入时调用。
 
         :param data: bytearray，长度因设备而异
         """
-        # 基本检查
-        if len(data) < 11:  # 修改为11以包含新的数据位
+        HID_REPORTS.inc()
+        if not parse_dualsense_report(data, self.dual_sense_state):
             return
 
-        # 更新摇杆和扳机状态
-        self.dual_sense_state["lx"] = data[1]
-        self.dual_sense_state["ly"] = data[2]
-        self.dual_sense_state["rx"] = data[3]
-        self.dual_sense_state["ry"] = data[4]
-        self.dual_sense_state["lt"] = data[5]
-        self.dual_sense_state["rt"] = data[6]
-
-        # 更新按钮掩码，高字节在 data[9]，低字节在 data[8]
-        self.dual_sense_state["shoulders_sticks_share_options"] = data[9]
-        self.dual_sense_state["buttons_dpad"] = data[8]
-        
-        # 更新触控板和PS键状态
-        self.dual_sense_state["touchpad_ps"] = data[10]
-
-    def _find_and_register_dualsense(self) -> bool:
+        # 通知外部（如智慧核心的需求调度器）有新的输入报告
+        if self.on_report is not None:
+            self.on_report(self.dual_sense_state)
+        if self._wake is not None:
+            self._wake()
+
+    def _find_and_register_dualsense(self, handler=None) -> bool:
         """
-        查找并打开 DualSense 设备，注册输入回调。
+        通过输入后端打开 DualSense 设备，注册输入回调。
 
+        :param handler: 自定义回调，默认为 _input_handler
         :return: 如果成功找到并注册 DualSense，返回 True；否则返回 False
         """
-        all_devices = hid.HidDeviceFilter(
-            vendor_id=self.vendor_id,
-            product_id=self.product_id,
-            path=self.path
-        ).get_devices()
-
-        if not all_devices:
+        if not self.backend.open(handler or self._input_handler):
             sys.stdout.write("\n>>> 未找到 DualSense 设备，请检查手柄是否连接。")
             return False
-
-        # 只打开第一个匹配的 DualSense 设备
-        self._hid_device = all_devices[0]
-        self._hid_device.open()
-        # 注册回调，将收到的新数据传给 _input_handler 方法
-        self._hid_device.set_raw_data_handler(lambda data: self._input_handler(data))
-        sys.stdout.write(f"\n>>> 已连接并注册 DualSense (VID:0x{self.vendor_id:04X}, PID:0x{self.product_id:04X})")
+        self._backend_open = True
+        sys.stdout.write(
+            f"\n>>> 已连接并注册 DualSense (VID:0x{self.vendor_id:04X}, PID:0x{self.product_id:04X}，"
+            f"输入后端：{self.backend.name})"
+        )
         return True
 
-    def add_rx_ry_offset(self, dx: int = 0, dy: int = 0):
-        """在原始值上添加偏移量"""
+    def add_rx_ry_offset(self, dx: int = 0, dy: int = 0, capture_time: float = None):
+        """在原始值上添加偏移量；capture_time 为偏移所依据的帧的截图时间，用于统计帧龄"""
         rx = self.dual_sense_state["rx"]
         ry = self.dual_sense_state["ry"]
         self.rx_override = median_of_three(rx + dx, 255, 0)
         self.ry_override = median_of_three(ry + dy, 255, 0)
+        if capture_time is not None:
+            self._pending_stamp = (capture_time, time.perf_counter())
+        if self._wake is not None:
+            self._wake()
+
+    def update(self):
+        """把当前状态提交到虚拟手柄一次。"""
+        self._map_to_ds4()
+        self._report_frame_age()
+
+    def _report_frame_age(self):
+        stamp = self._pending_stamp
+        if stamp is not None:
+            self._pending_stamp = None
+            if self.frame_age is not None:
+                self.frame_age.delivered(stamp[0], stamp[1], time.perf_counter())
 
     def _map_to_ds4(self):
         """
@@ -515,34 +561,48 @@ class DualSenseToDS4Mapper:
         # 最后送出报告
         self.virtual_gamepad.update()
 
-    def start(self):
+    def start(self, engine=None):
         """
         启动映射循环：
         1. 查找并注册 DualSense
         2. 创建虚拟手柄（已在 __init__ 中创建）
-        3. 启动一个后台线程，不断将 DualSense 输入映射到虚拟手柄
+        3. 给出 engine（MappingEngine）时交由引擎线程按输入报告驱动，
+           否则启动一个后台线程，不断将 DualSense 输入映射到虚拟手柄
         """
         if not self._find_and_register_dualsense():
             return False
 
         sys.stdout.write("\n>>> 虚拟 DualShock 4 手柄已创建。DualSense 的输入将直接映射到虚拟手柄上。")
 
+        if engine is not None:
+            self._engine = engine
+            engine.add(self, name=self.path)
+            return True
+
         # 重置（防止多次调用 start）
         self._stop_event.clear()
 
         # 后台线程负责循环映射
         def run_loop():
+            get_placement().apply("mapper")
             try:
+                last = time.perf_counter()
                 while not self._stop_event.is_set():
-                    self._map_to_ds4()
+                    self.update()
+                    VPAD_UPDATES.inc()
                     time.sleep(self.poll_interval)
+                    now = time.perf_counter()
+                    # 单次循环超过两倍轮询间隔视为超时
+                    if now - last > 2 * self.poll_interval:
+                        MAPPER_OVERRUNS.inc()
+                    last = now
             except Exception as e:
                 sys.stdout.write(f">>> 映射循环遇到异常：")
                 sys.stdout.write(f"发生异常：{str(e)}")
                 sys.stdout.write(f"异常类型：{type(e).__name__}")
                 sys.stdout.write(f"完整堆栈信息：\n{traceback.format_exc()}")
 
-        self._mapping_thread = threading.Thread(target=run_loop, daemon=True)
+        self._mapping_thread = threading.Thread(target=run_loop, name="mapper", daemon=True)
         self._mapping_thread.start()
         return True
 
@@ -551,6 +611,9 @@ class DualSenseToDS4Mapper:
         停止映射循环，并关闭 DualSense 设备、重置虚拟手柄。
         """
         self._stop_event.set()
+        if self._engine is not None:
+            self._engine.remove(self)
+            self._engine = None
         if self._mapping_thread:
             self._mapping_thread.join(timeout=0)
         self._cleanup()
@@ -559,14 +622,15 @@ class DualSenseToDS4Mapper:
         """
         清理工作：关闭 DualSense 设备、重置虚拟手柄并提交更新
         """
-        if self._hid_device:
+        if self._backend_open:
             try:
-                self._hid_device.close()
+                self.backend.close()
                 sys.stdout.write("\n>>> DualSense 设备已关闭。")
+                sys.stdout.write("\n" + self.backend.stats())
             except Exception:
                 pass
             finally:
-                self._hid_device = None
+                self._backend_open = False
 
         if self.virtual_gamepad:
             try:
@@ -597,13 +661,10 @@ if __name__ == "__main__":
         print("Raw HID data:", list(data))
         mapper._input_handler(data)
 
-    # 找设备并注册
-    if not mapper._find_and_register_dualsense():
+    # 找设备并以 debug_handler 注册
+    if not mapper._find_and_register_dualsense(debug_handler):
         sys.exit(1)
 
-    # 覆盖原始 handler 为 debug_handler
-    mapper._hid_device.set_raw_data_handler(debug_handler)
-
     print(">>> 开始读取 DualSense 原始数据，按 Ctrl+C 停止")
     try:
         # 保持主线程存活
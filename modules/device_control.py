@@ -0,0 +1,450 @@
+import ctypes
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+
+# PnP 设备状态，与 Get-PnpDevice 的 Status 字段保持一致
+STATUS_OK = "OK"
+STATUS_DISABLED = "Disabled"
+STATUS_ERROR = "Error"
+STATUS_UNKNOWN = "Unknown"
+
+
+class DeviceControlError(RuntimeError):
+    pass
+
+
+class DeviceControlBackend:
+    """
+    设备控制后端接口：禁用/启用 PnP 设备并等待其状态变化。
+    """
+
+    name = "base"
+
+    def disable(self, instance_id: str):
+        raise NotImplementedError
+
+    def enable(self, instance_id: str):
+        raise NotImplementedError
+
+    def status(self, instance_id: str) -> str:
+        raise NotImplementedError
+
+    def wait_for(self, instance_id: str, statuses: tuple, timeout: float) -> str:
+        """
+        等待设备进入 statuses 中的任一状态。
+
+        :return: 最终状态；超时抛出 DeviceControlError
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class CfgMgrBackend(DeviceControlBackend):
+    """
+    基于 CfgMgr32 的原生后端（需要管理员权限）。
+    CM_Disable_DevNode / CM_Enable_DevNode 在设备完成状态切换后才返回；
+    wait_for 通过 CM_Register_Notification 订阅该设备实例的通知，在回调唤醒时检查状态，
+    不再按固定间隔轮询。注册失败时退化为每 10 ms 检查一次。
+    """
+
+    name = "cfgmgr32"
+
+    CR_SUCCESS = 0
+    CM_LOCATE_DEVNODE_NORMAL = 0
+    CM_DISABLE_UI_NOT_OK = 0x4
+    DN_STARTED = 0x8
+    DN_HAS_PROBLEM = 0x400
+    CM_PROB_DISABLED = 22
+    CM_NOTIFY_FILTER_TYPE_DEVICEINSTANCE = 2
+    MAX_DEVICE_ID_LEN = 200
+    # 已订阅通知时的兜底检查间隔（防止漏掉通知）；未订阅时的轮询间隔
+    NOTIFY_FALLBACK = 0.25
+    POLL_INTERVAL = 0.01
+
+    def __init__(self):
+        self._cfgmgr = ctypes.WinDLL("cfgmgr32")
+
+        class NotifyFilter(ctypes.Structure):
+            # CM_NOTIFY_FILTER，联合体只使用 DeviceInstance 分支（联合体按 HANDLE 8 字节对齐）
+            _fields_ = [
+                ("cbSize", ctypes.c_uint32),
+                ("Flags", ctypes.c_uint32),
+                ("FilterType", ctypes.c_uint32),
+                ("Reserved", ctypes.c_uint32),
+                ("InstanceId", ctypes.c_wchar * self.MAX_DEVICE_ID_LEN),
+                ("_align", ctypes.c_uint64 * 0),
+            ]
+
+        self._filter_type = NotifyFilter
+        self._callback_type = ctypes.WINFUNCTYPE(
+            ctypes.c_uint32, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint32, ctypes.c_void_p, ctypes.c_uint32
+        )
+        self._cfgmgr.CM_Register_Notification.argtypes = [
+            ctypes.POINTER(NotifyFilter), ctypes.c_void_p, self._callback_type, ctypes.POINTER(ctypes.c_void_p)
+        ]
+        self._cfgmgr.CM_Unregister_Notification.argtypes = [ctypes.c_void_p]
+
+    def _locate(self, instance_id: str) -> int:
+        devinst = ctypes.c_uint32()
+        ret = self._cfgmgr.CM_Locate_DevNodeW(
+            ctypes.byref(devinst), ctypes.c_wchar_p(instance_id), self.CM_LOCATE_DEVNODE_NORMAL
+        )
+        if ret != self.CR_SUCCESS:
+            raise DeviceControlError(f"未找到设备 {instance_id}（CR={ret}）")
+        return devinst.value
+
+    def disable(self, instance_id: str):
+        ret = self._cfgmgr.CM_Disable_DevNode(self._locate(instance_id), self.CM_DISABLE_UI_NOT_OK)
+        if ret != self.CR_SUCCESS:
+            raise DeviceControlError(f"禁用设备失败（CR={ret}）")
+
+    def enable(self, instance_id: str):
+        ret = self._cfgmgr.CM_Enable_DevNode(self._locate(instance_id), 0)
+        if ret != self.CR_SUCCESS:
+            raise DeviceControlError(f"启用设备失败（CR={ret}）")
+
+    def status(self, instance_id: str) -> str:
+        status = ctypes.c_uint32()
+        problem = ctypes.c_uint32()
+        ret = self._cfgmgr.CM_Get_DevNode_Status(
+            ctypes.byref(status), ctypes.byref(problem), self._locate(instance_id), 0
+        )
+        if ret != self.CR_SUCCESS:
+            return STATUS_UNKNOWN
+        if status.value & self.DN_HAS_PROBLEM:
+            return STATUS_DISABLED if problem.value == self.CM_PROB_DISABLED else STATUS_ERROR
+        if status.value & self.DN_STARTED:
+            return STATUS_OK
+        return STATUS_UNKNOWN
+
+    def _register(self, instance_id: str, changed: threading.Event):
+        """订阅设备实例的 PnP 通知，回调中只置位 changed；返回 (句柄, 回调) 或 None。"""
+        def on_notify(handle, context, action, event_data, size):
+            changed.set()
+            return 0
+
+        callback = self._callback_type(on_notify)
+        notify_filter = self._filter_type()
+        notify_filter.cbSize = ctypes.sizeof(notify_filter)
+        notify_filter.FilterType = self.CM_NOTIFY_FILTER_TYPE_DEVICEINSTANCE
+        notify_filter.InstanceId = instance_id
+        handle = ctypes.c_void_p()
+        ret = self._cfgmgr.CM_Register_Notification(ctypes.byref(notify_filter), None, callback, ctypes.byref(handle))
+        if ret != self.CR_SUCCESS:
+            return None
+        # 回调对象必须在注销前保持存活
+        return handle, callback
+
+    def wait_for(self, instance_id: str, statuses: tuple, timeout: float) -> str:
+        changed = threading.Event()
+        registration = self._register(instance_id, changed)
+        interval = self.NOTIFY_FALLBACK if registration else self.POLL_INTERVAL
+        deadline = time.perf_counter() + timeout
+        try:
+            while True:
+                # 先清除再检查，检查之后到达的通知会让下一次 wait 立即返回
+                changed.clear()
+                current = self.status(instance_id)
+                if current in statuses:
+                    return current
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise DeviceControlError(f"等待设备状态 {statuses} 超时，当前为 {current}")
+                changed.wait(min(remaining, interval))
+        finally:
+            if registration:
+                self._cfgmgr.CM_Unregister_Notification(registration[0])
+
+
+class PowerShellSessionBackend(DeviceControlBackend):
+    """
+    基于常驻 PowerShell 会话的后端：正常情况下整个程序生命周期只启动一次 powershell 进程，
+    不再每 0.5 s 启动新的进程。状态等待仍是轮询，只是放在会话内部每 poll_ms 毫秒查询一次
+    Get-PnpDevice；需要事件驱动的等待请使用 CfgMgr32 后端（管理员权限）。
+    命令超时后会话中可能还有迟到的输出，此时结束并重启会话，避免下一条命令读到上一条的结果。
+    """
+
+    name = "powershell-session"
+
+    def __init__(self, poll_ms: int = 20):
+        self.poll_ms = poll_ms
+        self._lock = threading.Lock()
+        self._start()
+
+    def _start(self):
+        self._lines = queue.Queue()
+        self._proc = subprocess.Popen(
+            ["powershell", "-NoLogo", "-NoProfile", "-NonInteractive", "-Command", "-"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+        )
+        threading.Thread(target=self._reader, args=(self._proc, self._lines), daemon=True).start()
+
+    @staticmethod
+    def _reader(proc, lines):
+        # 每个会话有自己的队列，重启后旧会话的残留输出不会进入新队列
+        for line in proc.stdout:
+            lines.put(line.rstrip("\r\n"))
+        lines.put(None)
+
+    def _restart(self):
+        try:
+            self._proc.kill()
+        except OSError:
+            pass
+        self._start()
+
+    def _run(self, command: str, timeout: float = 30.0) -> list:
+        """在会话中执行单行命令，返回输出行。"""
+        marker = f"__TGC_END_{uuid.uuid4().hex}__"
+        with self._lock:
+            self._proc.stdin.write(f"{command}; Write-Output '{marker}'\n")
+            self._proc.stdin.flush()
+            output = []
+            deadline = time.perf_counter() + timeout
+            while True:
+                try:
+                    line = self._lines.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    self._restart()
+                    raise DeviceControlError(f"PowerShell 命令超时：{command}")
+                if line is None:
+                    self._restart()
+                    raise DeviceControlError("PowerShell 会话已退出。")
+                if line == marker:
+                    return output
+                output.append(line)
+
+    @staticmethod
+    def _quote(instance_id: str) -> str:
+        return "'" + instance_id.replace("'", "''") + "'"
+
+    def disable(self, instance_id: str):
+        self._run(f"Get-PnpDevice -InstanceId {self._quote(instance_id)} | Disable-PnpDevice -Confirm:$false")
+
+    def enable(self, instance_id: str):
+        self._run(f"Get-PnpDevice -InstanceId {self._quote(instance_id)} | Enable-PnpDevice -Confirm:$false")
+
+    def status(self, instance_id: str) -> str:
+        out = self._run(f"(Get-PnpDevice -InstanceId {self._quote(instance_id)}).Status")
+        return out[-1].strip() if out else STATUS_UNKNOWN
+
+    def wait_for(self, instance_id: str, statuses: tuple, timeout: float) -> str:
+        pattern = "^(" + "|".join(statuses) + ")$"
+        timeout_ms = int(timeout * 1000)
+        out = self._run(
+            f"$d = Get-PnpDevice -InstanceId {self._quote(instance_id)}; "
+            f"$t = [Diagnostics.Stopwatch]::StartNew(); "
+            f"while ($d.Status -notmatch '{pattern}' -and $t.ElapsedMilliseconds -lt {timeout_ms}) "
+            f"{{ Start-Sleep -Milliseconds {self.poll_ms}; $d = Get-PnpDevice -InstanceId {self._quote(instance_id)} }}; "
+            f"$d.Status",
+            timeout=timeout + 5,
+        )
+        current = out[-1].strip() if out else STATUS_UNKNOWN
+        if current not in statuses:
+            raise DeviceControlError(f"等待设备状态 {statuses} 超时，当前为 {current}")
+        return current
+
+    def close(self):
+        try:
+            self._proc.stdin.write("exit\n")
+            self._proc.stdin.flush()
+            self._proc.wait(timeout=2)
+        except Exception:
+            self._proc.kill()
+
+
+class FakeDeviceBackend(DeviceControlBackend):
+    """
+    用于测试的假后端：设备在调用 disable/enable 后经过设定的延迟切换状态，
+    wait_for 通过条件变量等待状态变化，可在 Linux 上验证切换流程的时序与状态机。
+    """
+
+    name = "fake"
+
+    def __init__(self, disable_delay: float = 0.05, enable_delay: float = 0.1, fail_enable: bool = False):
+        self.disable_delay = disable_delay
+        self.enable_delay = enable_delay
+        self.fail_enable = fail_enable
+        self.calls = []
+        self._states = {}
+        self._cond = threading.Condition()
+
+    def _transition(self, instance_id: str, target: str, delay: float):
+        def apply():
+            with self._cond:
+                self._states[instance_id] = target
+                self._cond.notify_all()
+        timer = threading.Timer(delay, apply)
+        timer.daemon = True
+        timer.start()
+
+    def disable(self, instance_id: str):
+        self.calls.append(("disable", instance_id))
+        self._transition(instance_id, STATUS_DISABLED, self.disable_delay)
+
+    def enable(self, instance_id: str):
+        self.calls.append(("enable", instance_id))
+        self._transition(instance_id, STATUS_ERROR if self.fail_enable else STATUS_OK, self.enable_delay)
+
+    def status(self, instance_id: str) -> str:
+        with self._cond:
+            return self._states.get(instance_id, STATUS_OK)
+
+    def wait_for(self, instance_id: str, statuses: tuple, timeout: float) -> str:
+        with self._cond:
+            ok = self._cond.wait_for(
+                lambda: self._states.get(instance_id, STATUS_OK) in statuses, timeout
+            )
+            current = self._states.get(instance_id, STATUS_OK)
+        if not ok:
+            raise DeviceControlError(f"等待设备状态 {statuses} 超时，当前为 {current}")
+        return current
+
+
+class DeviceReenabler:
+    """
+    “拔出再插入”设备的状态机：idle -> disabling -> disabled -> enabling -> ready，
+    任一步骤出错进入 failed。记录每个阶段的耗时。
+    """
+
+    def __init__(self, backend: DeviceControlBackend, timeout: float = 10.0, on_state=None):
+        """
+        :param backend: 设备控制后端
+        :param timeout: 每次等待状态变化的超时时间（秒）
+        :param on_state: 状态变化回调 on_state(state)，可为 None
+        """
+        self.backend = backend
+        self.timeout = timeout
+        self.on_state = on_state
+        self.state = "idle"
+        self.timings = {}
+
+    def _set_state(self, state: str):
+        self.state = state
+        if self.on_state is not None:
+            self.on_state(state)
+
+    def run(self, instance_id: str) -> dict:
+        """
+        执行一次禁用再启用，返回各阶段耗时（毫秒）。失败时抛出 DeviceControlError。
+        """
+        self.timings = {}
+        start = time.perf_counter()
+        last = start
+
+        def lap(name):
+            nonlocal last
+            now = time.perf_counter()
+            self.timings[name] = (now - last) * 1000
+            last = now
+
+        try:
+            self._set_state("disabling")
+            self.backend.disable(instance_id)
+            lap("disable")
+            # Error 也视为已拔出，与原 PowerShell 轮询逻辑一致
+            self.backend.wait_for(instance_id, (STATUS_DISABLED, STATUS_ERROR), self.timeout)
+            lap("wait_disabled")
+            self._set_state("disabled")
+
+            self._set_state("enabling")
+            self.backend.enable(instance_id)
+            lap("enable")
+            self.backend.wait_for(instance_id, (STATUS_OK,), self.timeout)
+            lap("wait_ready")
+            self._set_state("ready")
+        except Exception:
+            self._set_state("failed")
+            raise
+        finally:
+            self.timings["total"] = (time.perf_counter() - start) * 1000
+        return self.timings
+
+
+def create_backend() -> DeviceControlBackend:
+    """
+    选择设备控制后端：环境变量 TGC_DEVICE_BACKEND 可强制指定（cfgmgr32 / powershell / fake）；
+    否则在 Windows 管理员权限下使用 CfgMgr32，其余情况使用常驻 PowerShell 会话，非 Windows 使用假后端。
+    """
+    choice = os.environ.get("TGC_DEVICE_BACKEND", "").lower()
+    if choice == "fake" or (not choice and sys.platform != "win32"):
+        return FakeDeviceBackend()
+    if choice == "powershell":
+        return PowerShellSessionBackend()
+    if choice == "cfgmgr32":
+        return CfgMgrBackend()
+    try:
+        if ctypes.windll.shell32.IsUserAnAdmin():
+            return CfgMgrBackend()
+    except Exception:
+        pass
+    return PowerShellSessionBackend()
+
+
+def self_check():
+    """
+    用假后端验证 DeviceReenabler 的状态机与超时（可在 Linux 上运行）：
+    正常切换、启用后进入 Error、等待超时三种情况，任一断言失败即抛出 AssertionError。
+    """
+    instance_id = "HID\\VID_054C&PID_0CE6\\FAKE"
+
+    # 正常流程：依次经过全部状态，各阶段耗时与假后端的延迟一致
+    states = []
+    backend = FakeDeviceBackend(disable_delay=0.05, enable_delay=0.1)
+    timings = DeviceReenabler(backend, timeout=1.0, on_state=states.append).run(instance_id)
+    assert states == ["disabling", "disabled", "enabling", "ready"], states
+    assert backend.calls == [("disable", instance_id), ("enable", instance_id)], backend.calls
+    assert backend.status(instance_id) == STATUS_OK
+    assert set(timings) == {"disable", "wait_disabled", "enable", "wait_ready", "total"}, timings
+    assert 40 <= timings["wait_disabled"] < 500, timings
+    assert 90 <= timings["wait_ready"] < 500, timings
+
+    # 启用后设备进入 Error：等待 OK 超时，状态机进入 failed
+    states = []
+    backend = FakeDeviceBackend(disable_delay=0.01, enable_delay=0.01, fail_enable=True)
+    reenabler = DeviceReenabler(backend, timeout=0.2, on_state=states.append)
+    try:
+        reenabler.run(instance_id)
+        raise AssertionError("启用失败时应抛出 DeviceControlError")
+    except DeviceControlError:
+        pass
+    assert states == ["disabling", "disabled", "enabling", "failed"], states
+    assert reenabler.state == "failed"
+    assert backend.status(instance_id) == STATUS_ERROR
+    assert "wait_ready" not in reenabler.timings and "total" in reenabler.timings, reenabler.timings
+
+    # 禁用比超时慢：在等待拔出阶段超时，不再调用 enable
+    states = []
+    backend = FakeDeviceBackend(disable_delay=0.5, enable_delay=0.01)
+    reenabler = DeviceReenabler(backend, timeout=0.1, on_state=states.append)
+    start = time.perf_counter()
+    try:
+        reenabler.run(instance_id)
+        raise AssertionError("等待超时时应抛出 DeviceControlError")
+    except DeviceControlError:
+        pass
+    elapsed = time.perf_counter() - start
+    assert states == ["disabling", "failed"], states
+    assert backend.calls == [("disable", instance_id)], backend.calls
+    assert 0.09 <= elapsed < 0.4, elapsed
+    return timings
+
+
+if __name__ == "__main__":
+    # python -m modules.device_control
+    timings = self_check()
+    for name, ms in timings.items():
+        print(f"{name:<14}{ms:8.1f} ms")
+    print(">>> DeviceReenabler 状态机检查通过。")
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import onnxruntime
+
+from utils.model_catalog import get_catalog
+
+
+CACHE_PATH = "ep_cache.json"
+# 不承担本地计算的 EP，不参与测试
+SKIPPED_PROVIDERS = {"AzureExecutionProvider"}
+
+
+def model_hash(model_path):
+    """模型文件的 SHA-256，用作缓存键的一部分（由模型目录缓存，文件未变时不重复计算）。"""
+    return get_catalog().get_hash(model_path)
+
+
+def hardware_fingerprint():
+    """
+    生成硬件与运行时指纹：CPU、核心数、系统版本、onnxruntime 版本及可用 EP。
+    任何一项变化（换卡、升级驱动包）都会使缓存失效。
+    """
+    parts = [
+        platform.machine(),
+        platform.processor(),
+        platform.system(),
+        platform.release(),
+        str(os.cpu_count()),
+        onnxruntime.__version__,
+        ",".join(onnxruntime.get_available_providers()),
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _synthetic_input(session):
+    """按模型输入形状生成随机输入，动态维度 batch 取 1，空间维度取 320。"""
+    inp = session.get_inputs()[0]
+    shape = []
+    for i, dim in enumerate(inp.shape):
+        if isinstance(dim, int) and dim > 0:
+            shape.append(dim)
+        else:
+            shape.append(1 if i == 0 else 320)
+    dtype = np.float16 if "float16" in inp.type else np.float32
+    return {inp.name: np.random.rand(*shape).astype(dtype)}
+
+
+def _candidates():
+    """
+    枚举待测配置：每个可用 EP 一项，CPU EP 额外尝试不同的 intra-op 线程数。
+    非 CPU EP 始终以 CPU 兜底，与 APV5Experimental 的默认行为一致。
+    """
+    cpu_count = os.cpu_count() or 1
+    thread_options = sorted({0, 1, max(1, cpu_count // 2), cpu_count})
+    candidates = []
+    for provider in onnxruntime.get_available_providers():
+        if provider in SKIPPED_PROVIDERS:
+            continue
+        if provider == "CPUExecutionProvider":
+            for threads in thread_options:
+                candidates.append((["CPUExecutionProvider"], threads))
+        else:
+            candidates.append(([provider, "CPUExecutionProvider"], 0))
+    return candidates
+
+
+def make_session_options(intra_op_num_threads=0):
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = intra_op_num_threads
+    return options
+
+
+def measure(model_path, providers, intra_op_num_threads=0, warmup=10, runs=50):
+    """
+    创建会话并以合成输入测量 run 延迟。
+
+    :return: 延迟数组（毫秒）；会话实际未使用请求的首选 EP 时返回 None
+    """
+    session = onnxruntime.InferenceSession(
+        model_path,
+        sess_options=make_session_options(intra_op_num_threads),
+        providers=providers
+    )
+    # EP 初始化失败时 onnxruntime 会静默退回 CPU，此时结果与 CPU 候选重复
+    if session.get_providers()[0] != providers[0]:
+        return None
+    feed = _synthetic_input(session)
+    for _ in range(warmup):
+        session.run(None, feed)
+    latencies = np.empty(runs)
+    for i in range(runs):
+        start = time.perf_counter()
+        session.run(None, feed)
+        latencies[i] = (time.perf_counter() - start) * 1000
+    return latencies
+
+
+def probe(model_path, warmup=10, runs=50):
+    """
+    依次测量所有候选配置，返回按 p95 延迟升序排列的结果列表。
+    """
+    results = []
+    for providers, threads in _candidates():
+        try:
+            latencies = measure(model_path, providers, threads, warmup, runs)
+        except Exception as e:
+            sys.stdout.write(f"\n>>> EP {providers[0]}（线程 {threads}）测试失败：{e}")
+            continue
+        if latencies is None:
+            continue
+        results.append({
+            "providers": providers,
+            "intra_op_num_threads": threads,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+        })
+    results.sort(key=lambda r: r["p95_ms"])
+    return results
+
+
+def _load_cache(cache_path):
+    if not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def select_provider(model_path, cache_path=CACHE_PATH, force=False):
+    """
+    返回模型在本机上最快的 EP 配置，优先读取缓存。
+
+    :return: (配置字典, 是否命中缓存)；配置含 providers、intra_op_num_threads、p95_ms
+    """
+    key = f"{model_hash(model_path)}:{hardware_fingerprint()}"
+    cache = _load_cache(cache_path)
+    if not force and key in cache:
+        get_catalog().record_latency(model_path, cache[key]["p95_ms"], cache[key]["providers"][0])
+        return cache[key], True
+
+    results = probe(model_path)
+    if not results:
+        raise RuntimeError("没有可用的 Execution Provider。")
+    best = results[0]
+    best["candidates"] = [
+        {k: r[k] for k in ("providers", "intra_op_num_threads", "p95_ms")} for r in results
+    ]
+    cache[key] = best
+    with open(cache_path, "w") as f:
+        json.dump(cache, f, indent=4)
+    get_catalog().record_latency(model_path, best["p95_ms"], best["providers"][0])
+    return best, False
+
+
+if __name__ == "__main__":
+    choice, cached = select_provider(sys.argv[1] if len(sys.argv) > 1 else "apv5.onnx", force=True)
+    for r in choice["candidates"]:
+        print(f"{r['providers'][0]:<28} threads={r['intra_op_num_threads']:<3} p95={r['p95_ms']:.3f} ms")
@@ -0,0 +1,277 @@
+import os
+import sys
+import threading
+import time
+
+from utils.placement import get_placement
+
+
+REPORT_MIN_LENGTH = 11
+
+
+def parse_dualsense_report(data, state: dict) -> bool:
+    """
+    解析 DualSense 输入报告并原地更新 state，所有输入后端共用。
+
+    :return: 报告长度不足时返回 False，state 不变
+    """
+    if len(data) < REPORT_MIN_LENGTH:
+        return False
+    # 摇杆和扳机
+    state["lx"] = data[1]
+    state["ly"] = data[2]
+    state["rx"] = data[3]
+    state["ry"] = data[4]
+    state["lt"] = data[5]
+    state["rt"] = data[6]
+    # 按钮掩码，高字节在 data[9]，低字节在 data[8]
+    state["shoulders_sticks_share_options"] = data[9]
+    state["buttons_dpad"] = data[8]
+    # 触控板和PS键
+    state["touchpad_ps"] = data[10]
+    return True
+
+
+class InputBackend:
+    """
+    HID 输入后端接口：打开设备后把每个原始报告交给 handler(data)。
+    子类在收到报告时调用 _dispatch，由其统计报告数、丢弃数与分发延迟。
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.handler = None
+        self.reports = 0
+        self.dropped = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def open(self, handler) -> bool:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def _dispatch(self, data, received: float) -> bool:
+        """把报告交给 handler；received 为后端拿到报告的 perf_counter 时间。"""
+        if len(data) < REPORT_MIN_LENGTH:
+            self.dropped += 1
+            return False
+        self.reports += 1
+        self.handler(data)
+        latency = time.perf_counter() - received
+        self.latency_total += latency
+        if latency > self.latency_max:
+            self.latency_max = latency
+        return True
+
+    def stats(self) -> str:
+        avg = self.latency_total / self.reports * 1e6 if self.reports else 0.0
+        return (
+            f"[Input] {self.name}: reports {self.reports}, dropped {self.dropped}, "
+            f"batches {self.batches} (max {self.max_batch}), "
+            f"dispatch avg {avg:.1f} us / max {self.latency_max * 1e6:.1f} us"
+        )
+
+
+class PyWinUsbBackend(InputBackend):
+    """pywinusb 回调：报告在 pywinusb 内部线程中到达，无法控制其缓冲与调度。"""
+
+    name = "pywinusb"
+
+    def __init__(self, vendor_id: int, product_id: int, path: str):
+        super().__init__()
+        self.vendor_id = vendor_id
+        self.product_id = product_id
+        self.path = path
+        self._device = None
+
+    def open(self, handler) -> bool:
+        import pywinusb.hid as hid
+
+        devices = hid.HidDeviceFilter(
+            vendor_id=self.vendor_id,
+            product_id=self.product_id,
+            path=self.path
+        ).get_devices()
+        if not devices:
+            return False
+        self.handler = handler
+        # 只打开第一个匹配的设备
+        self._device = devices[0]
+        self._device.open()
+        self._device.set_raw_data_handler(self._on_data)
+        return True
+
+    def _on_data(self, data):
+        self.batches += 1
+        self.max_batch = max(self.max_batch, 1)
+        self._dispatch(data, time.perf_counter())
+
+    def close(self):
+        if self._device is not None:
+            try:
+                self._device.close()
+            finally:
+                self._device = None
+
+
+class HidApiBackend(InputBackend):
+    """
+    hidapi（pip 包 hidapi，模块名 hid）：
+    - 专用线程阻塞等待下一个报告（带超时，便于退出）
+    - 收到报告后以非阻塞方式把系统缓冲中排队的报告一次取完，按顺序逐个解析
+    - 读取出错视为设备断开，计入 dropped 并结束读取线程
+    """
+
+    name = "hidapi"
+
+    def __init__(self, vendor_id: int, product_id: int, path: str,
+                 report_size: int = 64, timeout_ms: int = 100, max_batch: int = 32):
+        super().__init__()
+        self.vendor_id = vendor_id
+        self.product_id = product_id
+        self.path = path
+        self.report_size = report_size
+        self.timeout_ms = timeout_ms
+        self.batch_limit = max_batch
+        self._device = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def open(self, handler) -> bool:
+        import hid
+
+        device = hid.device()
+        try:
+            if self.path:
+                device.open_path(self.path.encode() if isinstance(self.path, str) else self.path)
+            else:
+                device.open(self.vendor_id, self.product_id)
+        except (IOError, OSError):
+            return False
+        # 非阻塞模式下 read(n) 立即返回，read(n, timeout_ms) 仍按超时阻塞
+        device.set_nonblocking(1)
+        self.handler = handler
+        self._device = device
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._read_loop, name="hid-input", daemon=True)
+        self._thread.start()
+        return True
+
+    def _read_loop(self):
+        get_placement().apply("hid")
+        device = self._device
+        size = self.report_size
+        try:
+            while not self._stop_event.is_set():
+                data = device.read(size, self.timeout_ms)
+                if not data:
+                    continue
+                received = time.perf_counter()
+                batch = 1
+                self._dispatch(data, received)
+                while batch < self.batch_limit:
+                    data = device.read(size)
+                    if not data:
+                        break
+                    batch += 1
+                    self._dispatch(data, received)
+                self.batches += 1
+                if batch > self.max_batch:
+                    self.max_batch = batch
+        except (IOError, OSError, ValueError) as e:
+            if not self._stop_event.is_set():
+                self.dropped += 1
+                sys.stdout.write(f"\n>>> HID 读取出错，输入已停止：{e}")
+
+    def close(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout_ms / 1000 * 2)
+            self._thread = None
+        if self._device is not None:
+            self._device.close()
+            self._device = None
+
+
+class FakeInputBackend(InputBackend):
+    """
+    假后端：以 rate_hz 的频率循环回放 reports（默认为摇杆缓慢转动的合成报告），
+    也可通过 inject() 手动投递。用于在没有手柄或非 Windows 环境下运行映射与基准。
+    """
+
+    name = "fake"
+
+    def __init__(self, reports=None, rate_hz: float = 250.0):
+        super().__init__()
+        self.rate_hz = rate_hz
+        self._reports = reports or [self._synthetic(i) for i in range(256)]
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def _synthetic(i: int) -> bytes:
+        report = bytearray(64)
+        report[0] = 0x01
+        report[1:5] = bytes((128, 128, i, 255 - i))
+        report[8] = 0x08  # D-Pad 无输入
+        return bytes(report)
+
+    def open(self, handler) -> bool:
+        self.handler = handler
+        if self.rate_hz > 0:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._replay, name="hid-input", daemon=True)
+            self._thread.start()
+        return True
+
+    def _replay(self):
+        interval = 1 / self.rate_hz
+        next_time = time.perf_counter()
+        i = 0
+        while not self._stop_event.is_set():
+            self.inject(self._reports[i % len(self._reports)])
+            i += 1
+            next_time += interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def inject(self, data):
+        self.batches += 1
+        self.max_batch = max(self.max_batch, 1)
+        self._dispatch(data, time.perf_counter())
+
+    def close(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+
+def create_input_backend(vendor_id: int, product_id: int, path: str, choice: str = None) -> InputBackend:
+    """
+    选择输入后端：环境变量 TGC_INPUT_BACKEND 优先，其次为 choice（配置项 input_backend），
+    可选 pywinusb / hidapi / fake；未指定时 Windows 使用 pywinusb，其余平台使用 hidapi。
+    """
+    choice = (os.environ.get("TGC_INPUT_BACKEND") or choice or "").lower()
+    if choice == "fake":
+        return FakeInputBackend()
+    if choice == "hidapi" or (not choice and sys.platform != "win32"):
+        return HidApiBackend(vendor_id, product_id, path)
+    return PyWinUsbBackend(vendor_id, product_id, path)
+
+
+if __name__ == "__main__":
+    state = {}
+    backend = FakeInputBackend(rate_hz=1000)
+    backend.open(lambda data: parse_dualsense_report(data, state))
+    backend.inject(b"\x01\x02")  # 过短的报告计入 dropped
+    time.sleep(2)
+    backend.close()
+    print(state)
+    print(backend.stats())
@@ -1,11 +1,14 @@
 import tkinter as tk
 from tkinter import scrolledtext
 import json
+import os
 import sys
-import subprocess
+import threading
 
 from utils.tools import enum_hid_devices, find_model_files
 from utils.delay_stdout import DelayedStdoutRedirector
+from utils.hidhide import HidHideError, get_client
+from utils.model_catalog import get_catalog
 
 class InitApp:
     def __init__(self, root):
@@ -37,8 +40,12 @@ class InitApp:
             "detect_settings": {
                 "range": {"outer": 320, "middle": 320, "inner": 80},
                 "curve": {"outer": [0.2, 0.2], "inner": [0.05, 1.0]},
-                "hipfire_scale": 0.8
-            }
+                "hipfire_scale": 0.8,
+                "frame_cache": {"enabled": False, "pixel_threshold": 12, "sensitivity": 0.002, "max_stale_ms": 100}
+            },
+            # 可选：steady_state 为 true 时推理使用预分配缓冲区；gc.mode 可选 off / auto / freeze / scheduled
+            "steady_state": False,
+            "gc": {"mode": "off"}
         }
 
         # 开始手柄检测
@@ -53,7 +60,7 @@ class InitApp:
         return proposed_text == "" or proposed_text.isdigit()
 
     def _poll_controller(self):
-        devices = enum_hid_devices()
+        devices = enum_hid_devices(refresh=True)
         # 过滤出 Sony(0x054C) 和 Microsoft(0x045E) 设备
         filtered = [(name, vid, pid, path) for (name, vid, pid, path) in devices if vid in ("0x054c")]
         self.filtered_devices = filtered
@@ -70,9 +77,19 @@ class InitApp:
         if not files:
             sys.stdout.write(">>> 未找到模型文件，请放入当前目录后回车重试。")
         else:
+            catalog = get_catalog()
+            fastest = catalog.fastest(files)
             sys.stdout.write(f">>> 检测到 {len(files)} 个模型文件：")
             for i, f in enumerate(files):
-                sys.stdout.write(f"[{i}] {f}")
+                meta = catalog.metadata(f)
+                info = f"{meta.get('size', 0) / 1024 / 1024:.1f} MB"
+                if meta.get("latency_ms") is not None:
+                    info += f"，p95 {meta['latency_ms']:.2f} ms（{meta.get('provider', '?')}）"
+                if f == fastest:
+                    info += "，最快"
+                sys.stdout.write(f"[{i}] {f}（{info}）")
+            # 后台补全哈希与输入形状，不阻塞选择界面
+            threading.Thread(target=catalog.fill_metadata, daemon=True).start()
             sys.stdout.write(">>> 请输入要使用的模型编号（留空则刷新）：")
             self.model_files = files
 
@@ -90,13 +107,15 @@ class InitApp:
                 self.config["controller"]["Product_ID"] = pid
                 self.config["controller"]["Instance_ID"] = "HID\\" + "\\".join(path.split("#")[1:-1])
                 self.config["controller"]["Path"] = path
-                subprocess.run(
-                    [
-                        "C:/Program Files/Nefarius Software Solutions/HidHide/x64/HidHideCLI.exe", 
-                        "--dev-hide", 
-                        self.config["controller"]["Instance_ID"]
-                    ]
-                )
+                try:
+                    # 再次注册本程序后隐藏手柄，两个写操作合并为一次 CLI 调用
+                    client = get_client()
+                    with client.batch():
+                        client.app_reg(os.path.abspath(sys.executable))
+                        client.dev_hide(self.config["controller"]["Instance_ID"])
+                except HidHideError as e:
+                    sys.stdout.write(f">>> 隐藏手柄失败：{e}")
+                    return
                 sys.stdout.write(">>> 手柄配置完成。")
                 sys.stdout.write(">>> 正在初始化模型配置...")
                 sys.stdout.write(">>> 开始枚举模型文件…")
@@ -0,0 +1,216 @@
+import sys
+import threading
+import time
+
+from utils.metrics import VPAD_UPDATES, MAPPER_OVERRUNS
+from utils.placement import get_placement
+
+
+class PadState:
+    """引擎中单个 物理手柄 -> 虚拟手柄 映射的状态与计数。"""
+
+    __slots__ = ("name", "mapper", "dirty", "pending_since", "last_update",
+                 "events", "updates", "errors", "max_latency")
+
+    def __init__(self, name, mapper):
+        self.name = name
+        self.mapper = mapper
+        self.dirty = False
+        self.pending_since = 0.0
+        self.last_update = 0.0
+        self.events = 0
+        self.updates = 0
+        self.errors = 0
+        self.max_latency = 0.0
+
+
+class MappingEngine:
+    """
+    MappingEngine 类：
+    - 在一个服务线程中驱动任意数量的映射器（DualSenseToDS4Mapper / DualSenseToX360Mapper）
+    - 映射器收到输入报告或右摇杆偏移变化时通过 _wake 标记为脏并唤醒线程，只更新脏的映射器，
+      同一映射器在一次处理前到达的多个报告合并为一次虚拟手柄更新
+    - 超过 keepalive 秒没有更新的映射器也会刷新一次，保证外部直接修改的状态最终生效
+    CPU 开销随报告频率增长，而不是随线程数增长。
+    """
+
+    def __init__(self, keepalive: float = 0.01):
+        self.keepalive = keepalive
+        self.pads = []
+        self.passes = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add(self, mapper, name: str = None) -> PadState:
+        pad = PadState(name or f"pad{len(self.pads)}", mapper)
+
+        def wake():
+            pad.events += 1
+            if not pad.dirty:
+                pad.pending_since = time.perf_counter()
+                pad.dirty = True
+                self._wake.set()
+
+        with self._lock:
+            self.pads = self.pads + [pad]
+        mapper._wake = wake
+        if self._thread is None:
+            self._start()
+        self._wake.set()
+        return pad
+
+    def remove(self, mapper):
+        # 持锁移除，保证返回后服务线程不会再调用该映射器
+        with self._lock:
+            self.pads = [p for p in self.pads if p.mapper is not mapper]
+        mapper._wake = None
+
+    def _start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="mapper-engine", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        get_placement().apply("mapper")
+        while not self._stop_event.is_set():
+            # 没有映射器时无限等待，不产生空转唤醒
+            self._wake.wait(self.keepalive if self.pads else None)
+            self._wake.clear()
+            start = time.perf_counter()
+            with self._lock:
+                for pad in self.pads:
+                    if not pad.dirty and start - pad.last_update < self.keepalive:
+                        continue
+                    was_dirty = pad.dirty
+                    pad.dirty = False
+                    try:
+                        pad.mapper.update()
+                    except Exception as e:
+                        pad.errors += 1
+                        if pad.errors == 1:
+                            sys.stdout.write(f"\n>>> 映射器 {pad.name} 更新时出错：{e}")
+                        continue
+                    now = time.perf_counter()
+                    pad.last_update = now
+                    pad.updates += 1
+                    VPAD_UPDATES.inc()
+                    if was_dirty:
+                        latency = now - pad.pending_since
+                        if latency > pad.max_latency:
+                            pad.max_latency = latency
+            self.passes += 1
+            if time.perf_counter() - start > self.keepalive:
+                MAPPER_OVERRUNS.inc()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def summary(self) -> str:
+        return "\n".join(
+            f"[Engine] {p.name}: events {p.events}, updates {p.updates}, errors {p.errors}, "
+            f"max report->update {p.max_latency * 1000:.2f} ms"
+            for p in self.pads
+        )
+
+
+class _BenchMapper:
+    """基准测试用映射器：与真实映射器相同的钩子，update() 模拟约 25 次 vgamepad 调用。"""
+
+    def __init__(self, threaded_poll: float = None):
+        self.state = bytearray(64)
+        self.updates = 0
+        self.buttons = 0
+        self._wake = None
+        self._poll = threaded_poll
+        self._stop_event = threading.Event()
+
+    def _input_handler(self, data):
+        self.state[:len(data)] = data
+        if self._wake is not None:
+            self._wake()
+
+    def _press(self, mask, pressed):
+        self.buttons = self.buttons | mask if pressed else self.buttons & ~mask
+
+    def update(self):
+        state = self.state
+        for i in range(1, 7):
+            self._press(1 << i, state[i] * 257 - 32768 > 0)
+        for bit in range(16):
+            self._press(1 << (bit + 8), (state[8] | state[9] << 8) & (1 << bit))
+        self.updates += 1
+
+    def start_thread(self):
+        # 旧实现：每个映射器一个 2 ms 轮询线程
+        def loop():
+            while not self._stop_event.is_set():
+                self.update()
+                time.sleep(self._poll)
+        threading.Thread(target=loop, name="mapper", daemon=True).start()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def _feed_reports(mappers, rate_hz, stop_event):
+    """模拟 HID 读取线程：以 rate_hz 的频率向每个映射器投递输入报告。"""
+    interval = 1 / rate_hz
+    report = bytearray(range(64))
+    next_time = time.perf_counter()
+    while not stop_event.is_set():
+        for m in mappers:
+            m._input_handler(report)
+        next_time += interval
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def benchmark(n_pads, rate_hz=250, seconds=3.0, engine_mode=True):
+    stop_event = threading.Event()
+    if engine_mode:
+        engine = MappingEngine()
+        mappers = [_BenchMapper() for _ in range(n_pads)]
+        for m in mappers:
+            engine.add(m)
+    else:
+        mappers = [_BenchMapper(threaded_poll=0.002) for _ in range(n_pads)]
+        for m in mappers:
+            m.start_thread()
+    feeder = threading.Thread(target=_feed_reports, args=(mappers, rate_hz, stop_event), daemon=True)
+    cpu0 = time.process_time()
+    feeder.start()
+    time.sleep(seconds)
+    cpu = time.process_time() - cpu0
+    stop_event.set()
+    feeder.join()
+    result = {"pads": n_pads, "mode": "engine" if engine_mode else "thread-per-pad",
+              "cpu_pct": cpu / seconds * 100, "threads": threading.active_count()}
+    result["updates_per_s"] = sum(m.updates for m in mappers) / seconds
+    if engine_mode:
+        engine.stop()
+        result["max_latency_ms"] = max(p.max_latency for p in engine.pads) * 1000
+    for m in mappers:
+        m.stop()
+    return result
+
+
+if __name__ == "__main__":
+    # 以 250 Hz（DualSense 蓝牙报告率）为每个手柄投递报告，对比单线程引擎与每手柄一个轮询线程
+    for engine_mode in (False, True):
+        for n in (1, 4, 8):
+            r = benchmark(n, engine_mode=engine_mode)
+            line = (
+                f"{r['mode']:<15} pads={r['pads']}  CPU {r['cpu_pct']:5.1f}%  "
+                f"threads {r['threads']}  updates/s {r['updates_per_s']:.0f}"
+            )
+            if engine_mode:
+                line += f"  max report->update {r['max_latency_ms']:.2f} ms"
+            print(line)
+            time.sleep(0.2)
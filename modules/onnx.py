@@ -2,108 +2,539 @@ import cv2
 import numpy as np
 import onnxruntime
 import json
+import sys
+import time
+
+from utils.detections import Detections
+from utils.detection_metrics import xywh_to_xyxy
+
+
+# tools.model_fuse 写入的模型元数据键，值为融合参数（JSON）
+FUSED_METADATA_KEY = "tgc_fused"
+
+
+def tile_offsets(size: int, tile: int, overlap: float):
+    """
+    沿一个方向均匀排布的分块起点：相邻块至少重叠 tile * overlap 像素，首尾两块贴齐边缘。
+    """
+    if size <= tile:
+        return [0]
+    step = tile * (1 - overlap)
+    n = int(np.ceil((size - tile) / step)) + 1
+    return np.linspace(0, size - tile, n).round().astype(int).tolist()
+
+
+class _PostprocessBuffers:
+    """
+    postprocess 的计算缓冲区，容量为单张图输出的行数，分配一次后每帧复用：
+    候选筛选、类别判定与 NMS 的中间结果都写在这里，返回的框与置信度是 result 的视图。
+    """
+
+    def __init__(self, capacity: int, width: int, dtype):
+        self.capacity = capacity
+        self.width = width
+        self.dtype = dtype
+        self.index = np.arange(capacity)
+        self.score = np.empty(capacity, dtype=dtype)
+        self.mask = np.empty(capacity, dtype=bool)
+        self.flags = np.empty(capacity, dtype=bool)
+        self.position = np.empty(capacity, dtype=np.int64)
+        # 多出的一个槽位收容 compact() 中的非候选行
+        self.picked = np.empty(capacity + 1, dtype=np.int64)
+        self.rows = np.empty((capacity, width), dtype=dtype)
+        self.cls = np.empty(capacity, dtype=np.int64)
+        # 候选框 xywh + 置信度
+        self.cand = np.empty((capacity, 5), dtype=dtype)
+        self.xyxy = np.empty((4, capacity), dtype=dtype)
+        self.area = np.empty(capacity, dtype=dtype)
+        self.scratch = np.empty((3, capacity), dtype=dtype)
+        self.keep = np.empty(capacity, dtype=np.int64)
+        self.result = np.empty((capacity, 5), dtype=dtype)
+
+    def fits(self, preds) -> bool:
+        return len(preds) <= self.capacity and preds.shape[1] == self.width and preds.dtype == self.dtype
+
+    def compact(self, mask, count: int):
+        """把 mask 为真的行号按升序写入 picked[:count]，相当于不分配数组的 np.flatnonzero。"""
+        n = len(mask)
+        position = self.position[:n]
+        np.copyto(position, mask)
+        np.cumsum(position, out=position)
+        np.subtract(position, 1, out=position)
+        np.logical_not(mask, out=self.flags[:n])
+        np.copyto(position, count, where=self.flags[:n])
+        np.put(self.picked, position, self.index[:n])
+        return self.picked[:count]
 
 
 class APV5Experimental:
-    def __init__(self, model_path):
+    def __init__(self, model_path, ident_size=None, providers=None, sess_options=None, max_detections=64):
         self.input_size = 320
         self.conf_thres = 0.4
         self.iou_thres = 0.9
         self.classes = 0
-        with open("user_config.json", "r") as f:
-            config = json.load(f)
-        self.ident_size = config["detect_settings"]["range"]["outer"]
+        if ident_size is None:
+            with open("user_config.json", "r") as f:
+                config = json.load(f)
+            ident_size = config["detect_settings"]["range"]["outer"]
+        self.ident_size = ident_size
+        self.model_path = model_path
         self.scale = self.ident_size / self.input_size
 
         self.session = onnxruntime.InferenceSession(
             model_path,
-            providers=[
+            sess_options=sess_options,
+            providers=providers or [
                 "DmlExecutionProvider",
                 "CPUExecutionProvider"
             ]
         )
         self.input_name = self.session.get_inputs()[0].name
+        batch_dim = self.session.get_inputs()[0].shape[0]
+        # 导出时固定了 batch 维度的模型只能按该大小组批
+        self.fixed_batch = batch_dim if isinstance(batch_dim, int) and batch_dim > 0 else None
+        # 空间维度为动态时才允许运行中调整输入分辨率
+        height_dim = self.session.get_inputs()[0].shape[2]
+        self.dynamic_size = not (isinstance(height_dim, int) and height_dim > 0)
         self.provider = self.session.get_providers()[0]
+        # tools.model_fuse 改写过的模型直接输出筛选后按置信度降序的候选行 [B, k, 6]，
+        # 融合了 NMS 时另有 nms_keep 输出
+        fused = self.session.get_modelmeta().custom_metadata_map.get(FUSED_METADATA_KEY)
+        self.fused = json.loads(fused) if fused else None
+        self.fused_nms = bool(self.fused and self.fused["nms"])
+        # 性能采样期间由 utils.profiler 挂上 StageTimer，平时为 None
+        self.stage_timer = None
+        # predict 每帧复用的结果缓冲区
+        self.detections = Detections(max_detections)
+        # predict 是否在返回的图像上画框；预览窗口（modules.preview）在自己的线程中绘制，默认不画
+        self.annotate = False
+        # 分块推理（enable_tiling），默认关闭
+        self.tiling = False
+        self.tile_overlap = 0.2
+        self.merge_thres = 0.6
+        self._tile_layout = None
+        # 级联检测的第一级（modules.cascade.FrameGate），为 None 时每帧都做完整检测
+        self.gate = None
+        # 预处理缓冲区（BGR->RGB 图像、缩放图像、输入张量），尺寸变化时重新分配
+        self._buffers = None
+        # 稳态模式（enable_steady_state）下输入输出绑定到预分配缓冲区
+        self.steady_state = False
+        self._binding = None
+        # 后处理缓冲区（_PostprocessBuffers），输出行数或列数变化时重新分配
+        self._post = None
+        if sess_options is not None and sess_options.intra_op_num_threads > 0:
+            self.provider += f" (threads={sess_options.intra_op_num_threads})"
+
+    def set_input_size(self, input_size: int):
+        """调整推理输入分辨率（需为 32 的倍数），仅支持空间维度为动态的模型。"""
+        if not self.dynamic_size:
+            raise ValueError("模型输入尺寸固定，无法调整输入分辨率")
+        self.input_size = input_size
+        self.scale = self.ident_size / self.input_size
+
+    def enable_tiling(self, overlap: float = 0.2, merge_thres: float = 0.6) -> bool:
+        """
+        开启分块推理：截图区域大于模型输入时不再整体缩小，而是切成若干相互重叠的输入尺寸小块，
+        在一次 batched session.run 中推理，各块的框平移回截图坐标后做跨块合并。
+        截图区域不大于模型输入时无需分块，返回 False。
+
+        :param overlap: 相邻块的最小重叠比例，小于该尺寸的目标总能完整落在某一块中
+        :param merge_thres: 跨块合并阈值，两个来自不同块的框交集占较小框面积的比例超过该值时只保留高分框
+        """
+        self.tiling = self.ident_size > self.input_size
+        self.tile_overlap = overlap
+        self.merge_thres = merge_thres
+        self._tile_layout = None
+        return self.tiling
+
+    def _tiles_for(self, height: int, width: int):
+        """按图像尺寸与当前输入分辨率生成分块起点和预分配的 batch 张量，尺寸不变时复用。"""
+        key = (height, width, self.input_size, self.tile_overlap)
+        if self._tile_layout is None or self._tile_layout[0] != key:
+            size = self.input_size
+            origins = np.array(
+                [(x, y) for y in tile_offsets(height, size, self.tile_overlap)
+                 for x in tile_offsets(width, size, self.tile_overlap)],
+                dtype=np.int32
+            )
+            n = len(origins)
+            # 固定 batch 的模型按其大小分批，不足部分保持全零
+            if self.fixed_batch:
+                n = -(-n // self.fixed_batch) * self.fixed_batch
+            tensor = np.zeros((n, 3, size, size), dtype=np.float32)
+            self._tile_layout = (key, origins, tensor)
+        return self._tile_layout[1], self._tile_layout[2]
 
     def preprocess(self, image):
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        tensor = cv2.resize(image, (self.input_size, self.input_size))
-        tensor = tensor.astype(np.float32) / 255.0
-        tensor = np.transpose(tensor, (2, 0, 1))  # HWC -> CHW
-        tensor = np.expand_dims(tensor, axis=0)
-        return tensor, image
+        """
+        返回 (1, 3, S, S) 输入张量与 RGB 图像。两者都写在预分配的缓冲区中，
+        下一次调用时会被覆盖，需要保留时自行 copy()。
+        """
+        size = self.input_size
+        h, w = image.shape[:2]
+        if self._buffers is None or self._buffers[0].shape[:2] != (h, w) or self._buffers[2].shape[2] != size:
+            self._buffers = (
+                np.empty((h, w, 3), dtype=np.uint8),
+                np.empty((size, size, 3), dtype=np.uint8),
+                np.empty((1, 3, size, size), dtype=np.float32),
+            )
+            self._binding = None
+        rgb, resized, tensor = self._buffers
+        cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=rgb)
+        cv2.resize(rgb, (size, size), dst=resized)
+        # HWC -> CHW 先复制进输入张量再原地归一化；带 dtype 的 divide 会为 uint8 -> float32 转换分配临时缓冲区
+        np.copyto(tensor[0], resized.transpose(2, 0, 1))
+        np.divide(tensor[0], np.float32(255), out=tensor[0])
+        return tensor, rgb
+
+    def enable_steady_state(self):
+        """
+        稳态模式：输入张量与输出数组都通过 IOBinding 绑定到预分配缓冲区，
+        session 不再为每帧分配输出，配合预处理缓冲区与 Detections 复用，稳定运行后每帧没有净内存分配。
+        输出形状不固定（例如动态空间尺寸或融合了 NMS）或模型 batch 固定大于 1 时仍走普通 run。
+        """
+        self.steady_state = True
+        self._binding = None
+
+    def _bind(self, tensor):
+        """为当前输入张量建立 IOBinding，返回 (binding, 输出数组列表)；无法绑定时返回 False。"""
+        if self.fixed_batch not in (None, 1):
+            return False
+        dtypes = {"tensor(float)": np.float32, "tensor(int64)": np.int64}
+        outputs = []
+        binding = self.session.io_binding()
+        binding.bind_cpu_input(self.input_name, tensor)
+        for out in self.session.get_outputs():
+            shape = [1] + list(out.shape[1:])
+            if out.type not in dtypes or not all(isinstance(d, int) and d > 0 for d in shape):
+                return False
+            buffer = np.empty(shape, dtype=dtypes[out.type])
+            binding.bind_output(out.name, "cpu", 0, buffer.dtype, buffer.shape, buffer.ctypes.data)
+            outputs.append(buffer)
+        return binding, outputs
+
+    def _run(self, tensor):
+        """单张图推理；稳态模式下复用绑定的输出缓冲区。"""
+        if self.steady_state:
+            if self._binding is None:
+                self._binding = self._bind(tensor)
+            if self._binding:
+                binding, outputs = self._binding
+                self.session.run_with_iobinding(binding)
+                return outputs
+        return self.session.run(None, {self.input_name: tensor})
+
+    def detect(self, image):
+        """
+        执行推理与后处理，返回缩放回原图尺寸的 xywh 框、置信度和 RGB 图像。
+        未检测到目标时 boxes 为 None。框与置信度为新数组，可以跨帧保留。
+        """
+        boxes, confidences, image, scale = self._infer(image)
+        if boxes is None:
+            return None, None, image
+        return boxes * scale, confidences.copy(), image
 
-    def predict(self, image):
+    def _infer(self, image):
+        """
+        预处理、推理与后处理，返回框、置信度、RGB 图像和框到原图尺度的缩放系数。
+        整图推理的框与置信度是后处理缓冲区的视图，下一帧会被覆盖。
+        """
+        h, w = image.shape[:2]
+        if self.tiling and min(h, w) >= self.input_size:
+            # 分块推理的框已在截图坐标下
+            return self._infer_tiled(image) + (1.0,)
+        timer = self.stage_timer
+        if timer is not None:
+            t0 = time.perf_counter()
         input_tensor, image = self.preprocess(image)
-        preds = self.session.run(None, {self.input_name: input_tensor})[0][0]  # shape: [N, 85]
-
-        boxes = preds[:, :4]  # xywh
-        scores = preds[:, 4]
-        class_probs = preds[:, 5:]
-        class_ids = np.argmax(class_probs, axis=1)
-        confidences = scores * class_probs[np.arange(len(class_probs)), class_ids]
-
-        # 筛选 class == 0 且 confidence > 阈值
-        mask = (class_ids == self.classes) & (confidences > self.conf_thres)
-        boxes = boxes[mask]
-        confidences = confidences[mask]
-
-        if len(boxes) == 0:
-            return None, image
-
-        # NMS 处理
-        xyxy_boxes = boxes.copy()
-        xyxy_boxes[:, 0] = boxes[:, 0] - boxes[:, 2] / 2  # x1
-        xyxy_boxes[:, 1] = boxes[:, 1] - boxes[:, 3] / 2  # y1
-        xyxy_boxes[:, 2] = boxes[:, 0] + boxes[:, 2] / 2  # x2
-        xyxy_boxes[:, 3] = boxes[:, 1] + boxes[:, 3] / 2  # y2
-
-        keep = self.nms(xyxy_boxes, confidences, self.iou_thres)
-        kept_boxes = boxes[keep]  # 原始 xywh，取中心点即可
-
-        # 计算中心点，缩放回原图尺寸
-        cxcy_array = np.empty((len(kept_boxes), 2))
-        for i, box in enumerate(kept_boxes):
-            cx = box[0] * self.scale
-            cy = box[1] * self.scale
-            cxcy_array[i] = [cx, cy]
-
-            w = box[2] * self.scale
-            h = box[3] * self.scale
+        if timer is not None:
+            t1 = time.perf_counter()
+            timer.add("preprocess", t1 - t0)
+        outputs = self._run(input_tensor)
+        if timer is not None:
+            t2 = time.perf_counter()
+            timer.add("session.run", t2 - t1)
+        boxes, confidences = self.postprocess(*self._image_outputs(outputs, 0))
+        if timer is not None:
+            timer.add("postprocess", time.perf_counter() - t2)
+        if boxes is None:
+            return None, None, image, self.scale
+        return boxes, confidences, image, self.scale
+
+    def _infer_tiled(self, image):
+        """分块推理，返回截图坐标下按置信度降序排列的框、置信度和 RGB 图像。"""
+        timer = self.stage_timer
+        if timer is not None:
+            t0 = time.perf_counter()
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        origins, tensor = self._tiles_for(*image.shape[:2])
+        size = self.input_size
+        for i, (x, y) in enumerate(origins):
+            # HWC -> CHW 与归一化一步写入预分配的 batch 张量
+            np.divide(image[y:y + size, x:x + size].transpose(2, 0, 1), np.float32(255), out=tensor[i],
+                      dtype=np.float32)
+        if timer is not None:
+            t1 = time.perf_counter()
+            timer.add("preprocess", t1 - t0)
+        batch = self.fixed_batch or len(tensor)
+        outputs = [
+            self.session.run(None, {self.input_name: tensor[start:start + batch]})
+            for start in range(0, len(tensor), batch)
+        ]
+        if timer is not None:
+            t2 = time.perf_counter()
+            timer.add("session.run", t2 - t1)
+
+        all_boxes, all_conf, all_tiles = [], [], []
+        for i, (x, y) in enumerate(origins):
+            boxes, confidences = self.postprocess(*self._image_outputs(outputs[i // batch], i % batch))
+            if boxes is None:
+                continue
+            # 后处理结果是缓冲区视图，下一块会覆盖，复制后平移回截图坐标
+            boxes, confidences = boxes.copy(), confidences.copy()
+            boxes[:, 0] += x
+            boxes[:, 1] += y
+            all_boxes.append(boxes)
+            all_conf.append(confidences)
+            all_tiles.append(np.full(len(boxes), i))
+        if not all_boxes:
+            result = (None, None, image)
+        else:
+            boxes = np.concatenate(all_boxes)
+            confidences = np.concatenate(all_conf)
+            keep = self.merge_tiles(boxes, confidences, np.concatenate(all_tiles), self.merge_thres)
+            result = (boxes[keep], confidences[keep], image)
+        if timer is not None:
+            timer.add("postprocess", time.perf_counter() - t2)
+        return result
+
+    def _image_outputs(self, outputs, i):
+        """取出一次 session.run 中第 i 张图的输出；融合了 NMS 的模型同时取出该图的保留行号。"""
+        if not self.fused_nms:
+            return outputs[0][i], None
+        selected = outputs[1]
+        return outputs[0][i], selected[selected[:, 0] == i, 2]
+
+    def postprocess(self, preds, keep=None):
+        """
+        对单张图的原始输出 [N, 85] 做置信度筛选与 NMS。
+        融合模型的输出 [k, 6] 已完成解码与类别筛选，这里只按阈值截取并在需要时做 NMS。
+
+        :param keep: 融合了 NMS 的模型给出的保留行号
+        :return: (模型输入尺度下的 xywh 框, 置信度)，为后处理缓冲区的视图，下一次调用时会被覆盖；
+            无目标时均为 None
+        """
+        if self.fused is not None:
+            return self._postprocess_fused(preds, keep)
+        buf = self._post_buffers(preds)
+        n = len(preds)
+        # 筛选 class == 0 且 confidence > 阈值：argmax 为目标类别时置信度即 objectness × 目标类别概率，
+        # 先按该值筛出少量候选，只对候选行做 argmax，不必复制整张 [N, 80] 类别概率表
+        score = np.multiply(preds[:, 4], preds[:, 5 + self.classes], out=buf.score[:n])
+        mask = np.greater(score, self.conf_thres, out=buf.mask[:n])
+        count = np.count_nonzero(mask)
+        if count == 0:
+            return None, None
+        rows = np.take(preds, buf.compact(mask, count), axis=0, mode="clip", out=buf.rows[:count])
+        cand = buf.cand[:count]
+        np.copyto(cand[:, :4], rows[:, :4])
+        np.multiply(rows[:, 4], rows[:, 5 + self.classes], out=cand[:, 4])
+        # 前 5 列置为 -inf 后整行 argmax 即类别 argmax（加 5），连续的整行上 argmax 不必复制类别概率
+        rows[:, :5] = -np.inf
+        cls = rows.argmax(axis=1, out=buf.cls[:count])
+        # argmax 不是目标类别的候选不参与 NMS
+        other = np.not_equal(cls, 5 + self.classes, out=buf.mask[:count])
+        if np.count_nonzero(other) == count:
+            return None, None
+        work = buf.score[:count]
+        np.copyto(work, cand[:, 4])
+        np.copyto(work, -np.inf, where=other)
+        return self._nms(buf, cand, work)
+
+    def _postprocess_fused(self, rows, keep):
+        if keep is not None:
+            # 融合了 NMS 时每帧行数不同，本就无法绑定输出，这里不使用缓冲区
+            rows = rows[keep]
+            rows = rows[rows[:, 4] > self.conf_thres]
+            if len(rows) == 0:
+                return None, None
+            return rows[:, :4], rows[:, 4]
+        buf = self._post_buffers(rows)
+        n = len(rows)
+        mask = np.greater(rows[:, 4], self.conf_thres, out=buf.mask[:n])
+        count = np.count_nonzero(mask)
+        if count == 0:
+            return None, None
+        selected = np.take(rows, buf.compact(mask, count), axis=0, mode="clip", out=buf.rows[:count])
+        cand = buf.cand[:count]
+        np.copyto(cand, selected[:, :5])
+        work = buf.score[:count]
+        np.copyto(work, cand[:, 4])
+        return self._nms(buf, cand, work)
+
+    def _post_buffers(self, preds) -> _PostprocessBuffers:
+        if self._post is None or not self._post.fits(preds):
+            self._post = _PostprocessBuffers(len(preds), preds.shape[1], preds.dtype)
+        return self._post
+
+    def predict_batch(self, images, batch_size: int = 16):
+        """
+        批量检测，用于离线评估。模型 batch 维度为动态时按 batch_size 组批，
+        为固定值时按模型要求的大小组批。每张图按自身尺寸缩放结果，允许图像尺寸不一。
+
+        :return: 与 images 等长的列表，元素为 (xywh 框, 置信度)，无目标时为 (None, None)
+        """
+        if self.fixed_batch is not None:
+            batch_size = self.fixed_batch
+        results = []
+        for start in range(0, len(images), batch_size):
+            chunk = images[start:start + batch_size]
+            # 固定 batch 的模型最后一批不足时以全零补齐
+            n = batch_size if self.fixed_batch else len(chunk)
+            tensor = np.zeros((n, 3, self.input_size, self.input_size), dtype=np.float32)
+            for i, image in enumerate(chunk):
+                tensor[i] = self.preprocess(image)[0][0]
+            outputs = self.session.run(None, {self.input_name: tensor})
+            for i, image in enumerate(chunk):
+                boxes, confidences = self.postprocess(*self._image_outputs(outputs, i))
+                if boxes is not None:
+                    h, w = image.shape[:2]
+                    boxes = boxes * np.array([w, h, w, h], dtype=np.float32) / self.input_size
+                    confidences = confidences.copy()
+                results.append((boxes, confidences))
+        return results
+
+    def predict(self, image, frame_id: int = 0, capture_time: float = 0.0):
+        """
+        检测；annotate 为 True 时在返回的 RGB 图像上绘制结果框。
+        挂有级联第一级（gate）时，被判为无需检测的帧直接返回空结果，返回的图像仍为 BGR 原图。
+
+        :param frame_id: 帧序号，随结果一起返回
+        :param capture_time: 截图时间（perf_counter），随结果一起返回
+        :return: (Detections，原图尺度，每次调用复用同一缓冲区；标注后的 RGB 图像)
+        """
+        gate = self.gate
+        if gate is not None:
+            if not gate.needs_detection(image):
+                return self.detections.clear().stamp(frame_id, capture_time), image
+            start = time.perf_counter()
+        boxes, confidences, image, scale = self._infer(image)
+        # 缩放回原图尺寸与写入结果缓冲区一步完成
+        detections = self.detections.fill(boxes, confidences, self.classes, scale)
+        detections.stamp(frame_id, capture_time)
+        if gate is not None:
+            gate.detection_done(time.perf_counter() - start, detections.count > 0)
+        if not detections.count or not self.annotate:
+            return detections, image
+        timer = self.stage_timer
+        if timer is not None:
+            t0 = time.perf_counter()
+
+        for cx, cy, w, h in detections.boxes:
             # 计算左上角与右下角
             x1 = int(cx - w / 2)
             y1 = int(cy - h / 2)
             x2 = int(cx + w / 2)
             y2 = int(cy + h / 2)
             cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
-        return cxcy_array, image
+        if timer is not None:
+            timer.add("draw", time.perf_counter() - t0)
+        return detections, image
+
+    def _nms(self, buf, cand, work):
+        """
+        在缓冲区中做 NMS。work 为置信度的工作副本，已保留或被抑制的行置为 -inf，
+        每次取剩余的最高分，与按置信度降序逐个处理的结果相同，不需要排序。
+
+        :param cand: (n, 5) 候选 xywh + 置信度
+        :return: 按置信度降序保留的 (xywh 框, 置信度)，为 buf.result 的视图
+        """
+        n = len(cand)
+        cx, cy, w, h = cand[:, 0], cand[:, 1], cand[:, 2], cand[:, 3]
+        x1, y1, x2, y2 = buf.xyxy[:, :n]
+        tmp, inter, union = buf.scratch[:, :n]
+        np.divide(w, 2, out=tmp)
+        np.subtract(cx, tmp, out=x1)
+        np.add(cx, tmp, out=x2)
+        np.divide(h, 2, out=tmp)
+        np.subtract(cy, tmp, out=y1)
+        np.add(cy, tmp, out=y2)
+        areas = np.subtract(x2, x1, out=buf.area[:n])
+        np.multiply(areas, np.subtract(y2, y1, out=tmp), out=areas)
+        suppressed = buf.mask[:n]
+        # 同分时取行号较大者，与原先 argsort()[::-1] 的顺序一致
+        reversed_work = work[::-1]
+        count = 0
+        while True:
+            i = n - 1 - reversed_work.argmax()
+            if work[i] == -np.inf:
+                break
+            buf.keep[count] = i
+            count += 1
+            work[i] = -np.inf
+            np.maximum(x1, x1[i], out=tmp)
+            np.minimum(x2, x2[i], out=inter)
+            np.subtract(inter, tmp, out=inter)
+            np.maximum(inter, 0.0, out=inter)
+            np.maximum(y1, y1[i], out=tmp)
+            np.minimum(y2, y2[i], out=union)
+            np.subtract(union, tmp, out=union)
+            np.maximum(union, 0.0, out=union)
+            np.multiply(inter, union, out=inter)
+            np.add(areas, areas[i], out=union)
+            np.subtract(union, inter, out=union)
+            np.divide(inter, union, out=inter)
+            # 与原实现一致：IoU 不大于阈值才保留，NaN 也被抑制
+            np.less_equal(inter, self.iou_thres, out=suppressed)
+            np.logical_not(suppressed, out=suppressed)
+            np.copyto(work, -np.inf, where=suppressed)
+        result = np.take(cand, buf.keep[:count], axis=0, mode="clip", out=buf.result[:count])
+        return result[:, :4], result[:, 4]
 
     @staticmethod
-    def nms(boxes, scores, iou_threshold):
-        x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
-        areas = (x2 - x1) * (y2 - y1)
-        order = scores.argsort()[::-1]
-        keep = []
+    def merge_tiles(boxes, scores, tile_ids, threshold):
+        """
+        跨块合并 xywh 框：按置信度从高到低保留，抑制来自其他块、且与已保留框的交集
+        占较小框面积超过 threshold 的框。用较小框面积而非 IoU，是因为块边缘截断的目标
+        只剩半个框，与相邻块中的完整框 IoU 很低但几乎被其包含。
 
-        while order.size > 0:
-            i = order[0]
+        :return: 保留框的下标，按置信度降序
+        """
+        xyxy = xywh_to_xyxy(boxes)
+        areas = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+        suppressed = np.zeros(len(boxes), dtype=bool)
+        keep = []
+        for i in scores.argsort()[::-1]:
+            if suppressed[i]:
+                continue
             keep.append(i)
-            xx1 = np.maximum(x1[i], x1[order[1:]])
-            yy1 = np.maximum(y1[i], y1[order[1:]])
-            xx2 = np.minimum(x2[i], x2[order[1:]])
-            yy2 = np.minimum(y2[i], y2[order[1:]])
+            xx1 = np.maximum(xyxy[i, 0], xyxy[:, 0])
+            yy1 = np.maximum(xyxy[i, 1], xyxy[:, 1])
+            xx2 = np.minimum(xyxy[i, 2], xyxy[:, 2])
+            yy2 = np.minimum(xyxy[i, 3], xyxy[:, 3])
             inter = np.maximum(0.0, xx2 - xx1) * np.maximum(0.0, yy2 - yy1)
-            iou = inter / (areas[i] + areas[order[1:]] - inter)
-            inds = np.where(iou <= iou_threshold)[0]
-            order = order[inds + 1]
-        return keep
+            overlap = inter / np.maximum(np.minimum(areas[i], areas), 1e-9)
+            suppressed |= (overlap > threshold) & (tile_ids != tile_ids[i])
+        return np.array(keep, dtype=np.int64)
+
+
+def enable_tiling(model, tiling_cfg: dict):
+    """按用户配置中的 tiling 段开启分块推理，并输出分块情况。"""
+    overlap = tiling_cfg.get("overlap", 0.2)
+    if model.enable_tiling(overlap, tiling_cfg.get("merge_thres", 0.6)):
+        n = len(tile_offsets(model.ident_size, model.input_size, overlap))
+        sys.stdout.write(f"\n>>> 已开启分块推理：{n}×{n} 块，每块 {model.input_size}px")
+    else:
+        sys.stdout.write("\n>>> 截图区域不大于模型输入，无需分块推理。")
+
 
 if __name__ == "__main__":
     model = APV5Experimental("apv5.onnx")
+    model.annotate = True
     image = cv2.imread("320.jpg")
-    cxcy_list = model.predict(image)
-    print(cxcy_list)
-    cv2.imshow("detection", model.img)
+    detections, annotated = model.predict(image)
+    print(detections.rows)
+    cv2.imshow("detection", annotated)
     while True:
         if cv2.waitKey(1) == ord("q"):
-            break
\ No newline at end of file
+            break
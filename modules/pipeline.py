@@ -0,0 +1,188 @@
+import multiprocessing as mp
+import sys
+import time
+
+import numpy as np
+
+from utils.detections import Detections, N_FIELDS
+from utils.shm_ring import SharedRing
+
+
+MAX_DETECTIONS = 64
+
+
+def capture_worker(region, frame_spec, stop_event):
+    """
+    截图子进程：不断抓取屏幕并写入帧环形缓冲区。
+    附加字段：[0] 抓取完成时间（perf_counter），[1] 抓取耗时（ms）
+    """
+    from utils.grab_screen import ScreenGrabber
+    from utils.placement import get_placement
+
+    get_placement().apply("capture")
+    frames = SharedRing.attach(frame_spec)
+    camera = ScreenGrabber(region=region)
+    try:
+        while not stop_event.is_set():
+            grab_start = time.perf_counter()
+            img = camera.grab_frame()
+            if img is None:
+                continue
+            grab_end = time.perf_counter()
+            frames.write(img, extra=(grab_end, (grab_end - grab_start) * 1000))
+    finally:
+        camera.stop()
+        frames.close()
+
+
+def inference_worker(model_path, ident_size, ep_choice, cache_cfg, tiling_cfg, cascade_cfg,
+                     frame_spec, det_spec, stop_event, det_ready):
+    """
+    推理子进程：读取最新一帧做检测，把检测结果行（cx, cy, w, h, score, cls）写入检测环形缓冲区。
+    跳过的帧计入丢帧，截图或推理任何一方抖动都不会阻塞另一方。
+    附加字段：[0] 帧抓取时间，[1] 抓取耗时（ms），[2] 推理耗时（ms），[3] 累计丢帧数，[4] 帧序号，
+    [5] 推理完成时间
+    """
+    from modules.onnx import APV5Experimental, enable_tiling
+    from modules.cascade import enable_cascade
+    from modules.ep_probe import make_session_options
+    from utils.frame_cache import CachedPredictor
+    from utils.placement import get_placement
+
+    frames = SharedRing.attach(frame_spec)
+    detections = SharedRing.attach(det_spec)
+    providers = ep_choice["providers"] if ep_choice is not None else None
+    sess_options = make_session_options(ep_choice["intra_op_num_threads"]) if ep_choice is not None else None
+    # 推理线程及其 intra-op 线程池按 placement 配置放置
+    placement = get_placement()
+    placement.apply("inference")
+    sess_options = placement.session_options(sess_options)
+    model = APV5Experimental(
+        model_path,
+        ident_size=ident_size,
+        providers=providers,
+        sess_options=sess_options,
+        max_detections=MAX_DETECTIONS
+    )
+    if tiling_cfg.get("enabled", False):
+        enable_tiling(model, tiling_cfg)
+    if cascade_cfg.get("enabled", False):
+        enable_cascade(model, cascade_cfg, providers, sess_options)
+    predictor = model
+    if cache_cfg.get("enabled", False):
+        predictor = CachedPredictor(
+            model,
+            pixel_threshold=cache_cfg.get("pixel_threshold", 12),
+            sensitivity=cache_cfg.get("sensitivity", 0.002),
+            max_stale_ms=cache_cfg.get("max_stale_ms", 100)
+        )
+
+    last_seq = 0
+    dropped = 0
+    try:
+        while not stop_event.is_set():
+            item = frames.read_latest(last_seq)
+            if item is None:
+                time.sleep(0.0005)
+                continue
+            seq, img, frame_extra = item
+            grab_time, grab_latency = frame_extra[0], frame_extra[1]
+            if last_seq:
+                dropped += seq - last_seq - 1
+            last_seq = seq
+
+            infer_start = time.perf_counter()
+            # 帧环形缓冲区的序号即为帧序号
+            result, _ = predictor.predict(img, seq, grab_time)
+            infer_end = time.perf_counter()
+            infer_latency = (infer_end - infer_start) * 1000
+            # 推理期间槽位被覆盖则结果不可信，直接丢弃
+            if not frames.is_valid(seq):
+                dropped += 1
+                continue
+
+            detections.write(
+                result.data, count=result.count,
+                extra=(grab_time, grab_latency, infer_latency, dropped, result.frame_id, infer_end)
+            )
+            det_ready.set()
+    finally:
+        frames.close()
+        detections.close()
+
+
+class MultiprocessPipeline:
+    """
+    MultiprocessPipeline 类：
+    - 截图与推理分别运行在独立子进程，避免与 Tk 主循环、日志回调和映射线程争抢 GIL
+    - 进程间通过预分配的共享内存环形缓冲区交换帧和检测结果
+    - 主进程只读取最新的检测结果
+    """
+
+    def __init__(self, region, model_path, ident_size, ep_choice=None, cache_cfg=None, tiling_cfg=None,
+                 cascade_cfg=None):
+        ctx = mp.get_context("spawn")
+        self._stop_event = ctx.Event()
+        self._det_ready = ctx.Event()
+        self.frames = SharedRing((ident_size, ident_size, 3), np.uint8, slots=4, n_extra=2)
+        self.detections = SharedRing((MAX_DETECTIONS, N_FIELDS), np.float32, slots=8, n_extra=6)
+        self._last_seq = 0
+        # 槽位随时可能被子进程覆盖，读出后复制到本地缓冲区
+        self._result = Detections(MAX_DETECTIONS)
+        self._processes = [
+            ctx.Process(
+                target=capture_worker,
+                args=(region, self.frames.spec(), self._stop_event),
+                daemon=True
+            ),
+            ctx.Process(
+                target=inference_worker,
+                args=(model_path, ident_size, ep_choice, cache_cfg or {}, tiling_cfg or {}, cascade_cfg or {},
+                      self.frames.spec(), self.detections.spec(),
+                      self._stop_event, self._det_ready),
+                daemon=True
+            ),
+        ]
+
+    def start(self):
+        for p in self._processes:
+            p.start()
+
+    def wait_detections(self, timeout: float = 0.1):
+        """
+        等待下一份检测结果。
+
+        :return: (Detections（每次调用复用同一缓冲区，带帧序号与截图时间）, 帧抓取时间, 抓取耗时 ms,
+                  推理耗时 ms, 累计丢帧数, 推理完成时间)；超时返回 None
+        """
+        if not self._det_ready.wait(timeout):
+            self._check_alive()
+            return None
+        self._det_ready.clear()
+        item = self.detections.read_latest(self._last_seq)
+        if item is None:
+            return None
+        seq, rows, extra = item
+        self._result.load(rows)
+        capture_time, capture_ms, infer_ms, dropped, frame_id, done_time = extra[:6].tolist()
+        # 拷贝期间槽位被推理进程覆盖时结果可能是新旧数据的混合，丢弃这一份
+        if not self.detections.is_valid(seq):
+            return None
+        self._last_seq = seq
+        result = self._result.stamp(int(frame_id), capture_time)
+        return result, capture_time, capture_ms, infer_ms, int(dropped), done_time
+
+    def _check_alive(self):
+        for p in self._processes:
+            if not p.is_alive():
+                raise RuntimeError(f"子进程 {p.name} 已退出（exit code {p.exitcode}）。")
+
+    def stop(self):
+        self._stop_event.set()
+        for p in self._processes:
+            p.join(timeout=2)
+            if p.is_alive():
+                p.terminate()
+        self.frames.close()
+        self.detections.close()
+        sys.stdout.write("\n>>> 截图与推理子进程已退出。")
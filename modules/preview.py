@@ -0,0 +1,193 @@
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from utils.detections import Detections
+
+
+class PreviewWindow:
+    """
+    PreviewWindow 类：调试用的检测预览窗口，全部绘制工作在独立线程中完成。
+    - 检测循环每帧调用 submit()：未到下一次渲染时间时只做一次时间比较；
+      到时间后以非阻塞方式尝试加锁，预览线程正忙则直接放弃本帧，绝不等待
+    - 交接只保存画面引用并复制检测行（至多 64×6 个 float32），缩放、画框、imshow 都在预览线程
+    - 多进程模式下检测循环没有画面，可传入 frame_ring（MultiprocessPipeline.frames），
+      由预览线程自行从共享内存读取最新帧
+    """
+
+    def __init__(self, max_fps: float = 30.0, size: int = 480, title: str = "TGC preview",
+                 frame_ring=None, show: bool = True):
+        """
+        :param max_fps: 最高渲染帧率
+        :param size: 预览窗口边长（像素），画面按此缩放
+        :param show: False 时只渲染不显示（无显示环境或基准测试）
+        """
+        self.interval = 1 / max_fps
+        self.size = size
+        self.title = title
+        self.frame_ring = frame_ring
+        self.show = show
+
+        self.rendered = 0
+        self.busy_skips = 0
+        self.canvas = np.zeros((size, size, 3), dtype=np.uint8)
+
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._next_due = 0.0
+        self._image = None
+        self._detections = Detections()
+        self._local = Detections()
+        self._thread = None
+
+    def submit(self, image, detections: Detections):
+        """在检测循环中调用；image 为 BGR 画面（多进程模式下为 None）。"""
+        now = time.perf_counter()
+        if now < self._next_due:
+            return
+        if not self._lock.acquire(blocking=False):
+            self.busy_skips += 1
+            return
+        try:
+            self._image = image
+            self._detections.load(detections.data, detections.count).stamp(
+                detections.frame_id, detections.capture_time
+            )
+        finally:
+            self._lock.release()
+        self._next_due = now + self.interval
+        self._ready.set()
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="preview", daemon=True)
+        self._thread.start()
+
+    def _take(self):
+        with self._lock:
+            image = self._image
+            self._image = None
+            self._local.load(self._detections.data, self._detections.count).stamp(
+                self._detections.frame_id, self._detections.capture_time
+            )
+        ring = self.frame_ring
+        if image is None and ring is not None:
+            item = ring.read_latest()
+            if item is not None:
+                seq, view, _ = item
+                image = view.copy()
+                if not ring.is_valid(seq):
+                    image = None
+                del view, item
+        return image
+
+    def render(self, image, detections: Detections):
+        """把画面缩放到 canvas 并叠加检测框与帧信息。"""
+        h, w = image.shape[:2]
+        cv2.resize(image, (self.size, self.size), dst=self.canvas, interpolation=cv2.INTER_AREA)
+        sx, sy = self.size / w, self.size / h
+        for cx, cy, bw, bh, score, _ in detections.rows:
+            x1, y1 = int((cx - bw / 2) * sx), int((cy - bh / 2) * sy)
+            x2, y2 = int((cx + bw / 2) * sx), int((cy + bh / 2) * sy)
+            cv2.rectangle(self.canvas, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(self.canvas, f"{score:.2f}", (x1, max(y1 - 4, 10)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
+        age = (time.perf_counter() - detections.capture_time) * 1000 if detections.capture_time else 0.0
+        cv2.putText(self.canvas, f"frame {detections.frame_id}  dets {detections.count}  age {age:.1f} ms",
+                    (6, 16), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 255), 1)
+        return self.canvas
+
+    def _run(self):
+        try:
+            while not self._stop_event.is_set():
+                if not self._ready.wait(0.1):
+                    continue
+                self._ready.clear()
+                image = self._take()
+                if image is None:
+                    continue
+                self.render(image, self._local)
+                self.rendered += 1
+                if self.show:
+                    try:
+                        cv2.imshow(self.title, self.canvas)
+                        cv2.waitKey(1)
+                    except cv2.error as e:
+                        self.show = False
+                        sys.stdout.write(f"\n>>> 无法显示预览窗口，仅在后台渲染：{e}")
+        finally:
+            if self.show:
+                try:
+                    cv2.destroyWindow(self.title)
+                except cv2.error:
+                    pass
+
+    def stop(self):
+        """停止预览线程；必须在关闭 frame_ring（pipeline.stop）之前调用，否则共享内存仍有视图导出。"""
+        # 先断开共享帧环，已停止的线程不会再开始新的读取
+        self.frame_ring = None
+        self._stop_event.set()
+        self._ready.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+
+def benchmark(frames: int = 3000, work_ms: float = 3.0, preview: PreviewWindow = None):
+    """
+    模拟检测循环：每帧做 work_ms 毫秒的 NumPy 计算（代替推理），返回每帧耗时（毫秒）。
+    给出 preview 时每帧额外调用 submit()。
+    """
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 255, (320, 320, 3), dtype=np.uint8) for _ in range(8)]
+    detections = Detections().fill(
+        np.array([[160, 160, 40, 80], [60, 90, 20, 40]], dtype=np.float32), np.array([0.9, 0.6]), 0
+    )
+    a = rng.random((128, 128), dtype=np.float32)
+    # 预热，估算每帧需要的矩阵乘法次数
+    start = time.perf_counter()
+    for _ in range(20):
+        a @ a
+    reps = max(1, int(work_ms / ((time.perf_counter() - start) / 20 * 1000)))
+
+    costs = np.empty(frames)
+    for i in range(frames):
+        start = time.perf_counter()
+        for _ in range(reps):
+            a @ a
+        image = images[i % len(images)]
+        detections.stamp(i, start)
+        if preview is not None:
+            preview.submit(image, detections)
+        costs[i] = (time.perf_counter() - start) * 1000
+    return costs
+
+
+if __name__ == "__main__":
+    import os
+
+    # 预览线程与检测循环各占一个核心时互不影响；单核机器上两者只能分时，p95 会受影响
+    print(f"CPU cores: {os.cpu_count()}")
+    baseline = benchmark()
+    preview = PreviewWindow(max_fps=30, show=False)
+    preview.start()
+    with_preview = benchmark(preview=preview)
+    preview.stop()
+    for name, costs in (("preview off", baseline), ("preview on", with_preview)):
+        p50, p95, p99 = np.percentile(costs, (50, 95, 99))
+        print(f"{name:<12} loop p50 {p50:.3f} ms  p95 {p95:.3f} ms  p99 {p99:.3f} ms")
+    print(f"preview rendered {preview.rendered} frames, busy skips {preview.busy_skips}")
+
+    # submit() 本身的开销
+    detections = Detections()
+    image = np.zeros((320, 320, 3), dtype=np.uint8)
+    preview = PreviewWindow(max_fps=1e9, show=False)
+    n = 20000
+    start = time.perf_counter()
+    for _ in range(n):
+        preview.submit(image, detections)
+    print(f"submit(): {(time.perf_counter() - start) / n * 1e6:.2f} us per call (uncapped)")
@@ -0,0 +1,222 @@
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+
+class QualityLevel:
+    """一个质量档位：模型、输入尺寸与跳帧数（每次推理后复用结果的帧数）。"""
+
+    __slots__ = ("name", "model_path", "input_size", "frame_skip")
+
+    def __init__(self, name: str, model_path: str, input_size: int = 320, frame_skip: int = 0):
+        self.name = name
+        self.model_path = model_path
+        self.input_size = input_size
+        self.frame_skip = frame_skip
+
+    def __repr__(self):
+        return f"{self.name}({self.model_path}, {self.input_size}px, skip={self.frame_skip})"
+
+
+class QualityController:
+    """
+    QualityController 类：
+    - 在滑动窗口内统计每次推理各阶段延迟之和，按档位跳帧数摊到每帧后与目标帧预算比较
+    - 超预算的比例超过 miss_ratio 时降一档；整窗 p90 低于 headroom × 目标时升一档
+    - 每次切换后清空窗口（冷却），并记录与输出切换日志
+    - 不读取时钟，输入完全由 observe() 决定，因此可用于确定性仿真
+    """
+
+    def __init__(self, levels: list, target_ms: float, window: int = 30,
+                 miss_ratio: float = 0.2, headroom: float = 0.6, log=True):
+        """
+        :param levels: 质量档位列表，下标 0 为最高质量
+        :param target_ms: 每帧延迟目标（毫秒）
+        :param window: 做决策所需的样本数
+        :param miss_ratio: 窗口内超预算帧比例阈值
+        :param headroom: 升档所需的余量比例
+        :param log: 是否把切换写到 stdout
+        """
+        self.levels = levels
+        self.target_ms = target_ms
+        self.window = window
+        self.miss_ratio = miss_ratio
+        self.headroom = headroom
+        self.log = log
+        self.index = 0
+        self.frames = 0
+        self.transitions = []
+        self._totals = deque(maxlen=window)
+        self._stages = {}
+
+    @property
+    def level(self) -> QualityLevel:
+        return self.levels[self.index]
+
+    def skipped(self):
+        """记录一帧跳过推理、复用上一次结果的帧。"""
+        self.frames += 1
+
+    def observe(self, stages: dict) -> bool:
+        """
+        输入一次推理的各阶段延迟（毫秒）。
+
+        :return: 本次是否发生了档位切换
+        """
+        self.frames += 1
+        for name, ms in stages.items():
+            self._stages.setdefault(name, deque(maxlen=self.window)).append(ms)
+        # 跳帧档位下一次推理的耗时由 frame_skip + 1 帧分摊
+        self._totals.append(sum(stages.values()) / (self.level.frame_skip + 1))
+        if len(self._totals) < self.window:
+            return False
+
+        totals = np.fromiter(self._totals, dtype=np.float64)
+        p90 = float(np.percentile(totals, 90))
+        misses = float(np.mean(totals > self.target_ms))
+        if misses > self.miss_ratio and self.index < len(self.levels) - 1:
+            self._switch(self.index + 1, p90, "down")
+            return True
+        if p90 < self.headroom * self.target_ms and self.index > 0:
+            self._switch(self.index - 1, p90, "up")
+            return True
+        return False
+
+    def _switch(self, index: int, p90: float, direction: str):
+        stage_p90 = {
+            name: float(np.percentile(np.fromiter(v, dtype=np.float64), 90))
+            for name, v in self._stages.items()
+        }
+        old = self.levels[self.index]
+        self.index = index
+        record = {
+            "frame": self.frames,
+            "direction": direction,
+            "from": old.name,
+            "to": self.level.name,
+            "p90_ms": p90,
+            "stage_p90_ms": stage_p90,
+        }
+        self.transitions.append(record)
+        if self.log:
+            stages = "，".join(f"{k} {v:.2f} ms" for k, v in stage_p90.items())
+            sys.stdout.write(
+                f"\n>>> 质量{'降' if direction == 'down' else '升'}档：{old.name} -> {self.level.name}"
+                f"（p90 {p90:.2f} ms / 目标 {self.target_ms:.2f} ms；{stages}）"
+            )
+        # 冷却：切换后的延迟需要重新积累一整窗再做判断
+        self._totals.clear()
+        self._stages.clear()
+
+
+class AdaptivePredictor:
+    """
+    按 QualityController 当前档位执行预测：
+    - 切换模型时通过 factory(model_path) 创建并缓存预测器
+    - 输入尺寸通过 APV5Experimental.set_input_size 调整（仅动态输入模型）
+    - 跳帧档位在两次推理之间直接复用上一次结果
+    只有真正执行推理的帧才会提交给控制器。
+    """
+
+    def __init__(self, controller: QualityController, factory):
+        self.controller = controller
+        self.factory = factory
+        self.skipped = False
+        self._predictors = {}
+        self._countdown = 0
+        self._last = (None, None)
+        self.current = self._predictor_for(controller.level)
+
+    def _predictor_for(self, level: QualityLevel):
+        predictor = self._predictors.get(level.model_path)
+        if predictor is None:
+            predictor = self._predictors[level.model_path] = self.factory(level.model_path)
+        model = getattr(predictor, "model", predictor)
+        if model.input_size != level.input_size:
+            model.set_input_size(level.input_size)
+            if hasattr(predictor, "invalidate"):
+                predictor.invalidate()
+        return predictor
+
+    @property
+    def model(self):
+        return getattr(self.current, "model", self.current)
+
+    def predict(self, image, grab_ms: float = 0.0, frame_id: int = 0, capture_time: float = 0.0):
+        if self._countdown > 0:
+            self._countdown -= 1
+            self.skipped = True
+            self.controller.skipped()
+            return self._last
+        self.skipped = False
+        start = time.perf_counter()
+        self._last = self.current.predict(image, frame_id, capture_time)
+        infer_ms = (time.perf_counter() - start) * 1000
+        self._countdown = self.controller.level.frame_skip
+        if self.controller.observe({"grab": grab_ms, "inference": infer_ms}):
+            self.current = self._predictor_for(self.controller.level)
+            self._countdown = 0
+        return self._last
+
+
+def default_levels(model_path: str, dynamic_size: bool) -> list:
+    """未配置档位时的默认阶梯：先跳帧，动态输入模型再降低输入分辨率。"""
+    levels = [
+        QualityLevel("full", model_path, 320, 0),
+        QualityLevel("skip1", model_path, 320, 1),
+    ]
+    if dynamic_size:
+        levels.append(QualityLevel("256px-skip1", model_path, 256, 1))
+        levels.append(QualityLevel("224px-skip2", model_path, 224, 2))
+    else:
+        levels.append(QualityLevel("skip2", model_path, 320, 2))
+    return levels
+
+
+def levels_from_config(cfg: dict, model_path: str, dynamic_size: bool) -> list:
+    if not cfg.get("levels"):
+        return default_levels(model_path, dynamic_size)
+    return [
+        QualityLevel(
+            lv.get("name", f"level{i}"),
+            lv.get("model_path", model_path),
+            lv.get("input_size", 320),
+            lv.get("frame_skip", 0),
+        )
+        for i, lv in enumerate(cfg["levels"])
+    ]
+
+
+def simulate(levels: list, target_ms: float, latency_model, n_frames: int, **kwargs):
+    """
+    确定性仿真：latency_model(level, frame_index) 返回该帧各阶段延迟（毫秒），
+    跳帧由仿真按档位跳过。返回控制器（含 transitions）。
+    """
+    controller = QualityController(levels, target_ms, log=False, **kwargs)
+    countdown = 0
+    for i in range(n_frames):
+        if countdown > 0:
+            countdown -= 1
+            controller.skipped()
+            continue
+        controller.observe(latency_model(controller.level, i))
+        countdown = controller.level.frame_skip
+    return controller
+
+
+if __name__ == "__main__":
+    # 仿真场景：第 300~900 帧之间机器负载升至 3 倍，观察降档与恢复
+    levels = default_levels("apv5.onnx", dynamic_size=True)
+    base_infer = {320: 11.0, 256: 7.5, 224: 6.0}
+
+    def latency_model(level, i):
+        load = 3.0 if 300 <= i < 900 else 1.0
+        jitter = 1.0 + 0.1 * ((i * 7919) % 13 - 6) / 6  # 确定性抖动 ±10%
+        return {"grab": 1.5, "inference": base_infer[level.input_size] * load * jitter}
+
+    ctl = simulate(levels, target_ms=16.0, latency_model=latency_model, n_frames=1500)
+    for t in ctl.transitions:
+        print(f"frame {t['frame']:>5}  {t['direction']:<4} {t['from']:>12} -> {t['to']:<12} p90 {t['p90_ms']:.2f} ms")
+    print(f"final level: {ctl.level}")
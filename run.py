@@ -1,27 +1,63 @@
 # 在你的脚本最顶部（import 之前）
+import time
+_STARTUP_T0 = time.perf_counter()
+
 import os
-import re
 import sys
 import json
-import time
+import math
 import threading
+import multiprocessing
 import tkinter as tk
 from tkinter import scrolledtext
-import subprocess
 
-import numpy as np
-
-from modules.onnx import APV5Experimental
-from modules.controller import DualSenseToDS4Mapper, DualSenseToX360Mapper
+# cv2、onnxruntime、numpy、dxcam、pywinusb、vgamepad 等重型依赖在首次使用时才导入，
+# 并在界面可交互后于后台线程预加载
 from modules.initialize import InitApp
 from modules.aim_configurate import CFGApp
-from utils.grab_screen import ScreenGrabber
 from utils.delay_stdout import DelayedStdoutRedirector
+from utils.startup_timer import StartupTimer
+from utils.hidhide import get_client
+from utils.metrics import start_exporters
+from utils.profiler import profile_for
 from utils.tools import get_screenshot_region_dxcam, list_subdirs, enum_hid_devices, handle_exception
 
 
+def map_range(x: float, a: float, scale: list[float] = [0.2, 0.8]) -> float:
+    normalized = x / a
+    out_min = 127 * scale[0]
+    out_max = 127 * scale[1]
+    value = out_min + (out_max - out_min) * abs(normalized)
+    return value
+
+
+def aim_offset(dx: float, dy: float, strength: float, strong_size: float, weak_size: float,
+               curve_inner: list[float], curve_outer: list[float]) -> tuple[float, float]:
+    """
+    把离准星最近目标的偏移 (dx, dy) 映射为右摇杆偏移量 (rx, ry)，只做标量运算。
+    距离在内圈（strong_size / 2）与中圈（weak_size / 2）内分别按各自的曲线映射，超出中圈不偏移。
+    """
+    euclidean_distance = math.hypot(dx, dy)
+    if euclidean_distance:
+        cos_angle = dx / euclidean_distance
+        sin_angle = dy / euclidean_distance
+    else:
+        cos_angle = sin_angle = 0.0
+    if euclidean_distance < strong_size / 2:
+        map_euclidean_distance = map_range(euclidean_distance, strong_size, curve_inner) * strength
+    elif euclidean_distance < weak_size / 2:
+        map_euclidean_distance = map_range(euclidean_distance, weak_size, curve_outer) * strength
+    else:
+        map_euclidean_distance = 0
+    return map_euclidean_distance * cos_angle, map_euclidean_distance * sin_angle
+
+
 class App:
     def __init__(self, root):
+        self.startup_timer = StartupTimer(_STARTUP_T0)
+        self.startup_timer.record("import", _STARTUP_T0)
+        ui_start = time.perf_counter()
+
         self.root = root
         self.root.title("TGC v1.1.0")
 
@@ -30,37 +66,17 @@ class App:
         self.logic_started = False  # 标记 run_logic 是否已成功启动
         self.thread = None
         self.thread_clear_excl_running = False
+        self.device_backend = None  # 设备控制后端，首次切换独占时创建，退出时关闭
         self.mapper = None
+        self.extra_mappers = []  # extra_controllers 中配置的其余手柄，只做映射
+        self.mapping_engine = None  # 所有映射器共用的服务线程
+        self.active_model = None  # 智慧核心运行中的模型，供性能采样统计阶段耗时
+        self.flight_recorder = None  # 智慧核心运行中的性能异常记录器，F9 手动转储
 
         # 日志输出区
         self.output = scrolledtext.ScrolledText(root, height=15, width=80, state='disabled')
         self.output.pack(fill='both', expand=True)
         sys.stdout = DelayedStdoutRedirector(self.output, interval_ms=50)
-    
-        self.check_resources()
-
-        MY_EXE = os.path.abspath(sys.executable)
-        subprocess.run(
-            [
-                "C:/Program Files/Nefarius Software Solutions/HidHide/x64/HidHideCLI.exe", 
-                "--app-reg", 
-                MY_EXE
-            ]
-        )
-
-        if os.path.exists("user_config.json"):
-            with open("user_config.json", "r") as f:
-                path = json.load(f)["controller"]["Path"] 
-            instance_exist = False
-            for device in enum_hid_devices():
-                if device[3] == path:
-                    instance_exist = True
-                    break
-            if not instance_exist:
-                sys.stdout.write("\n>>> 检测到手柄实例变动，请重新初始化。")
-        else:
-            instance_exist = False
-            sys.stdout.write("\n>>> 未检测到用户配置，请先初始化。")
 
         # 按钮容器 Frame
         button_frame = tk.Frame(root)
@@ -70,11 +86,11 @@ class App:
         self.init_button = tk.Button(button_frame, text="初始化配置", command=self.start_init)
         self.init_button.pack(side='left', padx=5)
 
-        # CFGApp control button
+        # CFGApp control button（设备检查完成前保持禁用）
         self.cfg_button = tk.Button(
             button_frame, 
             text="修改识别配置", 
-            state='normal' if instance_exist else 'disabled', 
+            state='disabled', 
             command=self.open_cfg
         )
         self.cfg_button.pack(side='left', padx=5)
@@ -83,7 +99,7 @@ class App:
         self.mapper_button = tk.Button(
             button_frame, 
             text="启动手柄映射", 
-            state='normal' if instance_exist else 'disabled', 
+            state='disabled', 
             command=self.toggle_mapper
         )
         self.mapper_button.pack(side='left', padx=5)
@@ -107,10 +123,99 @@ class App:
         self.clear_excl_button = tk.Button(
             root,
             text="清空手柄独占",
-            state='normal' if instance_exist else 'disabled', 
+            state='disabled', 
             command=lambda: self.toggle_exclusive(state="off")
         )
         self.clear_excl_button.pack(side='right', padx=20, pady=(0, 5))
+        # 性能采样按钮
+        self.profile_button = tk.Button(root, text="性能采样", command=self.start_profiling)
+        self.profile_button.pack(side='right', padx=5, pady=(0, 5))
+        self.root.bind("<F9>", self._dump_flight_record)
+        self.startup_timer.record("build ui", ui_start)
+
+        # 驱动、HidHide 注册和设备检查都放到后台，窗口先完成绘制
+        self._background_startup_done = False
+        sys.stdout.write("\n>>> 正在检查驱动与手柄设备...")
+        threading.Thread(target=self._background_startup, daemon=True).start()
+        self.root.after_idle(self._on_interactive)
+
+    def _on_interactive(self):
+        self.startup_timer.mark_interactive()
+        self._report_startup()
+
+    def _background_startup(self):
+        # 各阶段互不依赖，单独捕获异常，某一阶段失败不影响后续检查
+        instance_exist = False
+        with self.startup_timer.stage("driver check"):
+            try:
+                self.check_resources()
+            except Exception as e:
+                sys.stdout.write(f"\n>>> 检查驱动时出错: {e}")
+
+        with self.startup_timer.stage("hidhide app-reg"):
+            try:
+                MY_EXE = os.path.abspath(sys.executable)
+                get_client().app_reg(MY_EXE)
+            except Exception as e:
+                # 注册失败（如已注册或 CLI 不可用）不影响手柄检查，仅提示
+                sys.stdout.write(f"\n>>> 警告：HidHide 应用注册失败: {e}")
+
+        with self.startup_timer.stage("device check"):
+            try:
+                if os.path.exists("user_config.json"):
+                    with open("user_config.json", "r") as f:
+                        path = json.load(f)["controller"]["Path"] 
+                    for device in enum_hid_devices():
+                        if device[3] == path:
+                            instance_exist = True
+                            break
+                    if not instance_exist:
+                        sys.stdout.write("\n>>> 检测到手柄实例变动，请重新初始化。")
+                else:
+                    sys.stdout.write("\n>>> 未检测到用户配置，请先初始化。")
+            except Exception as e:
+                sys.stdout.write(f"\n>>> 检查手柄设备时出错: {e}")
+        self.root.after(0, self._on_startup_checked, instance_exist)
+
+        with self.startup_timer.stage("metrics exporters"):
+            try:
+                self._start_metrics()
+            except Exception as e:
+                sys.stdout.write(f"\n>>> 启动指标导出失败: {e}")
+
+        # 预加载重型模块，使首次启动映射或智慧核心时不再等待导入
+        with self.startup_timer.stage("preload modules"):
+            try:
+                import numpy, cv2, onnxruntime  # noqa: F401
+                import modules.onnx, modules.controller, utils.grab_screen  # noqa: F401
+            except Exception as e:
+                sys.stdout.write(f"\n>>> 预加载模块失败: {e}")
+        self._background_startup_done = True
+        self.root.after(0, self._report_startup)
+
+    def _start_metrics(self):
+        if not os.path.exists("user_config.json"):
+            return
+        with open("user_config.json", "r") as f:
+            metrics_cfg = json.load(f).get("metrics", {})
+        self.metrics_exporters = start_exporters(metrics_cfg)
+        if metrics_cfg.get("port"):
+            sys.stdout.write(f"\n>>> 指标端点：http://127.0.0.1:{metrics_cfg['port']}/metrics")
+        if metrics_cfg.get("file"):
+            sys.stdout.write(f"\n>>> 指标文件：{metrics_cfg['file']}")
+
+    def _on_startup_checked(self, instance_exist: bool):
+        state = 'normal' if instance_exist else 'disabled'
+        # 初始化窗口可能已经在检查期间完成并启用了按钮，此时不再覆盖
+        if self.mapper_button.cget("state") == 'disabled':
+            self.cfg_button.config(state=state)
+            self.mapper_button.config(state=state)
+            self.clear_excl_button.config(state=state)
+
+    def _report_startup(self):
+        # 可交互时间与后台阶段都完成后输出一次启动耗时明细
+        if self._background_startup_done and self.startup_timer.interactive_ms is not None:
+            sys.stdout.write("\n" + self.startup_timer.report())
 
     def check_resources(self):
         drivers = {
@@ -137,6 +242,31 @@ class App:
         else:
             sys.stdout.write("\n>>> 已就绪。")
 
+    def start_profiling(self):
+        seconds = 10
+        if os.path.exists("user_config.json"):
+            with open("user_config.json", "r") as f:
+                seconds = json.load(f).get("profiler_seconds", seconds)
+        self.profile_button.config(state='disabled')
+        sys.stdout.write(f"\n>>> 正在对所有线程进行 {seconds} 秒的性能采样...")
+        profile_for(
+            seconds,
+            model=self.active_model,
+            on_done=lambda path, summary: self.root.after(0, self._on_profile_done, path, summary)
+        )
+
+    def _on_profile_done(self, path, summary):
+        self.profile_button.config(state='normal')
+        sys.stdout.write(f"\n>>> 性能采样完成，调用栈已保存至 {path}")
+        sys.stdout.write("\n" + summary)
+
+    def _dump_flight_record(self, event=None):
+        if self.flight_recorder is None:
+            sys.stdout.write("\n>>> 智慧核心未运行，没有可保存的性能记录。")
+            return
+        sys.stdout.write("\n>>> 已手动触发性能记录转储...")
+        self.flight_recorder.trigger("manual (F9)")
+
     def update_latency_label(self, text):
         self.latency_label.config(text=text)
 
@@ -190,16 +320,40 @@ class App:
                 vendor_id = int(config["controller"]["Vendor_ID"], 16)
                 product_id = int(config["controller"]["Product_ID"], 16)
                 path = config["controller"]["Path"]
+                from modules.controller import DualSenseToDS4Mapper
+                from modules.hid_input import create_input_backend
+                input_backend = config.get("input_backend")
+                engine = None
+                if config.get("mapping_engine", True):
+                    if self.mapping_engine is None:
+                        from modules.mapping_engine import MappingEngine
+                        self.mapping_engine = MappingEngine()
+                    engine = self.mapping_engine
                 sys.stdout.write("\n>>> 正在启动手柄映射...")
                 self.toggle_exclusive("off")
                 while self.thread_clear_excl_running:
                     time.sleep(0.5)
                 if vendor_id == 0x054c:
-                    self.mapper = DualSenseToDS4Mapper(product_id=product_id, path=path)
+                    self.mapper = DualSenseToDS4Mapper(
+                        product_id=product_id,
+                        path=path,
+                        backend=create_input_backend(vendor_id, product_id, path, input_backend)
+                    )
                 elif vendor_id == 0x045e:
                     self.mapper = XboxWirelessToX360Mapper(product_id=product_id, path=path)
-                status = self.mapper.start()
+                status = self.mapper.start(engine=engine)
                 if status:
+                    for extra in config.get("extra_controllers", []):
+                        extra_pid = int(extra["Product_ID"], 16)
+                        mapper = DualSenseToDS4Mapper(
+                            product_id=extra_pid,
+                            path=extra["Path"],
+                            backend=create_input_backend(0x054c, extra_pid, extra["Path"], input_backend)
+                        )
+                        if mapper.start(engine=engine):
+                            self.extra_mappers.append(mapper)
+                        else:
+                            sys.stdout.write(f"\n>>> 附加手柄 {extra['Path']} 启动失败，已跳过。")
                     self.mapper_running = True
                     self.mapper_button.config(text="停止手柄映射")
                     self.button.config(state='normal')
@@ -212,6 +366,11 @@ class App:
                 sys.stdout.write(f"\n>>> 启动映射时出错: {e}")
         else:
             sys.stdout.write("\n>>> 正在停止手柄映射...")
+            if self.mapping_engine is not None and self.mapping_engine.pads:
+                sys.stdout.write("\n" + self.mapping_engine.summary())
+            for mapper in self.extra_mappers:
+                mapper.stop()
+            self.extra_mappers = []
             if self.mapper:
                 self.mapper.stop()
             self.mapper_running = False
@@ -235,7 +394,7 @@ class App:
             self.mapper_button.config(state="disabled")
             self.cfg_button.config(state='disabled')
             # 启动线程
-            self.thread = threading.Thread(target=self._logic_wrapper, daemon=True)
+            self.thread = threading.Thread(target=self._logic_wrapper, name="detection", daemon=True)
             self.thread.start()
             # 检测线程是否启动成功
             self.root.after(1000, self._check_logic_started)
@@ -279,79 +438,259 @@ class App:
                 self.root.after(100, self._check_logic_started)
 
     def run_logic(self):
-        try:
-            def map_range(x: float, a: float, scale: list[float] = [0.2, 0.8]) -> int:
-                normalized = x / a
-                out_min = 127 * scale[0]
-                out_max = 127 * scale[1]
-                value = out_min + (out_max - out_min) * abs(normalized)
-                return value
+        from modules.onnx import APV5Experimental, enable_tiling
+        from modules.cascade import enable_cascade
+        from utils.gc_control import GCController
+        from utils.placement import get_placement
+        from modules.ep_probe import select_provider, make_session_options
+        from modules.pipeline import MultiprocessPipeline
+        from utils.grab_screen import ScreenGrabber
+        from utils.frame_cache import CachedPredictor
+        from utils.scheduler import DemandScheduler
+        from modules.quality import QualityController, AdaptivePredictor, levels_from_config
+        from utils.detection_bus import BusNameInUse, DetectionPublisher
+        from utils.flight_recorder import FlightRecorder
+        from utils.frame_age import FrameAgeTracker
+        from modules.preview import PreviewWindow
+        from utils.metrics import (
+            FRAMES_CAPTURED, FRAMES_DROPPED, EMPTY_GRABS, INFERENCE_LATENCY, DETECTIONS_PER_FRAME
+        )
 
+        camera = None
+        pipeline = None
+        publisher = None
+        preview = None
+        gc_control = None
+        try:
             with open("user_config.json", "r") as f:
                 config = json.load(f)
             hipfire_scale = config["detect_settings"]["hipfire_scale"]
             strong_size = config["detect_settings"]["range"]["inner"]
             weak_size = config["detect_settings"]["range"]["middle"]
             ident_size = config["detect_settings"]["range"]["outer"]
-            strong_center = strong_size / 2
-            weak_center = weak_size / 2
             ident_center = ident_size / 2
             curve_inner = config["detect_settings"]["curve"]["inner"]
             curve_outer = config["detect_settings"]["curve"]["outer"]
             model_path = config["model_path"]
 
-            camera = ScreenGrabber(region=get_screenshot_region_dxcam(ident_size))
-            model = APV5Experimental(model_path)
+            # 检测线程与界面线程按 placement 配置固定核心与优先级
+            placement = get_placement()
+            placement.apply("detection")
+            self.root.after(0, placement.apply, "ui")
+
+            region = get_screenshot_region_dxcam(ident_size)
+            ep_choice = None
+            if config.get("ep_autoselect", True):
+                sys.stdout.write("\n>>> 正在选择最快的 EP...")
+                ep_choice, cached = select_provider(model_path)
+                if not cached:
+                    sys.stdout.write(f"\n>>> EP 测试完成，p95 延迟 {ep_choice['p95_ms']:.3f} ms，结果已缓存。")
+            cache_cfg = config["detect_settings"].get("frame_cache", {})
+            quality_cfg = config.get("quality", {})
+            tiling_cfg = config.get("tiling", {})
+            cascade_cfg = config.get("cascade", {})
+            cache = None
+            adaptive = None
+
+            if config.get("multiprocess", False):
+                # 截图与推理放到子进程，主线程只读取检测结果
+                pipeline = MultiprocessPipeline(
+                    region, model_path, ident_size, ep_choice, cache_cfg, tiling_cfg, cascade_cfg
+                )
+                pipeline.start()
+                provider = ep_choice["providers"][0] if ep_choice else "default"
+                sys.stdout.write(f"\n>>> 智慧核心运行中（多进程模式），当前 EP：{provider}")
+            else:
+                camera = ScreenGrabber(region=region)
+
+                def make_predictor(path):
+                    providers = ep_choice["providers"] if ep_choice is not None else None
+                    sess_options = placement.session_options(
+                        make_session_options(ep_choice["intra_op_num_threads"]) if ep_choice is not None else None
+                    )
+                    model = APV5Experimental(path, providers=providers, sess_options=sess_options)
+                    if tiling_cfg.get("enabled", False):
+                        enable_tiling(model, tiling_cfg)
+                    if cascade_cfg.get("enabled", False):
+                        # 第一级判为空画面的帧跳过完整检测
+                        enable_cascade(model, cascade_cfg, providers, sess_options)
+                    if config.get("steady_state", False):
+                        # 可选：预处理与推理输出都写入预分配缓冲区
+                        model.enable_steady_state()
+                    if not cache_cfg.get("enabled", False):
+                        return model
+                    return CachedPredictor(
+                        model,
+                        pixel_threshold=cache_cfg.get("pixel_threshold", 12),
+                        sensitivity=cache_cfg.get("sensitivity", 0.002),
+                        max_stale_ms=cache_cfg.get("max_stale_ms", 100)
+                    )
+
+                base = make_predictor(model_path)
+                predictor = base
+                if quality_cfg.get("enabled", False):
+                    # 推理赶不上帧预算时自动降档（跳帧、降分辨率、换小模型），有余量时再升档；
+                    # 默认关闭，需在配置中开启 "quality": {"enabled": true}
+                    model = getattr(base, "model", base)
+                    controller = QualityController(
+                        levels_from_config(quality_cfg, model_path, model.dynamic_size),
+                        target_ms=quality_cfg.get("target_ms", 16.0),
+                        window=quality_cfg.get("window", 30),
+                        miss_ratio=quality_cfg.get("miss_ratio", 0.2),
+                        headroom=quality_cfg.get("headroom", 0.6)
+                    )
+                    adaptive = AdaptivePredictor(
+                        controller, lambda path: base if path == model_path else make_predictor(path)
+                    )
+                    predictor = adaptive
+                    model = adaptive.model
+                else:
+                    cache = base if isinstance(base, CachedPredictor) else None
+                    model = getattr(base, "model", base)
+                self.active_model = model
+                sys.stdout.write(f"\n>>> 智慧核心运行中，当前 EP：{model.provider}")
+
+            scheduler = None
+            sched_cfg = config.get("scheduler", {})
+            if pipeline is None and sched_cfg.get("enabled", False):
+                # 只有扳机有动作时才全速截图推理，其余时间低占空比运行；
+                # 空闲时的检测结果最多滞后 1 / idle_rate_hz 秒，默认关闭，需配置 "scheduler": {"enabled": true}
+                scheduler = DemandScheduler(
+                    idle_rate_hz=sched_cfg.get("idle_rate_hz", 2.0),
+                    active_rate_hz=sched_cfg.get("active_rate_hz", 0.0),
+                    hold=sched_cfg.get("hold_ms", 500) / 1000
+                )
+                demand_threshold = sched_cfg.get("trigger_threshold", 64)
+
+            recorder = None
+            flight_cfg = config.get("flight_recorder", {})
+            if flight_cfg.get("enabled", True):
+                # 常驻记录最近几秒的逐帧数据，卡顿时转储到文件（见 tools.flight_view）
+                recorder = FlightRecorder(
+                    seconds=flight_cfg.get("seconds", 10),
+                    trigger_ms=flight_cfg.get("trigger_ms", 50),
+                    frame_size=flight_cfg.get("frame_size", 0),
+                    out_dir=flight_cfg.get("out_dir", "flight"),
+                    max_dumps=flight_cfg.get("max_dumps", 20)
+                )
+                self.flight_recorder = recorder
+
+            if scheduler is not None or recorder is not None:
+                def on_report(state):
+                    if recorder is not None:
+                        recorder.record_hid(time.perf_counter())
+                    if scheduler is not None and (
+                        state["rt"] > demand_threshold or state["lt"] > demand_threshold
+                    ):
+                        scheduler.request()
+
+                self.mapper.on_report = on_report
+
+            publish_cfg = config.get("publish", {})
+            if publish_cfg.get("enabled", False):
+                # 供叠加层、日志等其他进程订阅检测结果（见 tools.detection_tail）
+                try:
+                    publisher = DetectionPublisher(publish_cfg.get("name", "tgc_detections"))
+                    sys.stdout.write(f"\n>>> 检测结果发布至共享内存 {publisher.ring.name}")
+                except BusNameInUse as e:
+                    sys.stdout.write(f"\n>>> {e}，本次不发布检测结果。")
+            preview_cfg = config.get("preview", {})
+            if preview_cfg.get("enabled", False):
+                # 调试预览：缩放与画框都在预览线程中，检测循环只做非阻塞交接
+                preview = PreviewWindow(
+                    max_fps=preview_cfg.get("max_fps", 30),
+                    size=preview_cfg.get("size", 480),
+                    frame_ring=pipeline.frames if pipeline is not None else None
+                )
+                preview.start()
+
+            # 每帧携带帧序号与截图时间，统计从截图到虚拟手柄提交的帧龄
+            frame_age = FrameAgeTracker()
+            self.mapper.frame_age = frame_age
 
-            sys.stdout.write(f"\n>>> 智慧核心运行中，当前 EP：{model.provider}")
             last_print_time = time.time()
             
             tracking_delay_start = time.perf_counter()
+            last_dropped = 0
+            # 默认不改动 gc；"scheduled" 时长期对象在此之后冻结并关闭自动回收，改为每轮循环开始前（上一帧已结束）补做
+            gc_control = GCController(config.get("gc", {}).get("mode", "off"))
+            gc_control.start()
             while self.running:
-                cycle_start = time.perf_counter()
-                grab_start = time.perf_counter()
-                img = camera.grab_frame()
-                if img is None:
-                    continue
-                grab_end = time.perf_counter()
-                grab_latency = (grab_end - grab_start) * 1000
+                gc_control.safe_point()
+                if pipeline is not None:
+                    item = pipeline.wait_detections(timeout=0.1)
+                    if item is None:
+                        continue
+                    cycle_start = time.perf_counter()
+                    gc_control.frame_start()
+                    result, capture_time, grab_latency, infer_latency, dropped_frames, infer_end = item
+                    frame_id = result.frame_id
+                    frame_age.result_ready(capture_time, infer_end - infer_latency / 1000, infer_end, cycle_start)
+                    FRAMES_CAPTURED.inc(1 + dropped_frames - last_dropped)
+                    FRAMES_DROPPED.inc(dropped_frames - last_dropped)
+                    last_dropped = dropped_frames
+                else:
+                    if scheduler is not None and not scheduler.wait_next():
+                        continue
+                    cycle_start = time.perf_counter()
+                    gc_control.frame_start()
+                    grab_start = time.perf_counter()
+                    img = camera.grab_frame()
+                    if img is None:
+                        EMPTY_GRABS.inc()
+                        continue
+                    FRAMES_CAPTURED.inc()
+                    grab_end = time.perf_counter()
+                    grab_latency = (grab_end - grab_start) * 1000
+                    frame_id = camera.frame_id
+                    capture_time = camera.capture_time
+
+                    infer_start = time.perf_counter()
+                    if adaptive is not None:
+                        result, image = adaptive.predict(img, grab_latency, frame_id, capture_time)
+                    else:
+                        result, image = predictor.predict(img, frame_id, capture_time)
+                    infer_end = time.perf_counter()
+                    infer_latency = (infer_end - infer_start) * 1000
+                    # 命中缓存或跳帧时结果来自更早的帧，只统计真正推理了本帧的情况
+                    if result.frame_id == frame_id:
+                        frame_age.result_ready(capture_time, infer_start, infer_end, infer_end)
 
-                infer_start = time.perf_counter()
-                result, image = model.predict(img)
-                infer_end = time.perf_counter()
-                infer_latency = (infer_end - infer_start) * 1000
+                INFERENCE_LATENCY.observe(infer_latency / 1000)
+                DETECTIONS_PER_FRAME.observe(len(result))
 
                 if (
-                    result is not None \
+                    len(result) \
                     and (self.mapper.dual_sense_state["rt"] > 128 \
                     or time.perf_counter() - tracking_delay_start < 0.2)
                 ):
-                    xy_result = result - ident_center
-                    distances = np.abs(xy_result[:, 0]) + np.abs(xy_result[:, 1])
-                    min_idx = distances.argmin()
+                    # 离准星最近的目标，在结果自带的缓冲区中计算，之后只做标量运算
+                    _, dx, dy = result.nearest(ident_center, ident_center)
                     strength = 1
                     if self.mapper.dual_sense_state["lt"] < 128:
                         strength *= hipfire_scale
-                    euclidean_distance = np.sqrt(np.sum(xy_result[min_idx]**2))
-                    cos_angle = xy_result[min_idx][0] / euclidean_distance
-                    sin_angle = xy_result[min_idx][1] / euclidean_distance
-                    if euclidean_distance < strong_center:
-                        map_euclidean_distance = map_range(euclidean_distance, strong_size, curve_inner) * strength
-                    elif euclidean_distance < weak_center:
-                        map_euclidean_distance = map_range(euclidean_distance, weak_size, curve_outer) * strength
-                    else:
-                        map_euclidean_distance = 0
-                    rx_offset = map_euclidean_distance * cos_angle
-                    ry_offset = map_euclidean_distance * sin_angle
-                    self.mapper.add_rx_ry_offset(rx_offset, ry_offset)
+                    rx_offset, ry_offset = aim_offset(
+                        dx, dy, strength, strong_size, weak_size, curve_inner, curve_outer
+                    )
+                    self.mapper.add_rx_ry_offset(rx_offset, ry_offset, result.capture_time)
                     if self.mapper.dual_sense_state["rt"] > 128:
                         tracking_delay_start = time.perf_counter()
                 else:
                     self.mapper.rx_override = None
                     self.mapper.ry_override = None
 
+                if publisher is not None:
+                    publisher.publish(result, result.frame_id, result.capture_time)
+                if preview is not None:
+                    preview.submit(img if pipeline is None else None, result)
+
                 cycle_end = time.perf_counter()
                 cycle_latency = (cycle_end - cycle_start) * 1000
+                if recorder is not None:
+                    recorder.record(
+                        frame_id, cycle_start, grab_latency, infer_latency, cycle_latency,
+                        len(result), img if pipeline is None else None
+                    )
 
                 now = time.time()
                 if now - last_print_time > 1:
@@ -360,11 +699,48 @@ class App:
                         f"[Latency] screen grab: {grab_latency:.3f} ms\n"
                         f"[Latency] inference: {infer_latency:.3f} ms"
                     )
+                    if adaptive is not None:
+                        cache = adaptive.current if isinstance(adaptive.current, CachedPredictor) else None
+                        self.active_model = adaptive.model
+                        latency_str += (
+                            f"\n[Quality] level: {adaptive.controller.level.name}, "
+                            f"transitions: {len(adaptive.controller.transitions)}"
+                        )
+                    gate = self.active_model.gate if self.active_model is not None else None
+                    if gate is not None:
+                        latency_str += (
+                            f"\n[Cascade] skip rate: {gate.skip_rate * 100:.1f}%, "
+                            f"saved: {gate.saved_ms_per_frame:.2f} ms/frame"
+                        )
+                    if cache is not None:
+                        latency_str += f"\n[Cache] hit rate: {cache.hit_rate * 100:.1f}%"
+                    if pipeline is not None:
+                        latency_str += f"\n[Pipeline] dropped frames: {dropped_frames}"
+                    age = frame_age.percentiles("end_to_end")
+                    if age is not None:
+                        handoff = frame_age.percentiles("handoff")
+                        latency_str += (
+                            f"\n[Frame age] capture->pad p50 {age[0]:.2f} ms, p95 {age[1]:.2f} ms, "
+                            f"mapper wait p50 {handoff[0]:.2f} ms"
+                        )
+                    if scheduler is not None:
+                        latency_str += (
+                            f"\n[Scheduler] {'active' if scheduler.active else 'idle'}, "
+                            f"active frames: {scheduler.active_ratio * 100:.1f}%, "
+                            f"max wake-up: {scheduler.max_wake_latency * 1000:.1f} ms"
+                        )
                     self.root.after(0, self.update_latency_label, latency_str)
                     last_print_time = now
 
             self.mapper.rx_override = None
             self.mapper.ry_override = None
+            if frame_age.summary():
+                sys.stdout.write("\n" + frame_age.summary())
+            if self.active_model is not None and self.active_model.gate is not None:
+                sys.stdout.write("\n" + self.active_model.gate.summary())
+            if placement.enabled:
+                sys.stdout.write("\n" + placement.summary())
+            sys.stdout.write("\n" + gc_control.summary())
             sys.stdout.write("\n>>> 智慧核心已关闭。")
         except Exception as e:
             sys.stdout.write(f"\n>>> 智慧核心运行时出错。")
@@ -372,7 +748,28 @@ class App:
             self.running = False
             self.handle_logic_failure()
         finally:
-            camera.stop()
+            self.active_model = None
+            self.flight_recorder = None
+            if self.mapper is not None:
+                self.mapper.on_report = None
+                self.mapper.frame_age = None
+            # gc 是进程全局状态，先恢复，后续清理出错也不会让界面进程停留在关闭回收的状态
+            if gc_control is not None:
+                gc_control.stop()
+            # 预览线程可能正持有共享帧环的视图，先停止预览再关闭流水线
+            cleanups = (
+                ("预览", None if preview is None else preview.stop),
+                ("截图", None if camera is None else camera.stop),
+                ("推理流水线", None if pipeline is None else pipeline.stop),
+                ("检测结果发布", None if publisher is None else publisher.close),
+            )
+            for name, cleanup in cleanups:
+                if cleanup is None:
+                    continue
+                try:
+                    cleanup()
+                except Exception as e:
+                    sys.stdout.write(f"\n>>> 关闭{name}时出错：{e}")
         
     def toggle_exclusive(self, state: str = "off"):
         if state == "off":
@@ -393,12 +790,7 @@ class App:
             self.mapper_button.config(state='disabled')
             self.cfg_button.config(state='disabled')
             self.button.config(state='disabled')
-            subprocess.run(
-                [
-                    "C:/Program Files/Nefarius Software Solutions/HidHide/x64/HidHideCLI.exe", 
-                    f"--cloak-{state}"
-                ]
-            )
+            get_client().cloak(state == "on")
             with open("user_config.json", "r") as f:
                 config = json.load(f)
             if not self.thread_clear_excl_running:
@@ -418,52 +810,45 @@ class App:
             self.button.config(state=button_states["button"])
 
     def reenable_device(self, state: str = "off", path: str = None, button_states: dict = None):
-        DEVICE_ID = path
-        PS_CMD_DISABLE = f'Get-PnpDevice -InstanceId "{DEVICE_ID}" | Disable-PnpDevice -Confirm:$false'
-        PS_CMD_ENABLE  = f'Get-PnpDevice -InstanceId "{DEVICE_ID}" | Enable-PnpDevice  -Confirm:$false'
-        # 禁用（拔出）
-        subprocess.run(
-            ["powershell", "-Command", PS_CMD_DISABLE],
-            check=True
-        )
-        while True:
-            result = subprocess.run(
-                ["powershell", "-Command",
-                f'Get-PnpDevice -InstanceId "{DEVICE_ID}" | Select-Object -ExpandProperty Status'],
-                capture_output=True, text=True
-            )
-            status = result.stdout.strip()
-            if re.search(r"(Disabled|Error)", status, re.IGNORECASE):
-                break
-            time.sleep(0.5)
-        # 启用（插入）
-        subprocess.run(
-            ["powershell", "-Command", PS_CMD_ENABLE],
-            check=True
-        )
-        while True:
-            result = subprocess.run(
-                ["powershell", "-Command",
-                f'Get-PnpDevice -InstanceId "{DEVICE_ID}" | Select-Object -ExpandProperty Status'],
-                capture_output=True, text=True
+        from modules.device_control import DeviceReenabler, create_backend
+
+        try:
+            # 后端（常驻 PowerShell 会话或 CfgMgr32）只创建一次，后续切换复用
+            if self.device_backend is None:
+                self.device_backend = create_backend()
+            timings = DeviceReenabler(self.device_backend).run(path)
+            if state == "off":
+                sys.stdout.write("\n>>> 手柄独占已停止。")
+            else:
+                sys.stdout.write("\n>>> 手柄独占已启动。")
+            sys.stdout.write(
+                f"\n>>> 设备重新连接耗时 {timings['total']:.0f} ms（{self.device_backend.name}）。"
             )
-            status = result.stdout.strip()
-            if re.search(r"(OK)", status, re.IGNORECASE):
-                break
-            time.sleep(0.5)
-        self.thread_clear_excl_running = False
-        self.clear_excl_button.config(state=button_states["clear_excl"])
-        self.init_button.config(state=button_states["init"])
-        self.mapper_button.config(state=button_states["mapper"])
-        self.cfg_button.config(state=button_states["cfg"])
-        self.button.config(state=button_states["button"])
-        if state == "off":
-            sys.stdout.write("\n>>> 手柄独占已停止。")
-        else:
-            sys.stdout.write("\n>>> 手柄独占已启动。")
+        except Exception as e:
+            sys.stdout.write(f"\n>>> 重新连接手柄时出错: {e}")
+        finally:
+            self.thread_clear_excl_running = False
+            self.clear_excl_button.config(state=button_states["clear_excl"])
+            self.init_button.config(state=button_states["init"])
+            self.mapper_button.config(state=button_states["mapper"])
+            self.cfg_button.config(state=button_states["cfg"])
+            self.button.config(state=button_states["button"])
 
+    def close(self):
+        """窗口关闭后调用：结束常驻的设备控制后端（如 PowerShell 会话进程）。"""
+        if self.device_backend is not None:
+            try:
+                self.device_backend.close()
+            except Exception as e:
+                sys.stdout.write(f"\n>>> 关闭设备控制后端时出错: {e}")
+            self.device_backend = None
 
 if __name__ == "__main__":
+    # 打包为 exe 后多进程模式需要
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = App(root)
-    root.mainloop()
+    try:
+        root.mainloop()
+    finally:
+        app.close()
@@ -0,0 +1,198 @@
+"""
+稳态内存分配检查：用 tracemalloc 统计检测热路径（predict、可选的帧缓存、最近目标与摇杆偏移计算）
+在预热之后是否仍有对象在帧之间遗留，对比普通模式与稳态模式（预分配缓冲区 + IOBinding + GC 调度）。
+
+按完整调用栈归属分配：调用栈中经过热路径文件（run.py、modules/onnx.py、utils/detections.py、
+utils/frame_cache.py）的分配都计入，包括这些代码调用的 NumPy 与 onnxruntime 封装（如 session.run
+返回的输出数组）。再按分配发生的最内层代码行分成两类：
+- 热路径：最内层就在热路径文件中，任一窗口块数增长即视为存在遗留
+- 库内部：热路径调用的库代码内部的分配。onnxruntime 的 run / run_with_iobinding 会保留少量小块，
+  增长随运行时间逐渐减小直至停止（预热越长越小），只有每个窗口都增长且最后一个窗口不少于第一个窗口
+  （增长没有减缓的迹象）时才视为遗留
+
+按内存块数而不是字节数比较，预热后连续统计若干个窗口，每个窗口结束时（先做一次完整回收）与上一个窗口比较，
+存在遗留时列出增长最多的调用栈并以非零退出码结束，可用于改动热路径后的回归检查。
+
+另外报告每帧临时分配峰值（一帧之内同时存在的临时内存，不限于热路径文件），--max-transient 给出上限时
+稳态模式超过上限也视为失败。onnxruntime 的输出数组（普通模式下每帧新建，稳态模式下由 IOBinding 复用）
+在 C++ 中分配，tracemalloc 看不到，两种模式的这部分差别本工具无法区分。
+
+用法：
+    python -m tools.alloc_check apv5.onnx --frames recordings/ --warmup 200 --count 500 --windows 5
+    python -m tools.alloc_check apv5.onnx --size 320 --cache --max-transient 4096
+"""
+import argparse
+import gc
+import os
+import tracemalloc
+
+import numpy as np
+
+from modules.onnx import APV5Experimental
+from run import aim_offset
+from utils.frame_cache import CachedPredictor
+from utils.frames import list_frame_files, load_frame
+from utils.gc_control import GCController
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 热路径文件：只统计调用栈经过这些文件的分配
+HOT_PATH_FILES = ("run.py", "modules/onnx.py", "utils/detections.py", "utils/frame_cache.py")
+# 保存的调用栈深度，需要足够深才能从 NumPy / onnxruntime 内部回溯到热路径文件
+TRACE_FRAMES = 32
+# 与 initialize 生成的默认配置一致的瞄准参数
+AIM_SETTINGS = {"strong_size": 80, "weak_size": 320, "curve_inner": [0.05, 1.0], "curve_outer": [0.2, 0.2]}
+
+
+def hot_path_names():
+    return tuple(os.path.join(ROOT, *path.split("/")) for path in HOT_PATH_FILES)
+
+
+def hot_path_filters():
+    return [tracemalloc.Filter(True, name, all_frames=True) for name in hot_path_names()]
+
+
+def in_hot_path(stat, names) -> bool:
+    """分配发生的最内层代码行是否在热路径文件中（调用栈按从外到内排列）。"""
+    return stat.traceback[-1].filename in names
+
+
+def run_frames(predictor, center, frames, start, count, gc_control, transient=None):
+    """模拟检测循环的一段：predict 后计算离中心最近的目标与摇杆偏移，帧尾进入 GC 安全点。"""
+    for i in range(start, start + count):
+        gc_control.frame_start()
+        if transient is not None:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        result, _ = predictor.predict(frames[i % len(frames)], i, 0.0)
+        if len(result):
+            _, dx, dy = result.nearest(center, center)
+            aim_offset(dx, dy, 1.0, **AIM_SETTINGS)
+        if transient is not None:
+            transient[i - start] = tracemalloc.get_traced_memory()[1] - before
+        gc_control.safe_point()
+
+
+def settled_snapshot(gc_control, filters):
+    """
+    先做一次完整回收再取快照：scheduled 模式下循环垃圾要等到帧尾的安全点才回收，
+    不先回收的话快照结果取决于取快照时 0 代的计数。
+    """
+    gc_control.collect()
+    return tracemalloc.take_snapshot().filter_traces(filters)
+
+
+def measure(predictor, center, frames, warmup, count, windows, gc_mode, top=5):
+    gc_control = GCController(gc_mode)
+    filters = hot_path_filters()
+    names = hot_path_names()
+    transient = np.zeros(count, dtype=np.int64)
+    hot_blocks = []
+    library_blocks = []
+    growth = {"hot": [], "library": []}
+    tracemalloc.start(TRACE_FRAMES)
+    try:
+        gc_control.start()
+        run_frames(predictor, center, frames, 0, warmup, gc_control)
+        previous = settled_snapshot(gc_control, filters)
+        for w in range(windows):
+            run_frames(predictor, center, frames, warmup + w * count, count, gc_control,
+                       transient if w == 0 else None)
+            snapshot = settled_snapshot(gc_control, filters)
+            stats = snapshot.compare_to(previous, "traceback")
+            hot = [s for s in stats if in_hot_path(s, names)]
+            library = [s for s in stats if not in_hot_path(s, names)]
+            hot_blocks.append(sum(s.count_diff for s in hot))
+            library_blocks.append(sum(s.count_diff for s in library))
+            for kind, group in (("hot", hot), ("library", library)):
+                if not growth[kind]:
+                    growth[kind] = [s for s in group if s.count_diff > 0][:top]
+            previous = snapshot
+    finally:
+        gc_control.stop()
+        tracemalloc.stop()
+    return {
+        "hot_blocks": hot_blocks,
+        "library_blocks": library_blocks,
+        "transient_p50": float(np.percentile(transient, 50)),
+        "transient_max": int(transient.max()),
+        "gc_pauses": gc_control.pauses,
+        "gc_in_frame": gc_control.in_frame_pauses,
+        "max_pause_ms": gc_control.max_pause * 1000,
+        "growth": growth,
+    }
+
+
+def print_growth(stats):
+    for stat in stats:
+        print(f"    {stat.count_diff:+d} blocks, {stat.size_diff:+d} B")
+        for line in stat.traceback.format(limit=6):
+            print(f"      {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查检测热路径稳定运行后的每帧内存分配")
+    parser.add_argument("model", help="ONNX 模型路径")
+    parser.add_argument("--frames", help="录制帧目录；不提供时使用随机画面")
+    parser.add_argument("--size", type=int, default=320, help="随机画面的边长（截图区域）")
+    parser.add_argument("--warmup", type=int, default=200, help="预热帧数")
+    parser.add_argument("--count", type=int, default=500, help="每个统计窗口的帧数")
+    parser.add_argument("--windows", type=int, default=5, help="统计窗口数")
+    parser.add_argument("--cpu", action="store_true", help="只使用 CPUExecutionProvider")
+    parser.add_argument("--cache", action="store_true", help="像检测循环开启 frame_cache 时一样套一层 CachedPredictor")
+    parser.add_argument("--max-transient", type=int, help="稳态模式每帧临时分配峰值的上限（字节）")
+    args = parser.parse_args()
+
+    if args.frames:
+        frames = [load_frame(p) for p in list_frame_files(args.frames, 64)]
+    else:
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 255, (args.size, args.size, 3), dtype=np.uint8) for _ in range(16)]
+    if not frames:
+        raise SystemExit(">>> 帧目录为空。")
+    providers = ["CPUExecutionProvider"] if args.cpu else None
+
+    results = {}
+    for mode, steady, gc_mode in (("default", False, "auto"), ("steady", True, "scheduled")):
+        model = APV5Experimental(args.model, ident_size=frames[0].shape[1], providers=providers)
+        if steady:
+            model.enable_steady_state()
+        predictor = CachedPredictor(model) if args.cache else model
+        gc.collect()
+        results[mode] = measure(
+            predictor, model.ident_size / 2, frames, args.warmup, args.count, args.windows, gc_mode
+        )
+
+    print(f">>> 预热 {args.warmup} 帧后统计 {args.windows} 个窗口 × {args.count} 帧，EP：{model.provider}"
+          f"{'，开启帧缓存' if args.cache else ''}")
+    print(f"{'mode':<10}{'hot path growth':<22}{'library growth':<22}{'transient p50':>15}{'transient max':>15}"
+          f"{'GC pauses':>11}{'in frame':>10}{'max pause':>11}")
+    for mode, r in results.items():
+        hot = " ".join(str(b) for b in r["hot_blocks"])
+        library = " ".join(str(b) for b in r["library_blocks"])
+        print(
+            f"{mode:<10}{hot:<22}{library:<22}{r['transient_p50']:>15.0f}{r['transient_max']:>15}"
+            f"{r['gc_pauses']:>11}{r['gc_in_frame']:>10}{r['max_pause_ms']:>9.2f}ms"
+        )
+
+    steady = results["steady"]
+    failed = False
+    if any(b > 0 for b in steady["hot_blocks"]):
+        print(">>> 稳态模式热路径存在遗留的内存块，增长最多的调用栈：")
+        print_growth(steady["growth"]["hot"])
+        failed = True
+    library = steady["library_blocks"]
+    if all(b > 0 for b in library) and library[-1] >= library[0]:
+        print(">>> 稳态模式热路径调用的库代码每个窗口都在增长且没有减缓，增长最多的调用栈：")
+        print_growth(steady["growth"]["library"])
+        failed = True
+    if args.max_transient is not None and steady["transient_max"] > args.max_transient:
+        print(f">>> 稳态模式每帧临时分配峰值 {steady['transient_max']} B 超过上限 {args.max_transient} B。")
+        failed = True
+    if failed:
+        raise SystemExit(1)
+    print(f">>> 稳态模式热路径在 {args.windows} 个窗口内没有遗留内存块。")
+
+
+if __name__ == "__main__":
+    main()
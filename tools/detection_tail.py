@@ -0,0 +1,64 @@
+"""
+订阅智慧核心发布的检测结果（需在配置中开启 "publish"），逐帧或按秒输出统计：
+接收帧数、漏读帧数、从截图/发布到本进程读取的延迟。
+
+用法：
+    python -m tools.detection_tail
+    python -m tools.detection_tail --print-rows --frames 100
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils.detection_bus import BUS_NAME, DetectionSubscriber
+
+
+def main():
+    parser = argparse.ArgumentParser(description="订阅本机发布的检测结果并统计延迟")
+    parser.add_argument("--name", default=BUS_NAME, help="共享内存名称")
+    parser.add_argument("--frames", type=int, default=None, help="接收指定帧数后退出")
+    parser.add_argument("--print-rows", action="store_true", help="逐帧打印检测行")
+    args = parser.parse_args()
+
+    try:
+        sub = DetectionSubscriber(args.name)
+    except FileNotFoundError:
+        raise SystemExit(f">>> 未找到共享内存 {args.name}，请确认发布方已启动。")
+
+    received = 0
+    publish_delays = []
+    capture_delays = []
+    last_report = time.perf_counter()
+    try:
+        while args.frames is None or received < args.frames:
+            item = sub.wait(timeout=5.0)
+            if item is None:
+                print(">>> 5 秒内未收到新结果，退出。")
+                break
+            frame_id, capture_time, publish_time, _, detections = item
+            now = time.perf_counter()
+            received += 1
+            publish_delays.append((now - publish_time) * 1e6)
+            capture_delays.append((now - capture_time) * 1000)
+            if args.print_rows:
+                print(f"frame {frame_id}: {detections.rows.tolist()}")
+            if now - last_report >= 1.0:
+                print(f">>> 已接收 {received} 帧，漏读 {sub.missed} 帧，最新 frame_id {frame_id}")
+                last_report = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sub.close()
+
+    if publish_delays:
+        print(
+            f">>> 共接收 {received} 帧，漏读 {sub.missed} 帧；"
+            f"发布->读取 p50 {np.percentile(publish_delays, 50):.1f} us，"
+            f"p99 {np.percentile(publish_delays, 99):.1f} us；"
+            f"截图->读取 p50 {np.percentile(capture_delays, 50):.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+离线数据集评估：把目录中的帧或视频流式送入 APV5Experimental.predict_batch，
+统计吞吐量（images/s），并在提供标注时统计检测指标。
+
+解码在线程池中提前进行，与推理重叠。标注为 YOLO 格式的 txt（class cx cy w h，归一化坐标），
+文件名与帧文件同名，只统计 class 0。
+
+用法：
+    python -m tools.evaluate apv5.onnx recordings/ --labels labels/ --batch-size 32
+    python -m tools.evaluate apv5.onnx capture.mp4
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from modules.onnx import APV5Experimental
+from utils.frames import list_frame_files, load_frame
+from utils.detection_metrics import AgreementStats
+
+
+def iter_directory(frame_dir, workers=4, prefetch=64, limit=None):
+    """在线程池中并行解码目录中的帧，按文件顺序产出 (名称, 帧)。"""
+    files = list_frame_files(frame_dir, limit)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        it = iter(files)
+        for path in it:
+            pending.append((path.stem, pool.submit(load_frame, path)))
+            if len(pending) >= prefetch:
+                break
+        while pending:
+            name, future = pending.popleft()
+            nxt = next(it, None)
+            if nxt is not None:
+                pending.append((nxt.stem, pool.submit(load_frame, nxt)))
+            yield name, future.result()
+
+
+def iter_video(video_path, prefetch=64, limit=None):
+    """视频只能顺序解码，由单独的线程解码到有界队列中。"""
+    frames = queue.Queue(maxsize=prefetch)
+
+    def reader():
+        cap = cv2.VideoCapture(str(video_path))
+        index = 0
+        try:
+            while limit is None or index < limit:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                frames.put((f"{index:06d}", frame))
+                index += 1
+        finally:
+            cap.release()
+            frames.put(None)
+
+    threading.Thread(target=reader, daemon=True).start()
+    while True:
+        item = frames.get()
+        if item is None:
+            return
+        yield item
+
+
+def load_labels(label_dir, name, width, height):
+    """读取 YOLO 格式标注，返回像素坐标下 class 0 的 xywh 框。文件不存在视为无目标。"""
+    path = Path(label_dir) / f"{name}.txt"
+    if not path.exists():
+        return np.zeros((0, 4), dtype=np.float32)
+    rows = np.loadtxt(path, dtype=np.float32, ndmin=2)
+    if rows.size == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+    rows = rows[rows[:, 0] == 0]
+    return rows[:, 1:5] * np.array([width, height, width, height], dtype=np.float32)
+
+
+def evaluate(model, source, batch_size=16, labels=None, workers=4, limit=None):
+    if os.path.isdir(source):
+        stream = iter_directory(source, workers=workers, prefetch=batch_size * 4, limit=limit)
+    else:
+        stream = iter_video(source, prefetch=batch_size * 4, limit=limit)
+
+    stats = AgreementStats(iou_thres=0.5) if labels else None
+    n_images = 0
+    n_detections = 0
+    infer_time = 0.0
+    start = time.perf_counter()
+
+    batch = []
+    names = []
+
+    def flush():
+        nonlocal n_images, n_detections, infer_time
+        t = time.perf_counter()
+        results = model.predict_batch(batch, batch_size=batch_size)
+        infer_time += time.perf_counter() - t
+        for name, image, (boxes, _) in zip(names, batch, results):
+            n_detections += 0 if boxes is None else len(boxes)
+            if stats is not None:
+                h, w = image.shape[:2]
+                stats.update(boxes, load_labels(labels, name, w, h))
+        n_images += len(batch)
+        batch.clear()
+        names.clear()
+
+    for name, frame in stream:
+        names.append(name)
+        batch.append(frame)
+        if len(batch) == batch_size:
+            flush()
+    if batch:
+        flush()
+
+    elapsed = time.perf_counter() - start
+    report = {
+        "images": n_images,
+        "detections": n_detections,
+        "throughput": n_images / elapsed if elapsed else 0.0,
+        "inference_throughput": n_images / infer_time if infer_time else 0.0,
+    }
+    if stats is not None:
+        report["recall"] = stats.recall
+        report["precision"] = stats.precision
+        report["mean_iou"] = stats.mean_iou
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线批量评估模型的吞吐量与检测指标")
+    parser.add_argument("model", help="ONNX 模型路径")
+    parser.add_argument("source", help="帧目录或视频文件")
+    parser.add_argument("--labels", help="YOLO 格式标注目录（可选）")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4, help="解码线程数")
+    parser.add_argument("--limit", type=int, default=None, help="最多评估的帧数")
+    parser.add_argument("--cpu", action="store_true", help="只使用 CPUExecutionProvider")
+    args = parser.parse_args()
+
+    providers = ["CPUExecutionProvider"] if args.cpu else None
+    model = APV5Experimental(args.model, ident_size=320, providers=providers)
+    if model.fixed_batch is not None and model.fixed_batch != args.batch_size:
+        print(f">>> 模型 batch 维度固定为 {model.fixed_batch}，将按该大小组批。")
+    print(f">>> 当前 EP：{model.provider}")
+
+    report = evaluate(model, args.source, args.batch_size, args.labels, args.workers, args.limit)
+    print(f">>> 图片数：{report['images']}，检测框数：{report['detections']}")
+    print(f">>> 端到端吞吐：{report['throughput']:.1f} images/s")
+    print(f">>> 纯推理吞吐：{report['inference_throughput']:.1f} images/s")
+    if "recall" in report:
+        print(
+            f">>> Recall@0.5：{report['recall']:.3f}  Precision@0.5：{report['precision']:.3f}  "
+            f"mean IoU：{report['mean_iou']:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
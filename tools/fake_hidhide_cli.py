@@ -0,0 +1,89 @@
+"""
+HidHideCLI.exe 的假实现，用于在 Linux 上运行和计时初始化/独占流程。
+
+状态保存在 HIDHIDE_FAKE_STATE 指定的 JSON 文件中（默认 fake_hidhide_state.json），
+HIDHIDE_FAKE_DELAY_MS 可模拟每次调用的进程启动开销。
+
+用法：
+    HIDHIDE_CLI=tools/fake_hidhide_cli.py python run.py
+"""
+import json
+import os
+import sys
+import time
+
+
+STATE_PATH = os.environ.get("HIDHIDE_FAKE_STATE", "fake_hidhide_state.json")
+
+DEFAULT_STATE = {
+    "cloak": False,
+    "apps": [],
+    "hidden": [],
+    "devices": [
+        {
+            "friendlyName": "DualSense Wireless Controller",
+            "devices": [
+                {
+                    "present": True,
+                    "symbolicLink": "\\\\?\\hid#vid_054c&pid_0ce6&mi_03#7&1a2b3c4d&0&0000#{4d1e55b2-f16f-11cf-88cb-001111000030}",
+                }
+            ],
+        }
+    ],
+}
+
+
+def load_state():
+    if os.path.exists(STATE_PATH):
+        with open(STATE_PATH, "r") as f:
+            return json.load(f)
+    return json.loads(json.dumps(DEFAULT_STATE))
+
+
+def save_state(state):
+    with open(STATE_PATH, "w") as f:
+        json.dump(state, f, indent=4)
+
+
+def main(argv):
+    time.sleep(int(os.environ.get("HIDHIDE_FAKE_DELAY_MS", "0")) / 1000)
+    state = load_state()
+    changed = False
+    args = list(argv)
+    while args:
+        opt = args.pop(0)
+        if opt in ("--app-reg", "--app-unreg", "--dev-hide", "--dev-unhide"):
+            if not args:
+                sys.stderr.write(f"{opt} 缺少参数\n")
+                return 1
+            value = args.pop(0)
+            key = "apps" if opt.startswith("--app") else "hidden"
+            if opt in ("--app-reg", "--dev-hide"):
+                if value not in state[key]:
+                    state[key].append(value)
+            elif value in state[key]:
+                state[key].remove(value)
+            changed = True
+        elif opt in ("--cloak-on", "--cloak-off"):
+            state["cloak"] = opt == "--cloak-on"
+            changed = True
+        elif opt == "--cloak-state":
+            print("--cloak-on" if state["cloak"] else "--cloak-off")
+        elif opt == "--dev-gaming":
+            print(json.dumps(state["devices"]))
+        elif opt == "--dev-list":
+            for item in state["hidden"]:
+                print(f'--dev-hide "{item}"')
+        elif opt == "--app-list":
+            for item in state["apps"]:
+                print(f'--app-reg "{item}"')
+        else:
+            sys.stderr.write(f"未知参数：{opt}\n")
+            return 1
+    if changed:
+        save_state(state)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
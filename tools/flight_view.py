@@ -0,0 +1,90 @@
+"""
+查看 FlightRecorder 转储的性能异常记录（flight/*.npz）：
+触发原因、各阶段耗时分位数、最慢的几帧及其前后、手柄报告间隔与断档，可选导出缩略图和 CSV。
+
+用法：
+    python -m tools.flight_view flight/flight-20250101-120000-000.npz
+    python -m tools.flight_view flight/xxx.npz --top 5 --frames-out thumbs/ --csv frames.csv
+"""
+import argparse
+import os
+
+import cv2
+import numpy as np
+
+from utils.flight_recorder import FIELDS, load_dump
+
+
+COL = {name: i for i, name in enumerate(FIELDS)}
+
+
+def stage_table(rows):
+    lines = [f"{'stage':<12}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"]
+    for name in ("grab_ms", "infer_ms", "cycle_ms"):
+        v = rows[:, COL[name]]
+        lines.append(
+            f"{name[:-3]:<12}{np.percentile(v, 50):>9.2f}{np.percentile(v, 95):>9.2f}"
+            f"{np.percentile(v, 99):>9.2f}{v.max():>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+def slowest(rows, top, context=2):
+    lines = []
+    t0 = rows[0, COL["time"]]
+    for idx in np.argsort(rows[:, COL["cycle_ms"]])[::-1][:top]:
+        lines.append(f"-- frame {int(rows[idx, COL['frame_id']])} at +{rows[idx, COL['time']] - t0:.3f} s")
+        for j in range(max(0, idx - context), min(len(rows), idx + context + 1)):
+            r = rows[j]
+            hid_age = (r[COL["time"]] - r[COL["last_hid"]]) * 1000 if r[COL["last_hid"]] else float("nan")
+            mark = ">" if j == idx else " "
+            lines.append(
+                f"{mark} frame {int(r[COL['frame_id']]):>8}  grab {r[COL['grab_ms']]:7.2f}  "
+                f"infer {r[COL['infer_ms']]:7.2f}  cycle {r[COL['cycle_ms']]:7.2f}  "
+                f"dets {int(r[COL['detections']]):>3}  hid age {hid_age:7.2f} ms"
+            )
+    return "\n".join(lines)
+
+
+def hid_summary(hid):
+    if len(hid) < 2:
+        return "HID reports: none recorded"
+    gaps = np.diff(hid) * 1000
+    return (
+        f"HID reports: {len(hid)}, interval p50 {np.percentile(gaps, 50):.2f} ms, "
+        f"p99 {np.percentile(gaps, 99):.2f} ms, max gap {gaps.max():.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查看性能异常记录")
+    parser.add_argument("path", help="FlightRecorder 转储文件（.npz）")
+    parser.add_argument("--top", type=int, default=3, help="列出最慢的帧数")
+    parser.add_argument("--frames-out", help="把缩略图导出为 PNG 的目录")
+    parser.add_argument("--csv", help="把逐帧记录导出为 CSV")
+    args = parser.parse_args()
+
+    data = load_dump(args.path)
+    rows = data["rows"]
+    meta = data["meta"]
+    if not len(rows):
+        raise SystemExit(">>> 记录为空。")
+    duration = rows[-1, COL["time"]] - rows[0, COL["time"]]
+    print(f">>> 触发原因：{meta['reason']}")
+    print(f">>> 帧数 {len(rows)}，时长 {duration:.2f} s，平均 {len(rows) / max(duration, 1e-9):.1f} fps")
+    print(stage_table(rows))
+    print(hid_summary(data["hid"]))
+    print(slowest(rows, args.top))
+
+    if args.csv:
+        np.savetxt(args.csv, rows, delimiter=",", header=",".join(FIELDS), comments="", fmt="%.6f")
+        print(f">>> 已导出 {args.csv}")
+    if args.frames_out and "frames" in data:
+        os.makedirs(args.frames_out, exist_ok=True)
+        for frame_id, frame in zip(data["frame_ids"], data["frames"]):
+            cv2.imwrite(os.path.join(args.frames_out, f"{int(frame_id):08d}.png"), frame)
+        print(f">>> 已导出 {len(data['frames'])} 张缩略图至 {args.frames_out}")
+
+
+if __name__ == "__main__":
+    main()
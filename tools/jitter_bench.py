@@ -0,0 +1,133 @@
+"""
+核心固定与调度优先级的抖动对比：推理线程（含 onnxruntime intra-op 线程池）持续满载运行的同时，
+一个模拟映射线程以固定周期唤醒，统计其唤醒迟到时间的分位数与错过周期数，
+分别在不做任何放置与按 placement 配置放置两种情况下运行。
+
+用法：
+    python -m tools.jitter_bench apv5.onnx --mapper-core 2 --inference-core 3 --ort-cores 4 5
+    python -m tools.jitter_bench apv5.onnx        # 使用 user_config.json 的 placement 段
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from modules.onnx import APV5Experimental
+from utils.placement import CorePlacement
+
+
+def mapper_loop(placement, period, seconds, lateness):
+    """按固定周期睡眠唤醒，记录每次相对预定时间的迟到（秒）；返回实际记录数。"""
+    placement.apply("mapper")
+    count = 0
+    deadline = time.perf_counter() + period
+    end = deadline + seconds
+    while count < len(lateness) and deadline < end:
+        remaining = deadline - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+        now = time.perf_counter()
+        lateness[count] = now - deadline
+        count += 1
+        deadline += period
+        if now > deadline:
+            # 已错过下一周期时从当前时间重新对齐，与映射循环的行为一致
+            deadline = now + period
+    return count
+
+
+def inference_load(model_path, placement, stop_event, stats):
+    placement.apply("detection")
+    model = APV5Experimental(
+        model_path, ident_size=320, providers=["CPUExecutionProvider"],
+        sess_options=placement.session_options(None)
+    )
+    frame = np.random.default_rng(0).integers(0, 255, (320, 320, 3), dtype=np.uint8)
+    stats["ready"].set()
+    while not stop_event.is_set():
+        model.predict(frame)
+        stats["frames"] += 1
+
+
+def run(model_path, placement, period, seconds):
+    stop_event = threading.Event()
+    stats = {"frames": 0, "ready": threading.Event()}
+    load = threading.Thread(
+        target=inference_load, args=(model_path, placement, stop_event, stats), name="inference", daemon=True
+    )
+    load.start()
+    stats["ready"].wait()
+    time.sleep(0.5)
+    lateness = np.zeros(int(seconds / period) + 1)
+    result = {}
+
+    def mapper():
+        result["count"] = mapper_loop(placement, period, seconds, lateness)
+
+    start_frames = stats["frames"]
+    start = time.perf_counter()
+    thread = threading.Thread(target=mapper, name="mapper", daemon=True)
+    thread.start()
+    thread.join()
+    fps = (stats["frames"] - start_frames) / (time.perf_counter() - start)
+    stop_event.set()
+    load.join()
+    late = lateness[:result["count"]] * 1000
+    return {
+        "p50": float(np.percentile(late, 50)),
+        "p99": float(np.percentile(late, 99)),
+        "p999": float(np.percentile(late, 99.9)),
+        "max": float(late.max()),
+        "missed": int(np.count_nonzero(late > period * 1000)),
+        "wakeups": len(late),
+        "fps": fps,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比核心固定前后映射线程的唤醒抖动")
+    parser.add_argument("model", help="ONNX 模型路径（用作推理负载）")
+    parser.add_argument("--mapper-core", type=int, nargs="+", help="映射线程的核心")
+    parser.add_argument("--mapper-priority", default="time_critical", help="映射线程优先级")
+    parser.add_argument("--inference-core", type=int, nargs="+", help="推理线程的核心")
+    parser.add_argument("--ort-cores", type=int, nargs="+", help="intra-op 线程池的核心")
+    parser.add_argument("--spin", action="store_true", help="保留 intra-op 线程的自旋等待")
+    parser.add_argument("--period-ms", type=float, default=1.0, help="映射线程唤醒周期")
+    parser.add_argument("--seconds", type=float, default=5.0, help="每种情况的测量时长")
+    args = parser.parse_args()
+
+    if args.mapper_core:
+        config = {
+            "enabled": True,
+            "mapper": {"cores": args.mapper_core, "priority": args.mapper_priority},
+        }
+        if args.inference_core:
+            config["detection"] = {"cores": args.inference_core}
+        if args.ort_cores:
+            config["ort"] = {"cores": args.ort_cores, "spinning": args.spin}
+    else:
+        with open("user_config.json", "r") as f:
+            config = dict(json.load(f).get("placement", {}), enabled=True)
+    print(f">>> CPU 核心数：{os.cpu_count()}，放置配置：{json.dumps(config, ensure_ascii=False)}")
+
+    period = args.period_ms / 1000
+    pinned = CorePlacement(config)
+    results = {
+        "unpinned": run(args.model, CorePlacement(), period, args.seconds),
+        "pinned": run(args.model, pinned, period, args.seconds),
+    }
+    print(pinned.summary())
+    print(f"{'mode':<10}{'p50':>8}{'p99':>8}{'p99.9':>8}{'max':>8}{'missed':>14}{'infer fps':>11}")
+    for name, r in results.items():
+        print(
+            f"{name:<10}{r['p50']:>8.3f}{r['p99']:>8.3f}{r['p999']:>8.3f}{r['max']:>8.3f}"
+            f"{r['missed']:>7}/{r['wakeups']:<6}{r['fps']:>11.1f}"
+        )
+    print(">>> 以上为映射线程唤醒迟到时间（ms）。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+离线模型转换与验证工具：
+
+- 以录制的帧作为校准数据，生成静态 INT8 量化模型
+- 生成 FP16 模型（输入输出保持 float32）
+- 通过与运行时相同的 APV5Experimental 推理路径，对比各变体与原始 fp32 模型的延迟与检测一致性
+
+用法：
+    python -m tools.model_convert apv5.onnx --frames recordings/ --int8 --fp16
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from modules.onnx import APV5Experimental
+from utils.frames import list_frame_files, load_frame
+from utils.detection_metrics import AgreementStats
+from utils.model_catalog import get_catalog
+
+
+class FrameCalibrationReader:
+    """
+    onnxruntime.quantization 的校准数据读取器，
+    逐帧复用 APV5Experimental.preprocess 的预处理，保证与运行时输入分布一致。
+    """
+
+    def __init__(self, model, input_name, frame_files):
+        self.model = model
+        self.input_name = input_name
+        self._files = iter(frame_files)
+
+    def get_next(self):
+        path = next(self._files, None)
+        if path is None:
+            return None
+        tensor, _ = self.model.preprocess(load_frame(path))
+        return {self.input_name: tensor}
+
+    def rewind(self):
+        pass
+
+
+def quantize_int8(model_path, out_path, frame_files, providers=None):
+    """使用录制帧校准，生成静态 INT8（QDQ）量化模型。"""
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    ident_size = load_frame(frame_files[0]).shape[1]
+    ref = APV5Experimental(model_path, ident_size=ident_size, providers=providers)
+    prep_path = out_path + ".prep.onnx"
+    quant_pre_process(model_path, prep_path)
+    try:
+        quantize_static(
+            prep_path,
+            out_path,
+            FrameCalibrationReader(ref, ref.input_name, frame_files),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+        )
+    finally:
+        if os.path.exists(prep_path):
+            os.remove(prep_path)
+    return out_path
+
+
+def convert_fp16(model_path, out_path):
+    """生成 FP16 模型，输入输出保持 float32，以便直接复用现有 predict 路径。"""
+    import onnx
+    from onnxconverter_common import float16
+
+    model = onnx.load(model_path)
+    model_fp16 = float16.convert_float_to_float16(model, keep_io_types=True)
+    onnx.save(model_fp16, out_path)
+    return out_path
+
+
+def benchmark(model_path, frames, reference=None, providers=None, warmup=5):
+    """
+    逐帧运行 predict 并统计延迟；若给出 reference（fp32 的逐帧 xywh 框），同时统计检测一致性。
+
+    :return: (结果字典, 逐帧 xywh 框列表)
+    """
+    model = APV5Experimental(model_path, ident_size=frames[0].shape[1], providers=providers)
+    for frame in frames[:warmup]:
+        model.predict(frame)
+
+    latencies = []
+    boxes_per_frame = []
+    for frame in frames:
+        start = time.perf_counter()
+        model.predict(frame)
+        latencies.append((time.perf_counter() - start) * 1000)
+        boxes, _, _ = model.detect(frame)
+        boxes_per_frame.append(boxes)
+
+    lat = np.asarray(latencies)
+    result = {
+        "model": model_path,
+        "provider": model.provider,
+        "size_mb": os.path.getsize(model_path) / 1024 / 1024,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+        "mean_ms": float(lat.mean()),
+    }
+    get_catalog().record_latency(model_path, result["p95_ms"], model.provider)
+    if reference is not None:
+        stats = AgreementStats(iou_thres=0.5)
+        for boxes, ref_boxes in zip(boxes_per_frame, reference):
+            stats.update(boxes, ref_boxes)
+        result["recall"] = stats.recall
+        result["precision"] = stats.precision
+        result["mean_iou"] = stats.mean_iou
+    return result, boxes_per_frame
+
+
+def print_report(results):
+    header = f"{'model':<40}{'EP':<24}{'MB':>8}{'p50':>9}{'p95':>9}{'recall':>8}{'IoU':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        recall = f"{r['recall']:.3f}" if "recall" in r else "-"
+        iou = f"{r['mean_iou']:.3f}" if "mean_iou" in r else "-"
+        print(
+            f"{os.path.basename(r['model']):<40}{r['provider']:<24}{r['size_mb']:>8.2f}"
+            f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{recall:>8}{iou:>7}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成 INT8/FP16 模型变体并与 fp32 对比延迟和检测一致性")
+    parser.add_argument("model", help="原始 fp32 ONNX 模型路径")
+    parser.add_argument("--frames", required=True, help="录制帧目录（图片或 .npy），用于校准与验证")
+    parser.add_argument("--calib-count", type=int, default=200, help="用于 INT8 校准的帧数")
+    parser.add_argument("--eval-count", type=int, default=300, help="用于验证的帧数")
+    parser.add_argument("--int8", action="store_true", help="生成静态 INT8 模型")
+    parser.add_argument("--fp16", action="store_true", help="生成 FP16 模型")
+    parser.add_argument("--cpu", action="store_true", help="只使用 CPUExecutionProvider 进行验证")
+    args = parser.parse_args()
+
+    providers = ["CPUExecutionProvider"] if args.cpu else None
+    base, _ = os.path.splitext(args.model)
+    # 先确认帧目录可用，再开始耗时的转换
+    frames = [load_frame(p) for p in list_frame_files(args.frames, args.eval_count)]
+    if not frames:
+        raise SystemExit(">>> 未找到验证帧。")
+
+    variants = []
+    if args.int8:
+        calib_files = list_frame_files(args.frames, args.calib_count)
+        if not calib_files:
+            raise SystemExit(">>> 未找到校准帧。")
+        print(f">>> 正在使用 {len(calib_files)} 帧进行 INT8 校准...")
+        variants.append(quantize_int8(args.model, base + ".int8.onnx", calib_files, providers))
+    if args.fp16:
+        print(">>> 正在生成 FP16 模型...")
+        variants.append(convert_fp16(args.model, base + ".fp16.onnx"))
+
+    print(f">>> 正在使用 {len(frames)} 帧进行验证...")
+    ref_result, reference = benchmark(args.model, frames, providers=providers)
+    results = [ref_result]
+    for path in variants:
+        result, _ = benchmark(path, frames, reference=reference, providers=providers)
+        results.append(result)
+    print_report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+离线模型改写工具：把后处理中的解码与筛选追加为 ONNX 节点，会话只输出少量候选框。
+
+追加的计算与 APV5Experimental.postprocess 一致：
+- 置信度 = objectness × 目标类别概率，只保留 argmax 类别为目标类别且置信度超过阈值的行
+- TopK 按置信度降序取前 k 行，输出 detections [B, k, 6]（cx, cy, w, h, score, cls），未通过筛选的行 score 为 0
+- 可选 --nms：再追加 NonMaxSuppression，额外输出 nms_keep [M, 3]（batch, class, 行号）
+
+改写后的模型带有 tgc_fused 元数据，APV5Experimental 加载时自动识别，Python 端只剩少量行的阈值比较
+（未融合 NMS 时另做一次小规模 NMS）。生成后在录制帧上逐帧对比原模型与新模型的检测结果和延迟。
+
+用法：
+    python -m tools.model_fuse apv5.onnx --frames recordings/ --top-k 100 --nms
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from modules.onnx import APV5Experimental, FUSED_METADATA_KEY
+from tools.model_convert import benchmark, print_report
+from utils.frames import list_frame_files, load_frame
+
+
+def fuse_postprocess(model_path, out_path, top_k=100, conf_thres=0.4, iou_thres=0.9,
+                     class_id=0, nms=False):
+    """在原始输出 [B, N, 5 + C] 之后追加解码、筛选、TopK（以及可选 NMS）节点。"""
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    model = onnx.load(model_path)
+    graph = model.graph
+    opset = next((o.version for o in model.opset_import if o.domain in ("", "ai.onnx")), 0)
+    if opset < 11:
+        raise SystemExit(f">>> 模型 opset {opset} 过低，TopK / NonMaxSuppression 需要 opset 11 及以上。")
+    if any(p.key == FUSED_METADATA_KEY for p in model.metadata_props):
+        raise SystemExit(">>> 模型已经融合过后处理。")
+
+    raw = graph.output[0]
+    dims = raw.type.tensor_type.shape.dim
+    n_boxes = dims[1].dim_value if len(dims) == 3 else 0
+    if n_boxes:
+        top_k = min(top_k, n_boxes)
+    batch_dim = (dims[0].dim_value or dims[0].dim_param or "batch") if dims else "batch"
+    pred = raw.name
+
+    def const(name, value, dtype):
+        graph.initializer.append(numpy_helper.from_array(np.array(value, dtype=dtype), f"fuse_{name}"))
+        return f"fuse_{name}"
+
+    def node(op, inputs, name, **attrs):
+        graph.node.append(helper.make_node(op, inputs, [f"fuse_{name}"], name=f"fuse_{name}", **attrs))
+        return f"fuse_{name}"
+
+    axis2 = const("axis2", [2], np.int64)
+    boxes = node("Slice", [pred, const("b0", [0], np.int64), const("b4", [4], np.int64), axis2], "boxes")
+    obj = node("Gather", [pred, const("obj_idx", 4, np.int64)], "obj", axis=2)
+    target = node("Gather", [pred, const("cls_idx", 5 + class_id, np.int64)], "target", axis=2)
+    cls_probs = node(
+        "Slice", [pred, const("c0", [5], np.int64), const("cend", [np.iinfo(np.int64).max], np.int64), axis2],
+        "cls_probs"
+    )
+    class_ids = node("ArgMax", [cls_probs], "class_ids", axis=2, keepdims=0)
+    conf = node("Mul", [obj, target], "conf")
+    passed = node(
+        "And",
+        [node("Equal", [class_ids, const("class_id", class_id, np.int64)], "is_target"),
+         node("Greater", [conf, const("conf_thres", conf_thres, np.float32)], "above")],
+        "passed"
+    )
+    score = node("Where", [passed, conf, const("zero", 0.0, np.float32)], "score")
+
+    values, indices = "fuse_topk_values", "fuse_topk_indices"
+    graph.node.append(helper.make_node(
+        "TopK", [score, const("k", [top_k], np.int64)], [values, indices],
+        name="fuse_topk", axis=1, largest=1, sorted=1
+    ))
+    column = const("column", [0, -1, 1], np.int64)
+    rows = node(
+        "Concat",
+        [boxes, node("Reshape", [score, column], "score_col"),
+         node("Reshape", [node("Cast", [class_ids], "class_f", to=TensorProto.FLOAT), column], "class_col")],
+        "rows", axis=2
+    )
+    gather_idx = node(
+        "Tile", [node("Reshape", [indices, column], "idx_col"), const("repeat", [1, 1, 6], np.int64)], "gather_idx"
+    )
+    graph.node.append(helper.make_node(
+        "GatherElements", [rows, gather_idx], ["detections"], name="fuse_detections", axis=1
+    ))
+
+    del graph.output[:]
+    graph.output.append(helper.make_tensor_value_info("detections", TensorProto.FLOAT, [batch_dim, top_k, 6]))
+    if nms:
+        top_boxes = node(
+            "Slice", ["detections", const("nb0", [0], np.int64), const("nb4", [4], np.int64), axis2], "top_boxes"
+        )
+        top_scores = node("Reshape", [values, const("score_row", [0, 1, -1], np.int64)], "top_scores")
+        graph.node.append(helper.make_node(
+            "NonMaxSuppression",
+            [top_boxes, top_scores, const("max_out", [top_k], np.int64),
+             const("iou_thres", [iou_thres], np.float32), const("score_thres", [conf_thres], np.float32)],
+            ["nms_keep"], name="fuse_nms", center_point_box=1
+        ))
+        graph.output.append(helper.make_tensor_value_info("nms_keep", TensorProto.INT64, ["selected", 3]))
+
+    meta = {"top_k": top_k, "nms": nms, "conf_thres": conf_thres, "iou_thres": iou_thres, "class_id": class_id}
+    helper.set_model_props(model, {
+        **{p.key: p.value for p in model.metadata_props},
+        FUSED_METADATA_KEY: json.dumps(meta),
+    })
+    onnx.checker.check_model(model)
+    onnx.save(model, out_path)
+    return out_path
+
+
+def verify(model_path, fused_path, frames, providers=None, tol=1e-4):
+    """逐帧对比两个模型的 detect 结果，返回 (结果不一致的帧数, 最大框坐标差, 最大置信度差)。"""
+    size = frames[0].shape[1]
+    ref = APV5Experimental(model_path, ident_size=size, providers=providers)
+    fused = APV5Experimental(fused_path, ident_size=size, providers=providers)
+    mismatched = 0
+    max_box_diff = 0.0
+    max_conf_diff = 0.0
+    for frame in frames:
+        boxes, conf, _ = ref.detect(frame)
+        fused_boxes, fused_conf, _ = fused.detect(frame)
+        n, m = (0 if boxes is None else len(boxes)), (0 if fused_boxes is None else len(fused_boxes))
+        if n != m:
+            mismatched += 1
+            continue
+        if n == 0:
+            continue
+        box_diff = float(np.abs(boxes - fused_boxes).max())
+        conf_diff = float(np.abs(conf - fused_conf).max())
+        max_box_diff = max(max_box_diff, box_diff)
+        max_conf_diff = max(max_conf_diff, conf_diff)
+        if box_diff > tol * size or conf_diff > tol:
+            mismatched += 1
+    return mismatched, max_box_diff, max_conf_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把解码、筛选、TopK 与可选 NMS 融合进 ONNX 模型并验证")
+    parser.add_argument("model", help="原始 ONNX 模型路径")
+    parser.add_argument("--frames", required=True, help="录制帧目录（图片或 .npy），用于验证")
+    parser.add_argument("--out", help="输出路径，默认 <model>.fused.onnx")
+    parser.add_argument("--top-k", type=int, default=100, help="会话最多输出的候选行数")
+    parser.add_argument("--nms", action="store_true", help="同时融合 NonMaxSuppression")
+    parser.add_argument("--eval-count", type=int, default=300, help="用于验证的帧数")
+    parser.add_argument("--cpu", action="store_true", help="只使用 CPUExecutionProvider 进行验证")
+    args = parser.parse_args()
+
+    # 阈值与类别取运行时的默认值，保证改写前后语义一致
+    providers = ["CPUExecutionProvider"] if args.cpu else None
+    frames = [load_frame(p) for p in list_frame_files(args.frames, args.eval_count)]
+    if not frames:
+        raise SystemExit(">>> 未找到验证帧。")
+    ref = APV5Experimental(args.model, ident_size=frames[0].shape[1], providers=providers)
+    out_path = args.out or os.path.splitext(args.model)[0] + ".fused.onnx"
+    fuse_postprocess(
+        args.model, out_path, top_k=args.top_k, conf_thres=ref.conf_thres,
+        iou_thres=ref.iou_thres, class_id=ref.classes, nms=args.nms
+    )
+    print(f">>> 已生成 {out_path}")
+
+    print(f">>> 正在使用 {len(frames)} 帧进行验证...")
+    mismatched, box_diff, conf_diff = verify(args.model, out_path, frames, providers)
+    print(
+        f">>> 结果不一致的帧：{mismatched}/{len(frames)}，最大框坐标差 {box_diff:.2e} px，"
+        f"最大置信度差 {conf_diff:.2e}"
+    )
+    if mismatched:
+        print(">>> 存在不一致：通过阈值的候选多于 top-k 时会截断，可增大 --top-k 后重试。")
+    ref_result, reference = benchmark(args.model, frames, providers=providers)
+    fused_result, _ = benchmark(out_path, frames, reference=reference, providers=providers)
+    print_report([ref_result, fused_result])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+分块推理与整体缩小推理的对比：在录制的截图区域帧上分别运行两种模式，
+统计单帧延迟分位数，并在提供标注时统计召回率、精确率以及小目标召回率。
+
+帧应为完整的截图区域（边长即 range.outer），标注格式同 tools.evaluate（YOLO txt，只统计 class 0）。
+
+用法：
+    python -m tools.tile_bench apv5.onnx recordings/ --labels labels/ --overlap 0.2
+"""
+import argparse
+import time
+
+import numpy as np
+
+from modules.onnx import APV5Experimental, tile_offsets
+from tools.evaluate import load_labels
+from utils.frames import list_frame_files, load_frame
+from utils.detection_metrics import AgreementStats
+
+
+def run_mode(model, frames, labels, small, warmup=5):
+    """逐帧 predict，返回 (单帧延迟数组 ms, 全部目标统计, 小目标统计)。"""
+    for _, frame in frames[:warmup]:
+        model.predict(frame)
+    stats = AgreementStats(iou_thres=0.5) if labels else None
+    small_stats = AgreementStats(iou_thres=0.5) if labels else None
+    costs = np.empty(len(frames))
+    for i, (name, frame) in enumerate(frames):
+        start = time.perf_counter()
+        detections, _ = model.predict(frame)
+        costs[i] = (time.perf_counter() - start) * 1000
+        if stats is not None:
+            h, w = frame.shape[:2]
+            ref = load_labels(labels, name, w, h)
+            boxes = detections.boxes.copy()
+            stats.update(boxes, ref)
+            # 小目标只看召回率：预测框不区分大小，精确率没有意义
+            small_stats.update(boxes, ref[np.maximum(ref[:, 2], ref[:, 3]) < small])
+    return costs, stats, small_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比分块推理与整体缩小推理的延迟与召回率")
+    parser.add_argument("model", help="ONNX 模型路径")
+    parser.add_argument("frames", help="截图区域帧目录")
+    parser.add_argument("--labels", help="YOLO 格式标注目录（可选）")
+    parser.add_argument("--overlap", type=float, default=0.2, help="相邻块最小重叠比例")
+    parser.add_argument("--merge-thres", type=float, default=0.6, help="跨块合并阈值")
+    parser.add_argument("--small", type=float, default=32, help="小目标边长上限（截图像素）")
+    parser.add_argument("--limit", type=int, default=None, help="最多使用的帧数")
+    parser.add_argument("--cpu", action="store_true", help="只使用 CPUExecutionProvider")
+    args = parser.parse_args()
+
+    frames = [(p.stem, load_frame(p)) for p in list_frame_files(args.frames, args.limit)]
+    if not frames:
+        raise SystemExit(">>> 帧目录为空。")
+    size = frames[0][1].shape[1]
+    providers = ["CPUExecutionProvider"] if args.cpu else None
+    model = APV5Experimental(args.model, ident_size=size, providers=providers)
+    print(f">>> 当前 EP：{model.provider}，截图区域 {size}px，模型输入 {model.input_size}px")
+
+    if not model.enable_tiling(args.overlap, args.merge_thres):
+        raise SystemExit(">>> 截图区域不大于模型输入，无需分块。")
+    model.tiling = False
+    results = {"downscaled": run_mode(model, frames, args.labels, args.small)}
+    model.tiling = True
+    results["tiled"] = run_mode(model, frames, args.labels, args.small)
+    n_tiles = len(tile_offsets(size, model.input_size, args.overlap)) ** 2
+
+    print(f">>> 帧数 {len(frames)}，分块数 {n_tiles}（一次 batched session.run）")
+    print(f"{'mode':<12}{'p50 ms':>9}{'p95 ms':>9}{'recall':>9}{'precision':>11}{'small recall':>14}")
+    for name, (costs, stats, small_stats) in results.items():
+        p50, p95 = np.percentile(costs, (50, 95))
+        line = f"{name:<12}{p50:>9.2f}{p95:>9.2f}"
+        if stats is not None:
+            line += f"{stats.recall:>9.3f}{stats.precision:>11.3f}"
+            line += f"{small_stats.recall:>14.3f}" if small_stats.n_ref else f"{'-':>14}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+本机检测结果发布：把每帧的 Detections 写入具名共享内存，其他进程（叠加层、日志、分析工具）
+按名称附加后轮询读取，发布方不感知订阅者数量，也不向订阅者拷贝画面。
+
+共享内存布局固定（小端，字节偏移），非 Python 程序也可直接解析：
+
+    0                      int64    最新发布的序号 seq
+    8 + 16*i               int64    槽位 i 的序号（写入中为 -1）
+    16 + 16*i              int64    槽位 i 的目标数 count
+    8 + 16*SLOTS + 32*i    float64  槽位 i 的 frame_id, capture_time, publish_time, wall_time
+    8 + 48*SLOTS + 1536*i  float32  槽位 i 的 MAX_DETECTIONS × 6 检测行（cx, cy, w, h, score, cls）
+
+槽位号为 seq % SLOTS；读取后若槽位序号仍等于 seq，则数据在读取期间未被覆盖。
+capture_time/publish_time 为 time.perf_counter()（同一台机器上跨进程可比），wall_time 为 time.time()。
+"""
+import os
+import time
+from multiprocessing import resource_tracker
+
+import numpy as np
+
+from utils.detections import Detections, N_FIELDS
+from utils.shm_ring import SharedRing
+
+
+BUS_NAME = "tgc_detections"
+MAX_DETECTIONS = 64
+SLOTS = 8
+EXTRA_FIELDS = 4  # frame_id, capture_time, publish_time, wall_time
+
+
+class BusNameInUse(RuntimeError):
+    pass
+
+
+class DetectionPublisher:
+    """
+    在检测循环中调用 publish()，单次发布只是一次不超过 1.5 KB 的内存拷贝。
+    同名共享内存已存在时抛出 BusNameInUse：可能是另一个正在运行的实例，
+    不能删除后重建（Linux 上会断开该实例的订阅者，Windows 上也无法删除）。
+    """
+
+    def __init__(self, name: str = BUS_NAME):
+        try:
+            self.ring = self._create(name)
+        except FileExistsError as e:
+            raise BusNameInUse(
+                f"共享内存 {name} 已被占用（另一个实例正在发布，或上次异常退出后残留于 /dev/shm），"
+                f"可在配置中修改 publish.name"
+            ) from e
+        self.published = 0
+        self._extra = np.zeros(EXTRA_FIELDS, dtype=np.float64)
+
+    @staticmethod
+    def _create(name):
+        return SharedRing((MAX_DETECTIONS, N_FIELDS), np.float32, slots=SLOTS,
+                          n_extra=EXTRA_FIELDS, name=name)
+
+    @staticmethod
+    def _spec(name):
+        return {
+            "shape": (MAX_DETECTIONS, N_FIELDS),
+            "dtype": "<f4",
+            "slots": SLOTS,
+            "n_extra": EXTRA_FIELDS,
+            "name": name,
+        }
+
+    def publish(self, detections: Detections, frame_id: int, capture_time: float):
+        extra = self._extra
+        extra[0] = frame_id
+        extra[1] = capture_time
+        extra[2] = time.perf_counter()
+        extra[3] = time.time()
+        self.ring.write(detections.data, count=min(detections.count, MAX_DETECTIONS), extra=extra)
+        self.published += 1
+
+    def close(self):
+        self.ring.close()
+
+
+class DetectionSubscriber:
+    """按名称附加到发布方的共享内存；发布方未启动时抛出 FileNotFoundError。"""
+
+    def __init__(self, name: str = BUS_NAME):
+        self.ring = SharedRing.attach(DetectionPublisher._spec(name))
+        if os.name == "posix":
+            # 附加方也会被 resource_tracker 登记，退出时会误删发布方的共享内存，这里取消登记
+            resource_tracker.unregister(self.ring._shm._name, "shared_memory")
+        self.detections = Detections(MAX_DETECTIONS)
+        self.last_seq = self.ring.latest_seq
+        self.missed = 0
+
+    def poll(self):
+        """
+        读取最新一帧（跳过中间未读到的帧，计入 missed）。
+
+        :return: (frame_id, capture_time, publish_time, wall_time, Detections) 或 None；
+                 Detections 为订阅方本地缓冲区，下次 poll 时覆盖
+        """
+        item = self.ring.read_latest(self.last_seq)
+        if item is None:
+            return None
+        seq, rows, extra = item
+        self.detections.load(rows)
+        frame_id, capture_time, publish_time, wall_time = extra.tolist()
+        if not self.ring.is_valid(seq):
+            return None
+        if self.last_seq:
+            self.missed += seq - self.last_seq - 1
+        self.last_seq = seq
+        return int(frame_id), capture_time, publish_time, wall_time, self.detections
+
+    def wait(self, timeout: float = 1.0, interval: float = 0.0005):
+        deadline = time.perf_counter() + timeout
+        while True:
+            item = self.poll()
+            if item is not None or time.perf_counter() >= deadline:
+                return item
+            time.sleep(interval)
+
+    def close(self):
+        self.ring.close()
+
+
+if __name__ == "__main__":
+    import subprocess
+    import sys
+
+    pub = DetectionPublisher(name="tgc_detections_bench")
+    dets = Detections(MAX_DETECTIONS)
+    n = 20000
+    for count in (0, 8, 64):
+        boxes = np.random.rand(count, 4).astype(np.float32) * 320
+        dets.fill(boxes, np.sort(np.random.rand(count))[::-1], 0)
+        start = time.perf_counter()
+        for i in range(n):
+            pub.publish(dets, i, start)
+        per_frame = (time.perf_counter() - start) / n * 1e6
+        print(f"publish {count:>2} detections: {per_frame:.2f} us/frame")
+
+    # 跨进程订阅：发布方以约 1 kHz 发布，独立的订阅进程统计接收数、漏读数与发布到读取的延迟
+    frames = 2000
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "tools.detection_tail", "--name", "tgc_detections_bench", "--frames", str(frames)]
+    )
+    time.sleep(1.5)
+    for i in range(frames + 200):
+        pub.publish(dets, i, time.perf_counter())
+        time.sleep(0.001)
+    proc.wait(timeout=10)
+    pub.close()
@@ -0,0 +1,83 @@
+import numpy as np
+
+
+def xywh_to_xyxy(boxes):
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    out = np.empty_like(boxes)
+    out[:, 0] = boxes[:, 0] - boxes[:, 2] / 2
+    out[:, 1] = boxes[:, 1] - boxes[:, 3] / 2
+    out[:, 2] = boxes[:, 0] + boxes[:, 2] / 2
+    out[:, 3] = boxes[:, 1] + boxes[:, 3] / 2
+    return out
+
+
+def box_iou(a, b):
+    """
+    计算两组 xyxy 框两两之间的 IoU。
+
+    :param a: shape [N, 4]
+    :param b: shape [M, 4]
+    :return: shape [N, M]
+    """
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    xx1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    yy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    xx2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    yy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.maximum(0.0, xx2 - xx1) * np.maximum(0.0, yy2 - yy1)
+    union = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def match_detections(pred_boxes, ref_boxes, iou_thres=0.5):
+    """
+    将预测框与参考框（xywh）按 IoU 贪心一对一匹配。
+
+    :return: (匹配成功的 IoU 列表, 参考框数量, 预测框数量)
+    """
+    n_pred = 0 if pred_boxes is None else len(pred_boxes)
+    n_ref = 0 if ref_boxes is None else len(ref_boxes)
+    if n_pred == 0 or n_ref == 0:
+        return [], n_ref, n_pred
+    ious = box_iou(xywh_to_xyxy(pred_boxes), xywh_to_xyxy(ref_boxes))
+    matched = []
+    # 从最大 IoU 开始贪心匹配，每个框只匹配一次
+    for flat in np.argsort(ious, axis=None)[::-1]:
+        i, j = np.unravel_index(flat, ious.shape)
+        if np.isinf(ious[i, j]):
+            continue
+        if ious[i, j] < iou_thres:
+            break
+        matched.append(float(ious[i, j]))
+        ious[i, :] = -np.inf
+        ious[:, j] = -np.inf
+    return matched, n_ref, n_pred
+
+
+class AgreementStats:
+    """累计多帧的检测一致性：召回率、精确率与匹配框的平均 IoU。"""
+
+    def __init__(self, iou_thres=0.5):
+        self.iou_thres = iou_thres
+        self.ious = []
+        self.n_ref = 0
+        self.n_pred = 0
+
+    def update(self, pred_boxes, ref_boxes):
+        matched, n_ref, n_pred = match_detections(pred_boxes, ref_boxes, self.iou_thres)
+        self.ious.extend(matched)
+        self.n_ref += n_ref
+        self.n_pred += n_pred
+
+    @property
+    def recall(self):
+        return len(self.ious) / self.n_ref if self.n_ref else 1.0
+
+    @property
+    def precision(self):
+        return len(self.ious) / self.n_pred if self.n_pred else 1.0
+
+    @property
+    def mean_iou(self):
+        return float(np.mean(self.ious)) if self.ious else 0.0
@@ -0,0 +1,119 @@
+import numpy as np
+
+
+# 每行的列含义
+CX, CY, W, H, SCORE, CLS = range(6)
+N_FIELDS = 6
+
+
+class Detections:
+    """
+    单帧检测结果，一行一个目标：cx, cy, w, h, score, cls（float32）。
+    - 数据写入预先分配的缓冲区，每帧复用同一个对象，不为单个目标创建 Python 对象
+    - 行按置信度降序排列（NMS 的保留顺序即为降序），top-k 只是切片
+    - 各属性返回缓冲区视图，下一次 fill/load 后内容会被覆盖，需要保留时自行 copy()
+    - frame_id / capture_time 标记结果来自哪一帧及其截图时间（perf_counter），用于统计帧龄
+    """
+
+    __slots__ = ("data", "count", "frame_id", "capture_time", "_offsets", "_distances")
+
+    def __init__(self, capacity: int = 64):
+        self.data = np.zeros((capacity, N_FIELDS), dtype=np.float32)
+        self.count = 0
+        self.frame_id = 0
+        self.capture_time = 0.0
+        # nearest() 的计算缓冲区
+        self._offsets = np.zeros((capacity, 2), dtype=np.float32)
+        self._distances = np.zeros((capacity, 2), dtype=np.float32)
+
+    def stamp(self, frame_id: int, capture_time: float):
+        self.frame_id = frame_id
+        self.capture_time = capture_time
+        return self
+
+    @property
+    def capacity(self) -> int:
+        return len(self.data)
+
+    def clear(self):
+        self.count = 0
+        return self
+
+    def fill(self, boxes, scores, cls, scale: float = 1.0):
+        """
+        写入按置信度降序排列的 xywh 框、置信度与类别，超出容量的低分目标被丢弃。
+
+        :param boxes: (n, 4) xywh 框，None 表示无目标
+        :param cls: 类别数组或单个类别号
+        :param scale: 框坐标的缩放系数（模型输入尺度 -> 原图尺度）
+        """
+        if boxes is None:
+            self.count = 0
+            return self
+        n = min(len(boxes), len(self.data))
+        np.multiply(boxes[:n], scale, out=self.data[:n, :SCORE], casting="unsafe")
+        self.data[:n, SCORE] = scores[:n]
+        self.data[:n, CLS] = cls if np.isscalar(cls) else cls[:n]
+        self.count = n
+        return self
+
+    def load(self, rows, count: int = None):
+        """从另一块 (n, 6) 缓冲区（例如共享内存槽位）复制结果。"""
+        n = min(len(rows) if count is None else count, len(self.data))
+        self.data[:n] = rows[:n]
+        self.count = n
+        return self
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return self.data[:self.count][index]
+
+    @property
+    def rows(self):
+        return self.data[:self.count]
+
+    @property
+    def centers(self):
+        return self.data[:self.count, CX:W]
+
+    @property
+    def sizes(self):
+        return self.data[:self.count, W:SCORE]
+
+    @property
+    def boxes(self):
+        return self.data[:self.count, :SCORE]
+
+    @property
+    def scores(self):
+        return self.data[:self.count, SCORE]
+
+    @property
+    def classes(self):
+        return self.data[:self.count, CLS]
+
+    def topk(self, k: int):
+        """置信度最高的 k 个目标（视图）。"""
+        return self.data[:min(k, self.count)]
+
+    def nearest(self, x: float, y: float):
+        """
+        中心离 (x, y) 曼哈顿距离最近的目标，返回 (下标, dx, dy)，无目标时返回 None。
+        计算全部在预分配的缓冲区中完成，不分配新数组。
+        """
+        n = self.count
+        if not n:
+            return None
+        offsets = self._offsets[:n]
+        distances = self._distances[:n]
+        np.subtract(self.data[:n, CX], x, out=offsets[:, 0])
+        np.subtract(self.data[:n, CY], y, out=offsets[:, 1])
+        np.abs(offsets, out=distances)
+        np.add(distances[:, 0], distances[:, 1], out=distances[:, 0])
+        index = int(distances[:, 0].argmin())
+        return index, float(offsets[index, 0]), float(offsets[index, 1])
+
+    def __repr__(self):
+        return f"Detections(count={self.count}, capacity={len(self.data)})"
@@ -0,0 +1,207 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+# 每帧记录的列
+FIELDS = ("frame_id", "time", "grab_ms", "infer_ms", "cycle_ms", "detections", "last_hid")
+
+
+class FlightRecorder:
+    """
+    FlightRecorder 类：
+    - 常驻内存的环形记录，保留最近 seconds 秒的逐帧阶段耗时、检测数量与最近一次手柄报告时间
+    - 另有手柄报告时间环和可选的灰度缩略图环，全部在创建时预分配，内存占用固定
+    - 单帧耗时超过 trigger_ms 或调用 trigger()（手动热键）后，再记录 post_frames 帧，
+      然后在后台线程把快照写成压缩 .npz 文件，用 tools.flight_view 查看
+    - 自动触发后需连续 rearm_frames 帧回落到阈值以下才会再次触发，持续慢帧（如纯 CPU 推理、
+      预热阶段）只产生一次转储；目录中最多保留 max_dumps 个文件，超出时删除最旧的
+    record() 只在检测线程中调用；trigger() 可在任意线程调用，只留下一个请求，
+    由检测线程在下一次 record() 中处理，触发状态只在检测线程中修改。
+    """
+
+    def __init__(self, seconds: float = 10.0, max_fps: float = 300.0, trigger_ms: float = 50.0,
+                 post_frames: int = 30, cooldown: float = 5.0, out_dir: str = "flight",
+                 frame_size: int = 0, frame_every: int = 4, hid_rate_hz: float = 1000.0,
+                 rearm_frames: int = 30, max_dumps: int = 20):
+        """
+        :param seconds: 保留的时长（按 max_fps 估算容量）
+        :param trigger_ms: 单帧 cycle 耗时超过该值时触发转储，0 表示只手动触发
+        :param post_frames: 触发后继续记录的帧数，便于观察异常之后的恢复情况
+        :param cooldown: 两次自动转储之间的最短间隔（秒）
+        :param rearm_frames: 自动触发后，需连续多少帧低于 trigger_ms 才重新允许自动触发
+        :param max_dumps: out_dir 中最多保留的转储文件数，0 表示不限制
+        :param frame_size: 缩略图边长，0 表示不记录画面
+        :param frame_every: 每隔多少帧保存一张缩略图
+        """
+        self.capacity = int(seconds * max_fps)
+        self.trigger_ms = trigger_ms
+        self.post_frames = post_frames
+        self.cooldown = cooldown
+        self.rearm_frames = rearm_frames
+        self.max_dumps = max_dumps
+        self.out_dir = out_dir
+        self.frame_every = frame_every
+
+        self._rows = np.zeros((self.capacity, len(FIELDS)), dtype=np.float64)
+        self._count = 0
+        self._hid = np.zeros(int(seconds * hid_rate_hz), dtype=np.float64)
+        self._hid_count = 0
+        self.last_hid = 0.0
+
+        self.frame_size = frame_size
+        if frame_size:
+            n_frames = self.capacity // frame_every
+            self._frames = np.zeros((n_frames, frame_size, frame_size), dtype=np.uint8)
+            self._frame_ids = np.zeros(n_frames, dtype=np.int64)
+            self._gray = None
+        self._frame_count = 0
+
+        self._pending = None
+        self._requested = None  # trigger() 留下的手动触发原因
+        self._dump_at = 0
+        self._last_dump = float("-inf")
+        self._auto_armed = True
+        self._below = 0
+        self.dumps = []
+
+    def record_hid(self, t: float):
+        """记录一次手柄输入报告的到达时间（perf_counter）。"""
+        self._hid[self._hid_count % len(self._hid)] = t
+        self._hid_count += 1
+        self.last_hid = t
+
+    def record(self, frame_id: int, t: float, grab_ms: float, infer_ms: float,
+               cycle_ms: float, detections: int, image=None):
+        row = self._rows[self._count % self.capacity]
+        row[0] = frame_id
+        row[1] = t
+        row[2] = grab_ms
+        row[3] = infer_ms
+        row[4] = cycle_ms
+        row[5] = detections
+        row[6] = self.last_hid
+        self._count += 1
+
+        if self.frame_size and image is not None and frame_id % self.frame_every == 0:
+            slot = self._frame_count % len(self._frames)
+            if self._gray is None or self._gray.shape != image.shape[:2]:
+                self._gray = np.empty(image.shape[:2], dtype=np.uint8)
+            cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=self._gray)
+            cv2.resize(self._gray, (self.frame_size, self.frame_size), dst=self._frames[slot],
+                       interpolation=cv2.INTER_AREA)
+            self._frame_ids[slot] = frame_id
+            self._frame_count += 1
+
+        if self.trigger_ms:
+            if cycle_ms > self.trigger_ms:
+                self._below = 0
+            else:
+                self._below += 1
+                if self._below >= self.rearm_frames:
+                    self._auto_armed = True
+        if self._pending is None and self._requested is not None:
+            reason, self._requested = self._requested, None
+            self._arm(reason)
+        if self._pending is None:
+            if (self.trigger_ms and self._auto_armed and cycle_ms > self.trigger_ms
+                    and t - self._last_dump > self.cooldown):
+                self._auto_armed = False
+                self._arm(f"cycle {cycle_ms:.1f} ms > {self.trigger_ms:.1f} ms at frame {frame_id}")
+        elif self._count >= self._dump_at:
+            self._dump(self._pending, t)
+
+    def trigger(self, reason: str = "manual"):
+        """手动触发（例如热键），检测线程在下一次 record 时开始计数；已有转储在等待时，等其完成后再处理。"""
+        self._requested = reason
+
+    def _arm(self, reason: str):
+        self._pending = reason
+        self._dump_at = self._count + self.post_frames
+
+    @staticmethod
+    def _ordered(ring, count):
+        # 按时间顺序取出环中的有效数据
+        n = len(ring)
+        if count <= n:
+            return ring[:count].copy()
+        start = count % n
+        return np.concatenate((ring[start:], ring[:start]))
+
+    def _snapshot(self):
+        data = {
+            "rows": self._ordered(self._rows, self._count),
+            "hid": self._ordered(self._hid, self._hid_count),
+        }
+        if self.frame_size:
+            data["frames"] = self._ordered(self._frames, self._frame_count)
+            data["frame_ids"] = self._ordered(self._frame_ids, self._frame_count)
+        return data
+
+    def _dump(self, reason: str, t: float):
+        data = self._snapshot()
+        self._pending = None
+        self._last_dump = t
+        os.makedirs(self.out_dir, exist_ok=True)
+        # 文件名精确到毫秒，同一秒内的手动与自动转储不会互相覆盖；按名称排序即按时间排序
+        now = time.time()
+        name = time.strftime("flight-%Y%m%d-%H%M%S", time.localtime(now)) + f"-{int(now * 1000) % 1000:03d}.npz"
+        path = os.path.join(self.out_dir, name)
+        meta = {"reason": reason, "fields": FIELDS, "trigger_ms": self.trigger_ms, "wall_time": time.time()}
+        data["meta"] = np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)
+        self.dumps.append(path)
+        if self.max_dumps:
+            del self.dumps[:-self.max_dumps]
+
+        def write():
+            np.savez_compressed(path, **data)
+            sys.stdout.write(f"\n>>> 性能异常记录已保存至 {path}（{reason}）")
+            self._prune()
+
+        # 快照已在检测线程中复制，压缩写盘放到后台
+        threading.Thread(target=write, name="flight-recorder", daemon=True).start()
+
+
+    def _prune(self):
+        """只保留 out_dir 中最新的 max_dumps 个转储文件（文件名带时间戳，按名称排序即按时间）。"""
+        if not self.max_dumps:
+            return
+        try:
+            files = sorted(f for f in os.listdir(self.out_dir) if f.startswith("flight-") and f.endswith(".npz"))
+        except OSError:
+            return
+        for name in files[:-self.max_dumps]:
+            try:
+                os.remove(os.path.join(self.out_dir, name))
+            except OSError:
+                pass
+
+
+def load_dump(path: str) -> dict:
+    with np.load(path) as f:
+        data = {k: f[k] for k in f.files}
+    data["meta"] = json.loads(data["meta"].tobytes().decode("utf-8"))
+    return data
+
+
+if __name__ == "__main__":
+    # 模拟 240 fps 的检测循环，第 1500 帧出现一次 80 ms 的卡顿
+    rec = FlightRecorder(seconds=5, max_fps=240, trigger_ms=50, frame_size=64, out_dir="flight")
+    frame = np.random.randint(0, 255, (320, 320, 3), dtype=np.uint8)
+    t = 0.0
+    cost = []
+    for i in range(3000):
+        t += 1 / 240
+        if i % 4 == 0:
+            rec.record_hid(t - 0.001)
+        cycle = 80.0 if i == 1500 else 4.0 + (i % 7) * 0.1
+        start = time.perf_counter()
+        rec.record(i, t, 0.8, cycle - 1.0, cycle, i % 3, frame)
+        cost.append((time.perf_counter() - start) * 1e6)
+    time.sleep(1)
+    print(f"record(): median {np.median(cost):.2f} us, dumps: {rec.dumps}")
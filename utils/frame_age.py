@@ -0,0 +1,56 @@
+import numpy as np
+
+from utils.metrics import FRAME_AGE, MAPPER_HANDOFF
+
+
+class FrameAgeTracker:
+    """
+    FrameAgeTracker 类：统计一帧从截图到其结果写入虚拟手柄所经过的时间，并拆分为各个交接环节：
+    - queue：截图完成到推理开始（多进程模式下为帧在共享内存中等待推理的时间）
+    - inference：推理耗时
+    - to_loop：推理完成到检测循环拿到结果（多进程模式下的结果交接）
+    - handoff：检测循环写入右摇杆偏移到映射器下一次提交虚拟手柄
+    - end_to_end：截图完成到虚拟手柄提交
+    前三项在检测线程写入，后两项在映射线程写入，各自是单写者的预分配环。
+    """
+
+    STAGES = ("queue", "inference", "to_loop", "handoff", "end_to_end")
+
+    def __init__(self, window: int = 2048):
+        self.window = window
+        self._rings = {name: np.zeros(window, dtype=np.float64) for name in self.STAGES}
+        self._counts = dict.fromkeys(self.STAGES, 0)
+
+    def _add(self, stage: str, seconds: float):
+        n = self._counts[stage]
+        self._rings[stage][n % self.window] = seconds
+        self._counts[stage] = n + 1
+
+    def result_ready(self, capture_time: float, infer_start: float, infer_end: float, now: float):
+        """检测循环拿到结果时调用，时间均为 perf_counter。"""
+        self._add("queue", infer_start - capture_time)
+        self._add("inference", infer_end - infer_start)
+        self._add("to_loop", now - infer_end)
+
+    def delivered(self, capture_time: float, offset_time: float, now: float):
+        """映射器把带有该帧结果的偏移提交到虚拟手柄后调用。"""
+        age = now - capture_time
+        handoff = now - offset_time
+        self._add("handoff", handoff)
+        self._add("end_to_end", age)
+        FRAME_AGE.observe(age)
+        MAPPER_HANDOFF.observe(handoff)
+
+    def percentiles(self, stage: str, q=(50, 95)):
+        n = min(self._counts[stage], self.window)
+        if not n:
+            return None
+        return np.percentile(self._rings[stage][:n], q) * 1000
+
+    def summary(self) -> str:
+        lines = []
+        for stage in self.STAGES:
+            p = self.percentiles(stage)
+            if p is not None:
+                lines.append(f"[Age] {stage}: p50 {p[0]:.2f} ms, p95 {p[1]:.2f} ms")
+        return "\n".join(lines)
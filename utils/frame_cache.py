@@ -0,0 +1,85 @@
+import time
+
+import numpy as np
+
+
+class CachedPredictor:
+    """
+    CachedPredictor 类：
+    - 在 APV5Experimental.predict 之前做一次稀疏像素差分，判断画面是否有明显变化
+    - 画面未变化且缓存未过期时直接返回上一次的检测结果，跳过预处理、推理和 NMS
+    - 记录命中/未命中次数，用于观察节省的推理量
+    - 参考帧、差分与比较结果都写入预分配缓冲区，每帧不分配新数组
+    画面变化低于阈值时会复用最多 max_stale_ms 之前的结果，因此默认关闭，需在配置中开启。
+    """
+
+    def __init__(self, model, stride: int = 8, pixel_threshold: int = 12,
+                 sensitivity: float = 0.002, max_stale_ms: float = 100):
+        """
+        :param model: 具有 predict(image) 方法的检测模型
+        :param stride: 采样步长（像素），越大越省但越容易漏掉小变化
+        :param pixel_threshold: 单个采样点的灰度差超过该值视为变化
+        :param sensitivity: 变化采样点占比超过该值即视为画面变化
+        :param max_stale_ms: 缓存结果最长复用时间（毫秒），超过后强制重新推理
+        """
+        self.model = model
+        self.stride = stride
+        self.pixel_threshold = pixel_threshold
+        self.sensitivity = sensitivity
+        self.max_stale = max_stale_ms / 1000
+
+        self.hits = 0
+        self.misses = 0
+
+        self._ref = None
+        self._diff = None
+        self._changed = None
+        self._cached = None
+        self._cached_time = 0.0
+
+    def _signature(self, image):
+        # 只取绿色通道的稀疏网格，足以反映亮度变化且几乎没有开销
+        return image[::self.stride, ::self.stride, 1]
+
+    def _unchanged(self, sig) -> bool:
+        if self._ref is None or self._ref.shape != sig.shape:
+            return False
+        if self._diff is None or self._diff.shape != sig.shape:
+            self._diff = np.empty(sig.shape, dtype=np.int16)
+            self._changed = np.empty(sig.shape, dtype=bool)
+        # 先复制到 int16 缓冲区再相减：uint8 与类型转换混在一次 ufunc 里会让 NumPy 临时分配转换缓冲区
+        np.copyto(self._diff, sig)
+        np.subtract(self._diff, self._ref, out=self._diff)
+        np.abs(self._diff, out=self._diff)
+        np.greater(self._diff, self.pixel_threshold, out=self._changed)
+        changed = np.count_nonzero(self._changed)
+        return changed <= self.sensitivity * sig.size
+
+    def predict(self, image, frame_id: int = 0, capture_time: float = 0.0):
+        # 命中缓存时返回的结果保留其实际推理帧的序号与截图时间
+        sig = self._signature(image)
+        now = time.perf_counter()
+        if (
+            self._cached is not None
+            and now - self._cached_time < self.max_stale
+            and self._unchanged(sig)
+        ):
+            self.hits += 1
+            return self._cached
+
+        self.misses += 1
+        # 只在重新推理时更新参考帧，缓慢漂移的画面累积到阈值后也会触发推理
+        if self._ref is None or self._ref.shape != sig.shape:
+            self._ref = np.empty(sig.shape, dtype=np.int16)
+        np.copyto(self._ref, sig)
+        self._cached = self.model.predict(image, frame_id, capture_time)
+        self._cached_time = now
+        return self._cached
+
+    def invalidate(self):
+        self._cached = None
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
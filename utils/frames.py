@@ -0,0 +1,34 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+FRAME_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.npy'}
+
+
+def list_frame_files(frame_dir, limit=None):
+    """
+    列出目录中录制的帧文件（图片或 .npy），按文件名排序。
+
+    :param frame_dir: 帧目录
+    :param limit: 最多返回的文件数，None 表示不限制
+    """
+    files = sorted(
+        p for p in Path(frame_dir).iterdir()
+        if p.is_file() and p.suffix.lower() in FRAME_EXTENSIONS
+    )
+    if limit is not None:
+        files = files[:limit]
+    return files
+
+
+def load_frame(path):
+    """读取一帧，返回 BGR uint8 数组（与 dxcam 抓取结果的布局一致）。"""
+    path = Path(path)
+    if path.suffix.lower() == '.npy':
+        return np.load(path)
+    frame = cv2.imread(str(path), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError(f"无法读取帧文件：{path}")
+    return frame
@@ -0,0 +1,108 @@
+import gc
+import time
+
+from utils.metrics import GC_PAUSE, GC_PAUSES, GC_PAUSES_IN_FRAME
+
+
+class GCController:
+    """
+    GCController 类：控制 CPython 分代回收在检测循环中的发生时机，并统计回收停顿。
+    - "off"：默认，不改动 gc 也不统计
+    - "auto"：保持解释器默认行为，只统计停顿
+    - "freeze"：初始化完成后 gc.freeze()，模型、会话、缓冲区等长期对象移出分代回收，
+      之后每次回收只需遍历新对象
+    - "scheduled"：在 freeze 的基础上关闭自动回收，由检测循环在帧尾（safe_point）
+      按解释器原有的分代阈值补做回收，回收不会再打断一帧的截图、推理与映射
+    gc 是进程全局状态，stop() 时必须恢复，否则检测循环停止后其它线程将不再回收。
+    """
+
+    MODES = ("off", "auto", "freeze", "scheduled")
+
+    def __init__(self, mode: str = "off"):
+        if mode not in self.MODES:
+            raise ValueError(f"未知的 GC 模式：{mode}")
+        self.mode = mode
+        self.thresholds = gc.get_threshold()
+        self.pauses = 0
+        self.in_frame_pauses = 0
+        self.max_pause = 0.0
+        self.scheduled = 0
+        self._in_frame = False
+        self._gc_start = 0.0
+        self._was_enabled = gc.isenabled()
+        self._started = False
+
+    def _callback(self, phase, info):
+        if phase == "start":
+            self._gc_start = time.perf_counter()
+            return
+        pause = time.perf_counter() - self._gc_start
+        self.pauses += 1
+        self.max_pause = max(self.max_pause, pause)
+        GC_PAUSES.inc()
+        GC_PAUSE.observe(pause)
+        if self._in_frame:
+            self.in_frame_pauses += 1
+            GC_PAUSES_IN_FRAME.inc()
+
+    def start(self):
+        """在模型与缓冲区创建完成、进入检测循环之前调用。"""
+        if self.mode == "off":
+            return
+        if self.mode != "auto":
+            gc.collect()
+            gc.freeze()
+        gc.callbacks.append(self._callback)
+        if self.mode == "scheduled":
+            gc.disable()
+        self._started = True
+
+    def frame_start(self):
+        self._in_frame = True
+
+    def safe_point(self):
+        """帧尾调用：结束帧内统计，scheduled 模式下按分代阈值补做回收。"""
+        self._in_frame = False
+        if self.mode != "scheduled":
+            return
+        count0, count1, count2 = gc.get_count()
+        threshold0, threshold1, threshold2 = self.thresholds
+        if count0 < threshold0:
+            return
+        # 与解释器的自动回收相同：0 代满则回收 0 代，多次 0 代回收后升级到更老的一代
+        if count1 >= threshold1:
+            generation = 2 if count2 >= threshold2 else 1
+        else:
+            generation = 0
+        self.scheduled += 1
+        gc.collect(generation)
+
+    def collect(self):
+        """在检测循环之外做一次完整回收（如工具取内存快照前），不计入停顿统计。"""
+        registered = self._callback in gc.callbacks
+        if registered:
+            gc.callbacks.remove(self._callback)
+        try:
+            gc.collect()
+        finally:
+            if registered:
+                gc.callbacks.append(self._callback)
+
+    def stop(self):
+        if not self._started:
+            return
+        self._started = False
+        if self._callback in gc.callbacks:
+            gc.callbacks.remove(self._callback)
+        if self.mode != "auto":
+            gc.unfreeze()
+        if self._was_enabled:
+            gc.enable()
+
+    def summary(self) -> str:
+        if self.mode == "off":
+            return "[GC] mode off"
+        return (
+            f"[GC] mode {self.mode}, pauses {self.pauses} ({self.in_frame_pauses} inside frames), "
+            f"scheduled {self.scheduled}, max pause {self.max_pause * 1000:.2f} ms"
+        )
@@ -1,3 +1,5 @@
+import time
+
 import dxcam
 
 
@@ -6,9 +8,15 @@ class ScreenGrabber:
     def __init__(self, region=None):
         self.camera = dxcam.create()
         self.region = region
+        # 最近一次成功抓取的帧序号与抓取完成时间（perf_counter）
+        self.frame_id = 0
+        self.capture_time = 0.0
 
     def grab_frame(self):
         frame = self.camera.grab(region=self.region)
+        if frame is not None:
+            self.frame_id += 1
+            self.capture_time = time.perf_counter()
         return frame
 
     def stop(self):
@@ -0,0 +1,160 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+DEFAULT_CLI_PATH = "C:/Program Files/Nefarius Software Solutions/HidHide/x64/HidHideCLI.exe"
+
+
+class HidHideError(RuntimeError):
+    pass
+
+
+class HidHideClient:
+    """
+    HidHideClient 类：
+    - 统一封装对 HidHideCLI.exe 的调用，并检查返回码
+    - batch() 内的多个写操作合并为一次进程调用（HidHideCLI 按顺序处理多个参数）；
+      批次按线程区分，只收集当前线程的写操作，执行期间不持有锁
+    - 只读查询（--dev-gaming）结果短时间缓存，写操作后自动失效
+    - CLI 路径可通过环境变量 HIDHIDE_CLI 指定，指向 .py 时用当前解释器执行（用于假 CLI）
+    """
+
+    def __init__(self, cli_path: str = None, cache_ttl: float = 2.0, timeout: float = 15.0):
+        self.cli_path = cli_path or os.environ.get("HIDHIDE_CLI", DEFAULT_CLI_PATH)
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        self.invocations = 0
+        self._cache = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _command(self, args):
+        if self.cli_path.endswith(".py"):
+            return [sys.executable, self.cli_path, *args]
+        return [self.cli_path, *args]
+
+    def run(self, *args) -> str:
+        """执行一次 CLI 调用并返回标准输出；返回码非 0 时抛出 HidHideError。"""
+        try:
+            result = subprocess.run(
+                self._command(args),
+                capture_output=True, text=True, timeout=self.timeout,
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise HidHideError(f"无法执行 HidHideCLI：{e}") from e
+        self.invocations += 1
+        if result.returncode != 0:
+            detail = (result.stderr or result.stdout).strip()
+            raise HidHideError(f"HidHideCLI {' '.join(args)} 失败（返回码 {result.returncode}）：{detail}")
+        return result.stdout
+
+    def _write(self, *args):
+        pending = getattr(self._local, "pending", None)
+        if pending is not None:
+            pending.extend(args)
+            return
+        try:
+            self.run(*args)
+        finally:
+            self.invalidate()
+
+    @contextmanager
+    def batch(self):
+        """
+        合并写操作：
+            with client.batch():
+                client.cloak(False)
+                client.dev_hide(instance_id)
+        退出时一次性执行；嵌套调用并入最外层。
+        """
+        if getattr(self._local, "pending", None) is not None:
+            yield self
+            return
+        self._local.pending = pending = []
+        try:
+            yield self
+        finally:
+            self._local.pending = None
+        if pending:
+            try:
+                self.run(*pending)
+            finally:
+                self.invalidate()
+
+    def _cached(self, key, *args) -> str:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and time.perf_counter() - entry[0] < self.cache_ttl:
+                return entry[1]
+        out = self.run(*args)
+        with self._lock:
+            self._cache[key] = (time.perf_counter(), out)
+        return out
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+
+    # —— 写操作 ——
+    def app_reg(self, exe_path: str):
+        self._write("--app-reg", exe_path)
+
+    def cloak(self, on: bool):
+        self._write("--cloak-on" if on else "--cloak-off")
+
+    def dev_hide(self, instance_id: str):
+        self._write("--dev-hide", instance_id)
+
+    # —— 只读查询 ——
+    def dev_gaming(self, refresh: bool = False) -> list:
+        """返回 --dev-gaming 的 JSON 结果（游戏设备列表）。"""
+        if refresh:
+            with self._lock:
+                self._cache.pop("dev-gaming", None)
+        return json.loads(self._cached("dev-gaming", "--dev-gaming"))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HidHideClient:
+    """进程内共享的 HidHideClient，使各模块共用同一份查询缓存。"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HidHideClient()
+    return _client
+
+
+if __name__ == "__main__":
+    # 对初始化与独占切换流程计时，配合假 CLI 可在 Linux 上运行：
+    #   HIDHIDE_CLI=tools/fake_hidhide_cli.py python -m utils.hidhide
+    client = get_client()
+
+    def timed(name, func):
+        start = time.perf_counter()
+        result = func()
+        print(f"{name:<28}{(time.perf_counter() - start) * 1000:8.1f} ms")
+        return result
+
+    devices = timed("dev-gaming", client.dev_gaming)
+    timed("dev-gaming (cached)", client.dev_gaming)
+    path = devices[0]["devices"][0]["symbolicLink"]
+    instance_id = "HID\\" + "\\".join(path.split("#")[1:-1])
+
+    def init_flow():
+        with client.batch():
+            client.app_reg(os.path.abspath(sys.executable))
+            client.dev_hide(instance_id)
+
+    timed("init (app-reg + hide)", init_flow)
+    timed("exclusive off", lambda: client.cloak(False))
+    timed("exclusive on", lambda: client.cloak(True))
+    print(f"CLI invocations: {client.invocations}")
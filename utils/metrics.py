@@ -0,0 +1,246 @@
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        # 同一计数器会被多个线程累加（各手柄的 HID 线程、映射循环与 MappingEngine），
+        # += 不是原子操作，需要加锁以免丢失计数
+        with self._lock:
+            self.value += amount
+
+    def render(self):
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {self.value}",
+        ]
+
+
+class Gauge(Counter):
+    def set(self, value):
+        self.value = value
+
+    def render(self):
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self.value}",
+        ]
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        # 取一致的快照，避免各桶之和与 count 不符
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            lines.append(f'{self.name}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+
+class Registry:
+    """
+    指标注册表：按名称取得（不存在则创建）计数器、仪表和直方图，并输出 Prometheus 文本格式。
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            return metric
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str = "") -> Gauge:
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str = "", buckets=()) -> Histogram:
+        return self._get(Histogram, name, help_text, buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+LATENCY_BUCKETS = (0.001, 0.002, 0.004, 0.006, 0.008, 0.010, 0.015, 0.020, 0.030, 0.050, 0.100, 0.250)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+
+# 检测流程
+FRAMES_CAPTURED = REGISTRY.counter("tgc_frames_captured_total", "Frames returned by the screen grabber")
+FRAMES_DROPPED = REGISTRY.counter("tgc_frames_dropped_total", "Captured frames skipped before inference")
+EMPTY_GRABS = REGISTRY.counter("tgc_empty_grabs_total", "Grab calls that returned no new frame")
+INFERENCE_LATENCY = REGISTRY.histogram(
+    "tgc_inference_latency_seconds", "Latency of APV5Experimental.predict", LATENCY_BUCKETS
+)
+DETECTIONS_PER_FRAME = REGISTRY.histogram(
+    "tgc_detections_per_frame", "Detections returned per processed frame", COUNT_BUCKETS
+)
+FRAME_AGE = REGISTRY.histogram(
+    "tgc_frame_age_seconds", "Time from screen capture to the virtual pad update that used the frame",
+    LATENCY_BUCKETS
+)
+MAPPER_HANDOFF = REGISTRY.histogram(
+    "tgc_mapper_handoff_seconds", "Time a stick offset waits before the mapper submits it", LATENCY_BUCKETS
+)
+CASCADE_SKIPPED = REGISTRY.counter(
+    "tgc_cascade_skipped_total", "Frames the cascade first stage judged empty, skipping full detection"
+)
+GC_PAUSES = REGISTRY.counter("tgc_gc_pauses_total", "Cyclic garbage collections observed while running")
+GC_PAUSES_IN_FRAME = REGISTRY.counter(
+    "tgc_gc_pauses_in_frame_total", "Cyclic garbage collections that ran inside a detection frame"
+)
+GC_PAUSE = REGISTRY.histogram(
+    "tgc_gc_pause_seconds", "Duration of cyclic garbage collections", LATENCY_BUCKETS
+)
+# 手柄映射
+HID_REPORTS = REGISTRY.counter("tgc_hid_reports_total", "HID input reports received from the physical pad")
+VPAD_UPDATES = REGISTRY.counter("tgc_vpad_updates_total", "Reports submitted to the virtual pad")
+MAPPER_OVERRUNS = REGISTRY.counter(
+    "tgc_mapper_overruns_total",
+    "Mapper passes over budget: a standalone mapper loop iteration longer than twice its poll interval, "
+    "or a MappingEngine pass longer than its keepalive interval"
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 不向 stdout（Tk 日志区）输出访问日志
+        pass
+
+
+class MetricsServer:
+    """只监听 127.0.0.1 的 /metrics HTTP 端点，运行在后台线程。"""
+
+    def __init__(self, port: int = 9464, registry: Registry = REGISTRY):
+        handler = type("Handler", (_Handler,), {"registry": registry})
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class MetricsFileWriter:
+    """
+    定期把指标快照追加写入文件（每个快照以 # TIMESTAMP 行开头），
+    超过 max_bytes 时轮转为 .1、.2 ...，最多保留 backups 个旧文件。
+    """
+
+    def __init__(self, path: str, interval: float = 10.0, max_bytes: int = 5 * 1024 * 1024,
+                 backups: int = 3, registry: Registry = REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.registry = registry
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def write_snapshot(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            self._rotate()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(f"# TIMESTAMP {time.time():.3f}\n")
+            f.write(self.registry.render())
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.write_snapshot()
+            except OSError:
+                pass
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_exporters(config: dict) -> list:
+    """
+    按配置启动导出器，例如 {"port": 9464, "file": "metrics.prom", "interval": 10}。
+    未配置 port 和 file 时不启动任何导出器。
+    """
+    exporters = []
+    if config.get("port"):
+        exporters.append(MetricsServer(int(config["port"])))
+    if config.get("file"):
+        exporters.append(MetricsFileWriter(
+            config["file"],
+            interval=config.get("interval", 10.0),
+            max_bytes=config.get("max_bytes", 5 * 1024 * 1024),
+            backups=config.get("backups", 3),
+        ))
+    for exporter in exporters:
+        exporter.start()
+    return exporters
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import threading
+
+
+CATALOG_PATH = "model_catalog.json"
+MODEL_EXTENSIONS = {'.onnx'}
+# 扫描时直接跳过的目录（数据集、录像、虚拟环境等）
+IGNORED_DIRS = {
+    '.git', '__pycache__', '.venv', 'venv', 'env', 'node_modules', 'build', 'dist',
+    'datasets', 'dataset', 'recordings', 'frames', 'runs', 'logs',
+}
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_model_dirs():
+    """读取 user_config.json 中的 model_dirs，未配置时只扫描当前目录（深度 2）。"""
+    try:
+        with open("user_config.json", "r") as f:
+            return json.load(f).get("model_dirs", ["."])
+    except (OSError, ValueError):
+        return ["."]
+
+
+class ModelCatalog:
+    """
+    ModelCatalog 类：
+    - 只扫描配置的模型目录，并跳过数据集、录像等无关目录
+    - 以目录 mtime 判断是否需要重新列目录，未变化的目录只需一次 stat
+    - 保存每个模型的元数据：大小、哈希、输入形状、最近一次测得的延迟
+    """
+
+    def __init__(self, dirs=None, cache_path: str = CATALOG_PATH, max_depth: int = 2):
+        self._dirs_from_config = dirs is None
+        self.dirs = dirs if dirs is not None else load_model_dirs()
+        self.cache_path = cache_path
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._dirs_cache = {}
+        self._models = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+            self._dirs_cache = data.get("dirs", {})
+            self._models = data.get("models", {})
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        with self._lock:
+            tmp = self.cache_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"dirs": self._dirs_cache, "models": self._models}, f, indent=4)
+            os.replace(tmp, self.cache_path)
+
+    def _scan_dir(self, path: str, depth: int, found: list):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return
+        cached = self._dirs_cache.get(path)
+        if cached is None or cached["mtime"] != mtime:
+            files, subdirs = [], []
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in IGNORED_DIRS and not entry.name.startswith('.'):
+                            subdirs.append(entry.name)
+                    elif os.path.splitext(entry.name)[1].lower() in MODEL_EXTENSIONS:
+                        files.append(entry.name)
+            cached = {"mtime": mtime, "files": sorted(files), "subdirs": sorted(subdirs)}
+            self._dirs_cache[path] = cached
+        found.extend(os.path.join(path, name) for name in cached["files"])
+        if depth < self.max_depth:
+            for name in cached["subdirs"]:
+                self._scan_dir(os.path.join(path, name), depth + 1, found)
+
+    def list_models(self) -> list:
+        """
+        返回模型相对当前工作目录的路径列表，并更新各模型的大小与 mtime。
+        文件大小或 mtime 变化时，旧的哈希、输入形状和延迟一并失效；
+        只删除文件已不存在的条目，扫描目录之外记录的模型（如转换出的变体）保留其元数据。
+        """
+        if self._dirs_from_config:
+            self.dirs = load_model_dirs()
+        found = []
+        for d in self.dirs:
+            self._scan_dir(os.path.normpath(d), 0, found)
+        result = []
+        seen = set()
+        with self._lock:
+            for path in found:
+                rel = os.path.relpath(path).replace('\\', '/')
+                if rel in seen:
+                    continue
+                seen.add(rel)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                meta = self._models.get(rel)
+                if meta is None or meta["size"] != st.st_size or meta["mtime"] != st.st_mtime_ns:
+                    self._models[rel] = {"size": st.st_size, "mtime": st.st_mtime_ns}
+                result.append(rel)
+            for rel in list(self._models):
+                if rel not in seen and not os.path.exists(rel):
+                    del self._models[rel]
+        self.save()
+        return result
+
+    def metadata(self, rel_path: str) -> dict:
+        with self._lock:
+            return dict(self._models.get(rel_path, {}))
+
+    def get_hash(self, path: str) -> str:
+        """
+        返回模型的 SHA-256，大小与 mtime 未变时直接使用缓存值。
+        结果只更新内存中的目录，由调用方之后的 save()（或 record_latency 等）一并写入磁盘。
+        """
+        rel = os.path.relpath(path).replace('\\', '/')
+        st = os.stat(path)
+        with self._lock:
+            meta = self._models.get(rel)
+            if meta and meta.get("sha256") and meta["size"] == st.st_size and meta["mtime"] == st.st_mtime_ns:
+                return meta["sha256"]
+        digest = file_sha256(path)
+        with self._lock:
+            meta = self._models.get(rel)
+            if meta is None or meta["size"] != st.st_size or meta["mtime"] != st.st_mtime_ns:
+                meta = self._models[rel] = {"size": st.st_size, "mtime": st.st_mtime_ns}
+            meta["sha256"] = digest
+        return digest
+
+    def fill_metadata(self):
+        """为缺少哈希或输入形状的模型补全元数据（较慢，适合在后台线程调用）。"""
+        import onnxruntime
+
+        for rel in list(self._models):
+            meta = self.metadata(rel)
+            if "sha256" not in meta:
+                try:
+                    self.get_hash(rel)
+                except OSError:
+                    # 文件在补全期间被删除或移动，跳过，下次 list_models 时清理
+                    continue
+            if "input_shape" not in meta:
+                try:
+                    session = onnxruntime.InferenceSession(rel, providers=["CPUExecutionProvider"])
+                    shape = [d if isinstance(d, int) else str(d) for d in session.get_inputs()[0].shape]
+                except Exception:
+                    shape = None
+                with self._lock:
+                    if rel in self._models:
+                        self._models[rel]["input_shape"] = shape
+        self.save()
+
+    def record_latency(self, path: str, latency_ms: float, provider: str = None):
+        """记录模型最近一次测得的延迟（p95，毫秒），供选择界面显示。"""
+        rel = os.path.relpath(path).replace('\\', '/')
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            meta = self._models.get(rel)
+            if meta is None or meta["size"] != st.st_size or meta["mtime"] != st.st_mtime_ns:
+                meta = self._models[rel] = {"size": st.st_size, "mtime": st.st_mtime_ns}
+            meta["latency_ms"] = latency_ms
+            if provider is not None:
+                meta["provider"] = provider
+        self.save()
+
+    def fastest(self, paths) -> str:
+        """返回 paths 中已测延迟最低的模型，均未测过时返回 None。"""
+        timed = [(self.metadata(p).get("latency_ms"), p) for p in paths]
+        timed = [t for t in timed if t[0] is not None]
+        return min(timed)[1] if timed else None
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> ModelCatalog:
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = ModelCatalog()
+    return _catalog
@@ -0,0 +1,189 @@
+import json
+import os
+import sys
+import threading
+
+
+# 线程优先级名称 -> (Windows SetThreadPriority 级别, Linux nice 值)
+PRIORITIES = {
+    "idle": (-15, 19),
+    "below_normal": (-1, 5),
+    "normal": (0, 0),
+    "above_normal": (1, -5),
+    "high": (2, -10),
+    "time_critical": (15, -20),
+}
+# Windows 进程优先级类
+PRIORITY_CLASSES = {
+    "idle": 0x40,
+    "below_normal": 0x4000,
+    "normal": 0x20,
+    "above_normal": 0x8000,
+    "high": 0x80,
+}
+STAGES = ("ui", "detection", "capture", "inference", "mapper", "hid")
+
+
+class CorePlacement:
+    """
+    CorePlacement 类：把各个线程（界面、检测循环、截图、推理、映射、手柄输入）固定到指定核心，
+    并在系统允许时调整线程优先级或调度策略，使延迟敏感的映射线程不被推理抢占。
+    - apply(stage) 在目标线程内部调用，只影响调用线程；未配置的阶段不做任何改动
+    - Windows 使用 SetThreadAffinityMask / SetThreadPriority，可选设置进程优先级类
+    - Linux 使用 os.sched_setaffinity 与线程级 nice，policy 为 "fifo" / "rr" 时改用实时调度
+      （需要 CAP_SYS_NICE，权限不足时记录失败并保持原样）
+    - session_options() 为 onnxruntime 的 intra-op 线程池设置核心亲和性并可关闭自旋等待
+    配置示例（核心编号从 0 开始）：
+        "placement": {
+            "enabled": true,
+            "process_class": "above_normal",
+            "mapper": {"cores": [2], "priority": "time_critical"},
+            "detection": {"cores": [3]},
+            "ort": {"cores": [4, 5], "spinning": false}
+        }
+    """
+
+    def __init__(self, config: dict = None):
+        config = config or {}
+        self.enabled = config.get("enabled", False)
+        self.stages = {name: config[name] for name in STAGES if name in config}
+        self.ort = config.get("ort", {})
+        self.process_class = config.get("process_class")
+        self.results = []
+        self._lock = threading.Lock()
+        self._process_applied = False
+
+    def _record(self, text: str):
+        with self._lock:
+            self.results.append(text)
+
+    def apply(self, stage: str):
+        """按配置放置调用线程；返回是否全部设置成功。"""
+        if not self.enabled:
+            return True
+        if not self._process_applied and self.process_class:
+            self._process_applied = True
+            self._set_process_class(self.process_class)
+        cfg = self.stages.get(stage)
+        if not cfg:
+            return True
+        parts = []
+        ok = True
+        cores = cfg.get("cores")
+        if cores:
+            done = self._set_affinity(cores)
+            ok &= done
+            parts.append(f"cores {cores}{'' if done else '（失败）'}")
+        policy = cfg.get("policy")
+        if policy in ("fifo", "rr"):
+            done = self._set_realtime(policy, cfg.get("rt_priority", 10))
+            ok &= done
+            parts.append(f"policy {policy}{'' if done else '（权限不足）'}")
+        priority = cfg.get("priority")
+        if priority:
+            done = self._set_priority(priority)
+            ok &= done
+            parts.append(f"priority {priority}{'' if done else '（权限不足）'}")
+        self._record(f"{stage}（{threading.current_thread().name}）：{', '.join(parts)}")
+        return ok
+
+    @staticmethod
+    def _set_affinity(cores) -> bool:
+        try:
+            if sys.platform == "win32":
+                import ctypes
+                kernel32 = ctypes.windll.kernel32
+                kernel32.GetCurrentThread.restype = ctypes.c_void_p
+                kernel32.SetThreadAffinityMask.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+                kernel32.SetThreadAffinityMask.restype = ctypes.c_size_t
+                mask = sum(1 << c for c in cores)
+                return kernel32.SetThreadAffinityMask(kernel32.GetCurrentThread(), mask) != 0
+            # Linux 上 pid 为 0 时只作用于调用线程
+            os.sched_setaffinity(0, cores)
+            return True
+        except (OSError, AttributeError):
+            return False
+
+    @staticmethod
+    def _set_priority(priority: str) -> bool:
+        win_level, nice = PRIORITIES[priority]
+        try:
+            if sys.platform == "win32":
+                import ctypes
+                kernel32 = ctypes.windll.kernel32
+                kernel32.GetCurrentThread.restype = ctypes.c_void_p
+                kernel32.SetThreadPriority.argtypes = [ctypes.c_void_p, ctypes.c_int]
+                return kernel32.SetThreadPriority(kernel32.GetCurrentThread(), win_level) != 0
+            # Linux 的 nice 值按线程生效，用线程 ID 指定调用线程
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), nice)
+            return True
+        except (OSError, AttributeError):
+            return False
+
+    @staticmethod
+    def _set_realtime(policy: str, rt_priority: int) -> bool:
+        if not hasattr(os, "sched_setscheduler"):
+            return False
+        try:
+            os.sched_setscheduler(
+                0, os.SCHED_FIFO if policy == "fifo" else os.SCHED_RR, os.sched_param(rt_priority)
+            )
+            return True
+        except OSError:
+            return False
+
+    def _set_process_class(self, name: str):
+        if sys.platform != "win32":
+            self._record(f"process class {name}：仅 Windows 支持，已忽略")
+            return
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetCurrentProcess.restype = ctypes.c_void_p
+        kernel32.SetPriorityClass.argtypes = [ctypes.c_void_p, ctypes.c_uint32]
+        done = kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), PRIORITY_CLASSES[name]) != 0
+        self._record(f"process class {name}{'' if done else '（失败）'}")
+
+    def session_options(self, options=None):
+        """
+        为推理会话配置 intra-op 线程池：ort.cores 中每个核心各放一个工作线程，
+        发起 run 的推理线程本身也参与计算，因此线程数为核心数 + 1（其位置由所在阶段决定）。
+        ort.spinning 为 False 时工作线程空闲即让出 CPU，不再自旋占用映射线程可用的时间片。
+        未开启或未配置 ort 时原样返回 options。
+        """
+        if not self.enabled or not self.ort:
+            return options
+        import onnxruntime
+        if options is None:
+            options = onnxruntime.SessionOptions()
+        cores = self.ort.get("cores")
+        if cores:
+            options.intra_op_num_threads = len(cores) + 1
+            # onnxruntime 的逻辑处理器编号从 1 开始
+            options.add_session_config_entry(
+                "session.intra_op_thread_affinities", ";".join(str(c + 1) for c in cores)
+            )
+        if not self.ort.get("spinning", True):
+            options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        return options
+
+    def summary(self) -> str:
+        if not self.enabled:
+            return "[Placement] disabled"
+        with self._lock:
+            return "\n".join(f"[Placement] {line}" for line in self.results) or "[Placement] no stage applied"
+
+
+_placement = None
+
+
+def get_placement() -> CorePlacement:
+    """进程内共享的 CorePlacement，首次调用时读取 user_config.json 的 placement 段（子进程中同样适用）。"""
+    global _placement
+    if _placement is None:
+        try:
+            with open("user_config.json", "r") as f:
+                config = json.load(f).get("placement", {})
+        except (OSError, ValueError):
+            config = {}
+        _placement = CorePlacement(config)
+    return _placement
@@ -0,0 +1,133 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+
+class StageTimer:
+    """
+    记录命名阶段的耗时。挂到 APV5Experimental.stage_timer 上即可启用，
+    为 None 时推理路径只多一次属性判断。
+    add() 在检测线程中调用，summary() 在其他线程中调用，两者通过锁互斥。
+    """
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.maxima = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.totals[stage] += seconds
+            self.counts[stage] += 1
+            if seconds > self.maxima[stage]:
+                self.maxima[stage] = seconds
+
+    def summary(self) -> str:
+        # 先在锁内取快照，格式化时检测线程可以继续写入新的阶段
+        with self._lock:
+            stages = [(stage, total, self.counts[stage], self.maxima[stage]) for stage, total in self.totals.items()]
+        lines = []
+        for stage, total, n, maximum in stages:
+            lines.append(
+                f"[Stage] {stage}: avg {total / n * 1000:.3f} ms, "
+                f"max {maximum * 1000:.3f} ms, n={n}"
+            )
+        return "\n".join(lines)
+
+
+class SamplingProfiler:
+    """
+    SamplingProfiler 类：
+    - 后台线程按固定间隔通过 sys._current_frames() 采样所有线程的调用栈
+    - 结果按线程名聚合为 collapsed-stack 格式（flamegraph.pl / speedscope 可直接打开）
+    - 未启动时不安装任何钩子，没有额外开销
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self.n_samples = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _format_stack(frame) -> str:
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(parts))
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, f"thread-{ident}")
+                # 跳过采样器自身及其控制线程
+                if ident == own or name.startswith("profiler"):
+                    continue
+                self.samples[f"{name};{self._format_stack(frame)}"] += 1
+            self.n_samples += 1
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def write_collapsed(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def thread_summary(self) -> str:
+        per_thread = Counter()
+        for stack, count in self.samples.items():
+            per_thread[stack.split(";", 1)[0]] += count
+        total = sum(per_thread.values()) or 1
+        return "\n".join(
+            f"[Profile] {name}: {count / total * 100:.1f}% of samples"
+            for name, count in per_thread.most_common()
+        )
+
+
+def profile_for(seconds: float, out_dir: str = "profiles", model=None, on_done=None):
+    """
+    在后台采样 seconds 秒，结束后写出 collapsed-stack 文件。
+    若给出 model（APV5Experimental），同时统计 predict 各阶段耗时。
+
+    :param on_done: 结束回调 on_done(文件路径, 摘要文本)
+    """
+    profiler = SamplingProfiler()
+    stage_timer = StageTimer() if model is not None else None
+
+    def run():
+        if model is not None:
+            model.stage_timer = stage_timer
+        profiler.start()
+        try:
+            time.sleep(seconds)
+        finally:
+            profiler.stop()
+            if model is not None:
+                model.stage_timer = None
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, time.strftime("profile-%Y%m%d-%H%M%S.folded"))
+        profiler.write_collapsed(path)
+        summary = profiler.thread_summary()
+        if stage_timer is not None and stage_timer.totals:
+            summary += "\n" + stage_timer.summary()
+        if on_done is not None:
+            on_done(path, summary)
+
+    threading.Thread(target=run, name="profiler-control", daemon=True).start()
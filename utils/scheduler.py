@@ -0,0 +1,84 @@
+import threading
+import time
+
+
+class DemandScheduler:
+    """
+    DemandScheduler 类：
+    - 位于截图/推理循环与结果使用方之间，由使用方声明何时需要结果、需要多高的频率
+    - 有需求时循环按 active_rate_hz 运行（0 表示不限速）
+    - 无需求时以 idle_rate_hz 的低占空比运行（0 表示完全暂停），新需求到来时立即唤醒
+    """
+
+    def __init__(self, idle_rate_hz: float = 2.0, active_rate_hz: float = 0.0, hold: float = 0.5):
+        """
+        :param idle_rate_hz: 空闲时的运行频率
+        :param active_rate_hz: 有需求时的默认最高频率，0 表示不限速
+        :param hold: 每次 request() 后需求持续的时间（秒）
+        """
+        self.idle_rate_hz = idle_rate_hz
+        self.active_rate_hz = active_rate_hz
+        self.hold = hold
+
+        self.active_frames = 0
+        self.idle_frames = 0
+        self.wakeups = 0
+        self.max_wake_latency = 0.0
+
+        self._deadline = 0.0
+        self._rate = active_rate_hz
+        self._request_time = 0.0
+        self._last_run = 0.0
+        self._wake = threading.Event()
+
+    def request(self, rate_hz: float = None, hold: float = None):
+        """使用方声明接下来 hold 秒内需要结果；可在任意线程中高频调用。"""
+        now = time.perf_counter()
+        was_idle = now >= self._deadline
+        self._deadline = now + (self.hold if hold is None else hold)
+        self._rate = self.active_rate_hz if rate_hz is None else rate_hz
+        if was_idle:
+            self._request_time = now
+            self._wake.set()
+
+    @property
+    def active(self) -> bool:
+        return time.perf_counter() < self._deadline
+
+    def wait_next(self) -> bool:
+        """
+        在每次循环开始时调用，按当前需求等待到下一次应运行的时刻。
+
+        :return: True 表示应运行一帧；False 表示本次只是定期醒来（调用方应检查退出条件后再次调用）
+        """
+        now = time.perf_counter()
+        if now < self._deadline:
+            if self._rate > 0:
+                remaining = self._last_run + 1 / self._rate - now
+                if remaining > 0:
+                    time.sleep(remaining)
+            self.active_frames += 1
+            self._last_run = time.perf_counter()
+            return True
+
+        self._wake.clear()
+        # clear 之后再检查一次，避免错过两者之间到来的需求
+        if time.perf_counter() < self._deadline:
+            return self.wait_next()
+        timeout = 1 / self.idle_rate_hz if self.idle_rate_hz > 0 else 0.1
+        if self._wake.wait(timeout):
+            latency = time.perf_counter() - self._request_time
+            self.wakeups += 1
+            if latency > self.max_wake_latency:
+                self.max_wake_latency = latency
+            return self.wait_next()
+        if self.idle_rate_hz <= 0:
+            return False
+        self.idle_frames += 1
+        self._last_run = time.perf_counter()
+        return True
+
+    @property
+    def active_ratio(self) -> float:
+        total = self.active_frames + self.idle_frames
+        return self.active_frames / total if total else 0.0
@@ -0,0 +1,133 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedRing:
+    """
+    SharedRing 类：
+    - 基于 multiprocessing.shared_memory 的单生产者、多消费者环形缓冲区
+    - 槽位在创建时一次性分配，读写双方都直接使用 NumPy 视图，不做序列化
+    - 每个槽位带序号（seqlock：写入期间置为 -1，写完后为本次写入的全局序号），读者可据此判断数据是否在使用过程中被覆盖
+    - 每个槽位附带 count（有效行数）和若干 float64 附加字段（时间戳、延迟等）
+    """
+
+    META_FIELDS = 2   # seq, count
+    HEADER_FIELDS = 1  # 最新写入的全局序号
+
+    def __init__(self, shape, dtype=np.uint8, slots: int = 4, n_extra: int = 4,
+                 name: str = None, create: bool = True):
+        """
+        :param shape: 单个槽位数据的形状
+        :param dtype: 槽位数据类型
+        :param slots: 槽位数量；读者需在生产者写满一圈之前用完视图
+        :param n_extra: 每个槽位的 float64 附加字段数量
+        :param name: 共享内存名称，create=False 时必须给出
+        :param create: True 为创建方（负责 unlink），False 为附加到已有共享内存
+        """
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self.n_extra = n_extra
+
+        header_bytes = 8 * self.HEADER_FIELDS
+        meta_bytes = 8 * self.META_FIELDS * slots
+        extra_bytes = 8 * n_extra * slots
+        slot_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        total = header_bytes + meta_bytes + extra_bytes + slot_bytes * slots
+
+        self._owner = create
+        self._shm = shared_memory.SharedMemory(name=name, create=create, size=total)
+        buf = self._shm.buf
+        offset = 0
+        self._header = np.ndarray((self.HEADER_FIELDS,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += header_bytes
+        self._meta = np.ndarray((slots, self.META_FIELDS), dtype=np.int64, buffer=buf, offset=offset)
+        offset += meta_bytes
+        self._extra = np.ndarray((slots, n_extra), dtype=np.float64, buffer=buf, offset=offset)
+        offset += extra_bytes
+        self._data = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=buf, offset=offset)
+        if create:
+            self._header[:] = 0
+            self._meta[:] = 0
+            self._extra[:] = 0
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def spec(self) -> dict:
+        """返回在其他进程中附加到同一缓冲区所需的参数（可 pickle）。"""
+        return {
+            "shape": self.shape,
+            "dtype": self.dtype.str,
+            "slots": self.slots,
+            "n_extra": self.n_extra,
+            "name": self.name,
+        }
+
+    @classmethod
+    def attach(cls, spec: dict) -> "SharedRing":
+        return cls(spec["shape"], spec["dtype"], spec["slots"], spec["n_extra"],
+                   name=spec["name"], create=False)
+
+    @property
+    def latest_seq(self) -> int:
+        return int(self._header[0])
+
+    def begin_write(self):
+        """
+        取得下一个可写槽位的视图，生产者可直接把数据写入其中（如 cv2 的 dst 参数）。
+
+        :return: (槽位序号, 数据视图, 附加字段视图)
+        """
+        seq = self.latest_seq + 1
+        slot = seq % self.slots
+        self._meta[slot, 0] = -1  # 写入中
+        return seq, self._data[slot], self._extra[slot]
+
+    def end_write(self, seq: int, count: int = 0):
+        slot = seq % self.slots
+        self._meta[slot, 1] = count
+        self._meta[slot, 0] = seq
+        self._header[0] = seq
+
+    def write(self, array, count: int = None, extra=None) -> int:
+        """把 array 拷贝进下一个槽位并发布。count 为 None 时按整块数据发布。"""
+        seq, view, extra_view = self.begin_write()
+        if count is None:
+            view[...] = array
+            count = len(view)
+        elif count:
+            view[:count] = array[:count]
+        if extra is not None:
+            extra_view[:len(extra)] = extra
+        self.end_write(seq, count)
+        return seq
+
+    def read_latest(self, last_seq: int = 0):
+        """
+        读取最新槽位的零拷贝视图。
+
+        :param last_seq: 上次读到的序号，没有更新的数据时返回 None
+        :return: (序号, 数据视图[:count], 附加字段视图) 或 None
+        """
+        seq = self.latest_seq
+        if seq <= last_seq:
+            return None
+        slot = seq % self.slots
+        if self._meta[slot, 0] != seq:
+            return None
+        count = int(self._meta[slot, 1])
+        return seq, self._data[slot][:count], self._extra[slot]
+
+    def is_valid(self, seq: int) -> bool:
+        """视图使用完毕后调用，确认期间槽位没有被生产者覆盖。"""
+        return self._meta[seq % self.slots, 0] == seq
+
+    def close(self):
+        # 先释放 NumPy 视图，否则 SharedMemory.close 会因仍有导出的缓冲区而失败
+        self._header = self._meta = self._extra = self._data = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
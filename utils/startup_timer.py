@@ -0,0 +1,45 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """
+    StartupTimer 类：
+    - 以进程启动（run.py 最顶部）为零点，记录各启动阶段的耗时
+    - 阶段可以在不同线程中并行执行，记录是线程安全的
+    - 单独记录可交互时间（time-to-interactive，窗口首次空闲）
+    """
+
+    def __init__(self, t0: float = None):
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.stages = []
+        self.interactive_ms = None
+        self._lock = threading.Lock()
+
+    def since_start_ms(self) -> float:
+        return (time.perf_counter() - self.t0) * 1000
+
+    def record(self, name: str, start: float, end: float = None):
+        end = end if end is not None else time.perf_counter()
+        with self._lock:
+            self.stages.append((name, (start - self.t0) * 1000, (end - start) * 1000))
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start)
+
+    def mark_interactive(self):
+        self.interactive_ms = self.since_start_ms()
+
+    def report(self) -> str:
+        with self._lock:
+            stages = sorted(self.stages, key=lambda s: s[1])
+        lines = [f"[Startup] {name}: {duration:.1f} ms (@{offset:.1f} ms)" for name, offset, duration in stages]
+        if self.interactive_ms is not None:
+            lines.append(f"[Startup] time to interactive: {self.interactive_ms:.1f} ms")
+        return "\n".join(lines)
@@ -1,11 +1,11 @@
 import ctypes
-from pathlib import Path
 import os
-import json
 import traceback
-import subprocess
 import sys
 
+from utils.hidhide import get_client
+from utils.model_catalog import get_catalog
+
 
 def handle_exception(e):
     sys.stdout.write(f"发生异常：{str(e)}")
@@ -19,19 +19,10 @@ def list_subdirs(path):
 
 def find_model_files():
     """
-    在当前工作目录（及其子目录）中查找后缀为 .onnx 的文件，
-    并返回它们相对于当前工作目录的路径列表。
+    在配置的模型目录（user_config.json 的 model_dirs，默认当前目录）中查找 .onnx 文件，
+    并返回它们相对于当前工作目录的路径列表。结果由 ModelCatalog 缓存。
     """
-    cwd = Path.cwd()
-    extensions = {'.onnx'}
-    result = []
-
-    for path in cwd.rglob('*'):
-        if path.is_file() and path.suffix.lower() in extensions:
-            # 将绝对路径转换为相对于 cwd 的相对路径
-            rel_path = path.relative_to(cwd)
-            result.append(str(rel_path).replace('\\', '/'))
-    return result
+    return get_catalog().list_models()
 
 def get_screenshot_region_dxcam(screenshot_size):
     user32 = ctypes.windll.user32
@@ -66,22 +57,16 @@ def get_scaling_factor():
     scaling = dpi / 96  # 96 是默认 DPI
     return scaling
 
-def enum_hid_devices():
+def enum_hid_devices(refresh=False):
     """
     枚举系统中所有 HID 设备，返回一个集合（set），
-    其中每个元素为三元组 (vendor_id, product_id, device_path)。
+    其中每个元素为四元组 (name, vendor_id, product_id, device_path)。
     之所以包含 device_path，是为了区分同样 VID/PID 但路径不同的多个设备。
+
+    :param refresh: 为 True 时忽略 HidHideClient 的查询缓存
     """
     device_set = set()
-    # 创建一个 HID 设备筛选器，不指定任何 VID/PID，表示获取所有 HID 设备
-    all_devices = subprocess.run(
-        [
-            "C:/Program Files/Nefarius Software Solutions/HidHide/x64/HidHideCLI.exe", 
-            "--dev-gaming"
-        ],
-        capture_output=True, text=True
-    )
-    for device in json.loads(all_devices.stdout):
+    for device in get_client().dev_gaming(refresh=refresh):
         name = device["friendlyName"]
         for device_info in device["devices"]:
             if device_info["present"] == True: